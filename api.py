@@ -0,0 +1,246 @@
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
+
+from database import (
+    CAMPOS_PRODUCTO, Movimiento, get_all_categories, get_inventory_value_at, get_inventory_value_by_category,
+    get_product_by_id, iter_movements_by_product, iter_products
+)
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la biblioteca estándar
+    orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+CAMPOS_CATEGORIA = ('id', 'nombre', 'descripcion', 'total_productos')
+CAMPOS_MOVIMIENTO = Movimiento.CAMPOS
+
+# Objetos que se envían juntos en cada bloque de una respuesta NDJSON
+LINEAS_POR_BLOQUE = 500
+
+_get_db = None
+
+
+def init_api(app, get_db):
+    """Registrar el blueprint usando la misma conexión por petición que las rutas HTML"""
+    global _get_db
+    _get_db = get_db
+    app.register_blueprint(api)
+
+
+def _json_default(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f'{type(valor).__name__} no es serializable')
+
+
+def dumps(valor):
+    """Serializar a JSON (bytes) con orjson si está instalado"""
+    if orjson is not None:
+        return orjson.dumps(valor)
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode()
+
+
+def respuesta_json(valor, status=200):
+    return Response(dumps(valor), status=status, mimetype='application/json')
+
+
+def error(mensaje, status=400, **detalles):
+    return respuesta_json({'error': mensaje, **detalles}, status)
+
+
+class ErrorPeticion(Exception):
+    """Parámetro inválido en la petición; se responde con 400"""
+
+    def __init__(self, mensaje, **detalles):
+        super().__init__(mensaje)
+        self.detalles = detalles
+
+
+@api.errorhandler(ErrorPeticion)
+def _error_peticion(e):
+    return error(str(e), **e.detalles)
+
+
+def campos_pedidos(disponibles, valor=None):
+    """Campos de ?campos=a,b,c (todos si no se indica)"""
+    if valor is None:
+        valor = request.args.get('campos')
+    if not valor:
+        return disponibles
+    campos = tuple(campo.strip() for campo in valor.split(',') if campo.strip())
+    desconocidos = [campo for campo in campos if campo not in disponibles]
+    if desconocidos or not campos:
+        raise ErrorPeticion('Campos inválidos', invalidos=desconocidos, disponibles=list(disponibles))
+    return campos
+
+
+def es_ndjson():
+    return (request.args.get('formato') == 'ndjson'
+            or request.accept_mimetypes.best == 'application/x-ndjson')
+
+
+def tamano_pagina(ndjson):
+    return limite(request.args.get('limit'), ndjson, current_app.config)
+
+
+def limite(valor, ndjson, config):
+    """Límite de filas: en NDJSON sin límite salvo que se pida uno"""
+    if not valor:
+        return None if ndjson else config['PAGE_SIZE']
+    try:
+        limit = int(valor)
+    except ValueError:
+        raise ErrorPeticion('limit debe ser un entero') from None
+    if limit < 1:
+        raise ErrorPeticion('limit debe ser mayor que 0')
+    return limit if ndjson else min(limit, config['MAX_PAGE_SIZE'])
+
+
+def respuesta_ndjson(objetos):
+    """Respuesta en streaming: un objeto JSON por línea, enviado por bloques"""
+    def generar():
+        bloque = []
+        for objeto in objetos:
+            bloque.append(dumps(objeto))
+            if len(bloque) == LINEAS_POR_BLOQUE:
+                yield b'\n'.join(bloque) + b'\n'
+                bloque = []
+        if bloque:
+            yield b'\n'.join(bloque) + b'\n'
+
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
+
+def armar_pagina(filas, limit, convertir, cursor):
+    """Página JSON con los datos y el cursor de la siguiente.
+
+    convertir pasa cada fila a dict; cursor calcula, a partir de la última
+    fila, el valor de ?after= de la página siguiente.
+    """
+    datos = []
+    ultima = None
+    for fila in filas:
+        ultima = fila
+        datos.append(convertir(fila))
+    siguiente = cursor(ultima) if limit is not None and len(datos) == limit else None
+    return {'datos': datos, 'siguiente': siguiente}
+
+
+def listado(filas, limit, ndjson, convertir, cursor):
+    """Responder una colección como NDJSON o como página JSON con cursor"""
+    if ndjson:
+        return respuesta_ndjson(map(convertir, filas))
+    return respuesta_json(armar_pagina(filas, limit, convertir, cursor))
+
+
+def fila_producto(columnas, campos):
+    """Función que convierte una fila de iter_products en dict con los campos pedidos"""
+    return lambda fila: {campo: valor for campo, valor in zip(columnas, fila) if campo in campos}
+
+
+def columnas_producto(campos):
+    """El id siempre se lee para poder calcular el cursor de la página siguiente"""
+    return campos if 'id' in campos else ('id',) + campos
+
+
+def fila_movimiento(campos):
+    return lambda m: {campo: m[campo] for campo in campos}
+
+
+def siguiente_movimiento(m):
+    return f"{m.fecha.isoformat(sep=' ')},{m.id}"
+
+
+def filas_categorias(categorias, campos):
+    indices = [CAMPOS_CATEGORIA.index(campo) for campo in campos]
+    return [{campo: categoria[i] for campo, i in zip(campos, indices)} for categoria in categorias]
+
+
+def filas_valor(valores):
+    return [{'categoria': categoria, 'valor_total': valor} for categoria, valor in valores]
+
+
+# Productos
+
+@api.route('/productos')
+def productos():
+    campos = campos_pedidos(CAMPOS_PRODUCTO)
+    ndjson = es_ndjson()
+    limit = tamano_pagina(ndjson)
+    after = request.args.get('after', type=int)
+    categoria_id = request.args.get('categoria_id', type=int)
+
+    columnas = columnas_producto(campos)
+    filas = iter_products(_get_db(), columnas, limit, after, categoria_id)
+    return listado(filas, limit, ndjson, fila_producto(columnas, campos), lambda fila: fila[0])
+
+
+@api.route('/productos/<int:product_id>')
+def producto(product_id):
+    campos = campos_pedidos(CAMPOS_PRODUCTO)
+    producto = get_product_by_id(_get_db(), product_id)
+    if producto is None:
+        return error('Producto no encontrado', 404)
+    return respuesta_json({campo: producto.get(campo) for campo in campos})
+
+
+# Categorías e inventario
+
+@api.route('/categorias')
+def categorias():
+    campos = campos_pedidos(CAMPOS_CATEGORIA)
+    return respuesta_json({'datos': filas_categorias(get_all_categories(_get_db()), campos)})
+
+
+@api.route('/valor_por_categoria')
+def valor_por_categoria():
+    # Con ?fecha=AAAA-MM-DD se valúa el stock al cierre de ese día (stock_snapshots)
+    fecha = fecha_filtro('fecha', request.args.get('fecha'))
+    if fecha is not None:
+        return respuesta_json({'datos': filas_valor(get_inventory_value_at(_get_db(), fecha.date()))})
+    return respuesta_json({'datos': filas_valor(get_inventory_value_by_category(_get_db()))})
+
+
+# Movimientos
+
+def cursor_movimiento(valor):
+    """Convertir ?after=fecha,id en la tupla que espera iter_movements_by_product"""
+    if not valor:
+        return None
+    fecha, _, movimiento_id = valor.rpartition(',')
+    try:
+        return datetime.fromisoformat(fecha).isoformat(sep=' '), int(movimiento_id)
+    except ValueError:
+        raise ErrorPeticion('after debe tener la forma "AAAA-MM-DD HH:MM:SS,id"') from None
+
+
+def fecha_filtro(nombre, valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        raise ErrorPeticion(f'{nombre} debe tener la forma AAAA-MM-DD') from None
+
+
+@api.route('/productos/<int:product_id>/movimientos')
+def movimientos(product_id):
+    campos = campos_pedidos(CAMPOS_MOVIMIENTO)
+    ndjson = es_ndjson()
+    limit = tamano_pagina(ndjson)
+    after = cursor_movimiento(request.args.get('after'))
+    fecha_inicio = fecha_filtro('fecha_inicio', request.args.get('fecha_inicio'))
+    fecha_fin = fecha_filtro('fecha_fin', request.args.get('fecha_fin'))
+    tipo = request.args.get('tipo')
+
+    db = _get_db()
+    if get_product_by_id(db, product_id) is None:
+        return error('Producto no encontrado', 404)
+
+    filas = iter_movements_by_product(db, product_id, fecha_inicio, fecha_fin, tipo,
+                                      limit=limit, after=after)
+    return listado(filas, limit, ndjson, fila_movimiento(campos), siguiente_movimiento)
@@ -1,87 +1,188 @@
-from flask import Flask, render_template, request, redirect, url_for, g, flash, send_file
+from flask import (
+    Flask, render_template, request, redirect, url_for, g, flash, send_file, jsonify,
+    Response, stream_with_context
+)
+from werkzeug.utils import secure_filename
+import click
+import csv
+import os
 import sqlite3
-import pandas as pd
-import pdfkit
-from io import BytesIO
+import tempfile
+from io import StringIO
 from datetime import datetime
 from database import (
-    create_connection, get_all_products, add_product, update_product_quantity, 
-    delete_product, get_products_with_details, get_products_by_category,
+    get_all_products, add_product, update_product_quantity, delete_product,
+    get_products_with_details, get_products_by_category,
     get_products_ordered_by_price, get_inventory_value_by_category,
     get_low_stock_products, update_product_price, update_product_details,
-    get_movements_by_product, initialize_database, get_product_by_id,
-    get_all_categories, get_category_name
+    get_movements_by_product, iter_movements_by_product, get_product_by_id, ensure_schema, seed_database,
+    get_all_categories, get_category_name, apply_stock_delta,
+    insert_movimientos_batch, validate_movimientos, get_last_movement_id, get_report_job,
+    get_category_summary, check_category_summary, rebuild_category_summary,
+    get_movement_statistics, search_products, compact_stock_snapshots,
+    archive_movements, purge_deleted_products, get_import_job
 )
+from api import init_api
+from cache import category_catalog, product_cache
+from http_cache import conditional_get, fragment_cache
+from metricas import registro as registro_consultas, ruta_actual
+from migraciones import estado as estado_migraciones, migrar
+import compactacion
+import importacion
+from pool import DEFAULT_CACHED_STATEMENTS, get_pool
+from reportes import request_report
 
 app = Flask(__name__)
-app.config['DATABASE'] = 'inventario.db'
+app.config['DATABASE'] = os.environ.get('INVENTARIO_DB', 'inventario.db')
+app.config['DATABASE_POOL_SIZE'] = 8  # Conexiones libres que se mantienen abiertas
+app.config['DATABASE_PRAGMAS'] = {}   # PRAGMA adicionales (p. ej. {'mmap_size': 0})
+app.config['DATABASE_STATEMENT_CACHE'] = DEFAULT_CACHED_STATEMENTS  # Sentencias preparadas por conexión
+app.config['DATABASE_WORKERS'] = 4    # Hilos para SQLite en el modo ASGI (asgi.py)
 app.config['SECRET_KEY'] = 'clave_secreta_para_flash'  # Necesario para mensajes flash
-
-# En versiones recientes de Flask, reemplazamos before_first_request con un enfoque diferente
-# Creamos una función para inicializar la base de datos
+app.config['PAGE_SIZE'] = 50       # Productos por página en los listados
+app.config['MAX_PAGE_SIZE'] = 500
+app.config['REPORTS_DIR'] = 'reportes_pdf'  # PDF generados y cacheados
+app.config['REPORT_WORKERS'] = 2            # Procesos que convierten HTML a PDF
+app.config['PRODUCT_CACHE_SIZE'] = 1024     # Productos guardados en la caché de get_product_by_id
+app.config['PRODUCT_CACHE_TTL'] = 30        # Segundos que vive una entrada de la caché
+app.config['FRAGMENT_CACHE_SIZE'] = 128     # Páginas renderizadas en caché (0 la desactiva)
+app.config['SEARCH_MIN_CHARS'] = 2          # Letras mínimas para sugerir en /buscar
+app.config['QUERY_METRICS'] = True          # Medir las consultas (metricas.py) y exponerlas en /metrics
+app.config['SLOW_QUERY_MS'] = 100           # Umbral del registro de consultas lentas
+app.config['SLOW_QUERY_LOG'] = 'consultas_lentas.log'  # None para no escribirlo
+app.config['STOCK_SNAPSHOT_INTERVAL'] = 3600    # Segundos entre compactaciones del stock y archivados (0 los desactiva)
+app.config['STOCK_SNAPSHOT_DAYS'] = 1           # Días entre cortes de stock_snapshots
+app.config['STOCK_SNAPSHOT_RETAIN_DAYS'] = 90   # Cortes diarios que se conservan (después, uno por mes)
+app.config['MOVEMENT_ARCHIVE_DIR'] = 'archivo_movimientos'  # Archivos por año de los movimientos viejos
+app.config['MOVEMENT_RETAIN_DAYS'] = None       # Días de movimientos en la base (None no archiva)
+app.config['IMPORTS_DIR'] = 'importaciones'     # Archivos subidos a /importar y sus filas con errores
+app.config['IMPORT_BATCH_SIZE'] = 5000          # Productos por transacción al importar
+
+# Configuración de las cachés al importar. El esquema se verifica la primera
+# vez que se pide una conexión (get_connection_pool) y los datos de ejemplo
+# se cargan con `flask seed`
 def init_app():
     with app.app_context():
-        initialize_database()
+        product_cache.configure(
+            maxsize=app.config['PRODUCT_CACHE_SIZE'],
+            ttl=app.config['PRODUCT_CACHE_TTL']
+        )
+        fragment_cache.maxsize = app.config['FRAGMENT_CACHE_SIZE']
+        registro_consultas.configurar(
+            activo=app.config['QUERY_METRICS'],
+            umbral_lento=app.config['SLOW_QUERY_MS'] / 1000,
+            archivo_lentas=app.config['SLOW_QUERY_LOG']
+        )
 
 # Llamar a init_app durante la inicialización
 init_app()
 
+def opciones_pool():
+    # El pool se crea con la primera llamada a get_pool del proceso, que puede
+    # venir de un hilo en segundo plano: todos le pasan la misma configuración
+    return {
+        'max_idle': app.config['DATABASE_POOL_SIZE'],
+        'pragmas': app.config['DATABASE_PRAGMAS'],
+        'cached_statements': app.config['DATABASE_STATEMENT_CACHE'],
+    }
+
+def get_connection_pool():
+    # Solo la primera llamada del proceso consulta PRAGMA user_version
+    ensure_schema(app.config['DATABASE'])
+    return get_pool(app.config['DATABASE'], **opciones_pool())
+
 def get_db():
     if 'db' not in g:
-        g.db = create_connection()
+        g.db = get_connection_pool().acquire()
     return g.db
 
+# Las consultas se agrupan en /metrics por el endpoint que las originó
+@app.before_request
+def marcar_ruta():
+    g.ruta_token = ruta_actual.set(request.endpoint or '-')
+
+# El hilo de mantenimiento del historial arranca con la primera petición del proceso
+@app.before_request
+def iniciar_compactacion():
+    if not app.config.get('TESTING'):
+        compactacion.iniciar(
+            app.config['DATABASE'],
+            intervalo=app.config['STOCK_SNAPSHOT_INTERVAL'],
+            dias=app.config['STOCK_SNAPSHOT_DAYS'],
+            retener_dias=app.config['STOCK_SNAPSHOT_RETAIN_DAYS'],
+            directorio=app.config['MOVEMENT_ARCHIVE_DIR'],
+            retener_movimientos=app.config['MOVEMENT_RETAIN_DAYS'],
+            opciones_pool=opciones_pool()
+        )
+
+@app.teardown_request
+def desmarcar_ruta(error):
+    token = g.pop('ruta_token', None)
+    if token is not None:
+        ruta_actual.reset(token)
+
 @app.teardown_appcontext
 def close_db(error):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        # La conexión vuelve al pool en lugar de cerrarse
+        get_connection_pool().release(db)
+
+# API JSON en /api/v1 (api.py)
+init_api(app, get_db)
+
+def get_page_size():
+    """Tamaño de página pedido en ?limit=, acotado a MAX_PAGE_SIZE"""
+    limit = request.args.get('limit', app.config['PAGE_SIZE'], type=int)
+    return max(1, min(limit, app.config['MAX_PAGE_SIZE']))
 
 @app.route('/')
 def index():
     db = get_db()
-    productos = get_all_products(db)
-    return render_template('index.html', productos=productos, now=datetime.now())
+    limit = get_page_size()
+    after = request.args.get('after', type=int)
+    productos = get_all_products(db, limit, after)
+    # Cursor de la siguiente página: id del último producto mostrado
+    siguiente = productos[-1][0] if len(productos) == limit else None
+    return render_template('index.html', productos=productos, limit=limit,
+                           siguiente=siguiente, now=datetime.now())
 
 # Ruta para mostrar productos con detalles (JOIN)
 @app.route('/productos_detallados')
+@conditional_get(get_db, ['productos', 'categorias', 'proveedores'])
 def productos_detallados():
     db = get_db()
-    productos = get_products_with_details(db)
-    return render_template('productos_detallados.html', productos=productos, now=datetime.now())
+    limit = get_page_size()
+    after = request.args.get('after', type=int)
+    productos = get_products_with_details(db, limit, after)
+    siguiente = productos[-1][0] if len(productos) == limit else None
+    return render_template('productos_detallados.html', productos=productos, limit=limit,
+                           siguiente=siguiente, now=datetime.now())
 
 # Ruta para filtrar productos por categoría (WHERE)
 @app.route('/productos_por_categoria', methods=['GET'])
 @app.route('/productos_por_categoria/<int:categoria_id>', methods=['GET'])
+@conditional_get(get_db, ['productos', 'categorias'], fragmentos=True)
 def productos_por_categoria(categoria_id=None):
     db = get_db()
     try:
         # Obtener todas las categorías
         categorias = get_all_categories(db)
         
+        # Las estadísticas no dependen de la lista, así que se muestra paginada
+        limit = get_page_size()
+        after = request.args.get('after', type=int)
         if categoria_id:
             # Obtener productos de la categoría seleccionada
-            productos = get_products_by_category(db, categoria_id)
-            categoria_actual = next((cat[1] for cat in categorias if cat[0] == categoria_id), "Categoría no encontrada")
+            productos = get_products_by_category(db, categoria_id, limit, after)
+            categoria_actual = get_category_name(db, categoria_id)
         else:
-            productos = get_all_products(db)
+            productos = get_all_products(db, limit, after)
             categoria_actual = "Todas las categorías"
+        siguiente = productos[-1][0] if len(productos) == limit else None
 
-        # Calcular estadísticas
-        if productos:
-            estadisticas = {
-                'total_productos': len(productos),
-                'valor_total': sum(float(p[5]) * float(p[4]) for p in productos),
-                'stock_promedio': sum(float(p[4]) for p in productos) / len(productos),
-                'productos_sin_stock': len([p for p in productos if int(p[4]) <= 0])
-            }
-        else:
-            estadisticas = {
-                'total_productos': 0,
-                'valor_total': 0.0,
-                'stock_promedio': 0.0,
-                'productos_sin_stock': 0
-            }
+        # Estadísticas leídas del resumen materializado por categoría
+        estadisticas = get_category_summary(db, categoria_id)
 
         return render_template(
             'productos_por_categoria.html',
@@ -90,6 +191,8 @@ def productos_por_categoria(categoria_id=None):
             categoria_actual=categoria_actual,
             categoria_id=categoria_id,
             estadisticas=estadisticas,
+            limit=limit,
+            siguiente=siguiente,
             now=datetime.now()
         )
     except Exception as e:
@@ -98,20 +201,34 @@ def productos_por_categoria(categoria_id=None):
 
 # Ruta para ordenar productos por precio (ORDER BY)
 @app.route('/productos_por_precio/<order>')
+@conditional_get(get_db, ['productos'])
 def productos_por_precio(order):
     db = get_db()
-    productos = get_products_ordered_by_price(db, order)
+    limit = get_page_size()
+    # El cursor llega como "precio,id" del último producto de la página anterior
+    after = None
+    if request.args.get('after'):
+        try:
+            precio, producto_id = request.args['after'].split(',')
+            after = (float(precio), int(producto_id))
+        except ValueError:
+            after = None
+    productos = get_products_ordered_by_price(db, order, limit, after)
+    siguiente = f'{productos[-1][5]!r},{productos[-1][0]}' if len(productos) == limit else None
     orden = "ascendente" if order == "ASC" else "descendente"
-    return render_template('productos_ordenados.html', productos=productos, orden=orden, now=datetime.now())
+    return render_template('productos_ordenados.html', productos=productos, orden=orden, order=order,
+                           limit=limit, siguiente=siguiente, now=datetime.now())
 
 # Ruta para ver valor de inventario por categoría (GROUP BY, HAVING)
 @app.route('/valor_por_categoria')
+@conditional_get(get_db, ['productos', 'categorias'])
 def valor_por_categoria():
     db = get_db()
     valores = get_inventory_value_by_category(db)
     return render_template('valor_inventario.html', valores=valores, now=datetime.now())
 
 @app.route('/movimientos/<int:product_id>')
+@conditional_get(get_db, lambda product_id: [f'producto:{product_id}'], fragmentos=True)
 def movimientos(product_id):
     db = get_db()
     try:
@@ -135,13 +252,8 @@ def movimientos(product_id):
         # Obtener movimientos
         movimientos = get_movements_by_product(db, product_id, fecha_inicio, fecha_fin, tipo_movimiento)
 
-        # Calcular estadísticas
-        estadisticas = {
-            'total_entradas': sum(m['cantidad'] for m in movimientos if m['tipo'] == 'entrada'),
-            'total_salidas': sum(m['cantidad'] for m in movimientos if m['tipo'] == 'salida'),
-            'valor_total': sum(m['cantidad'] * m['precio'] for m in movimientos),
-            'total_movimientos': len(movimientos)
-        }
+        # Estadísticas calculadas por SQLite en una sola consulta
+        estadisticas = get_movement_statistics(db, product_id, fecha_inicio, fecha_fin, tipo_movimiento)
 
         return render_template('movimientos.html',
                              producto=producto,
@@ -152,40 +264,71 @@ def movimientos(product_id):
         flash(f'Error: {str(e)}', 'error')
         return redirect(url_for('index'))
 
+# Ruta para registrar un lote de movimientos (JSON) en una sola transacción
+@app.route('/movimientos/lote', methods=['POST'])
+def movimientos_lote():
+    datos = request.get_json(silent=True)
+    movimientos = datos.get('movimientos') if isinstance(datos, dict) else datos
+    if not isinstance(movimientos, list):
+        return jsonify({'error': 'Se esperaba una lista de movimientos'}), 400
+
+    errores = validate_movimientos(movimientos)
+    if errores:
+        return jsonify({'error': 'Lote inválido', 'detalles': errores}), 400
+
+    db = get_db()
+    insertados = insert_movimientos_batch(db, movimientos)
+    if insertados is None:
+        return jsonify({'error': 'Lote rechazado: producto inexistente o stock insuficiente'}), 409
+
+    return jsonify({'insertados': insertados}), 201
+
+# Columnas de la exportación de movimientos: (encabezado, valor de la fila)
+COLUMNAS_EXPORTACION = [
+    ('Fecha', lambda m: m['fecha'].strftime('%Y-%m-%d %H:%M:%S')),
+    ('Tipo', lambda m: m['tipo']),
+    ('Cantidad', lambda m: m['cantidad']),
+    ('Stock Anterior', lambda m: m['stock_anterior']),
+    ('Stock Posterior', lambda m: m['stock_posterior']),
+    ('Precio', lambda m: m['precio']),
+    ('Usuario', lambda m: m['usuario']),
+    ('Descripción', lambda m: m['descripcion']),
+]
+ANCHO_MAXIMO_COLUMNA = 60
+
 @app.route('/exportar_movimientos/<int:product_id>')
 def exportar_movimientos(product_id):
     try:
         db = get_db()
         producto = get_product_by_id(db, product_id)
-        movimientos = get_movements_by_product(db, product_id)
-
-        # Crear DataFrame con pandas
-        df = pd.DataFrame([{
-            'Fecha': m['fecha'].strftime('%Y-%m-%d %H:%M:%S'),
-            'Tipo': m['tipo'],
-            'Cantidad': m['cantidad'],
-            'Stock Anterior': m['stock_anterior'],
-            'Stock Posterior': m['stock_posterior'],
-            'Precio': m['precio'],
-            'Usuario': m['usuario'],
-            'Descripción': m['descripcion']
-        } for m in movimientos])
-
-        # Crear un buffer en memoria
-        output = BytesIO()
-        
-        # Escribir el DataFrame en el buffer como Excel
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Movimientos', index=False)
-            
-            # Obtener la hoja de trabajo
-            worksheet = writer.sheets['Movimientos']
-            
-            # Ajustar el ancho de las columnas
-            for idx, col in enumerate(df.columns):
-                max_length = max(df[col].astype(str).apply(len).max(), len(col))
-                worksheet.set_column(idx, idx, max_length + 2)
+        if not producto:
+            flash('Producto no encontrado', 'error')
+            return redirect(url_for('index'))
+
+        # El libro se escribe en un archivo temporal en modo constant_memory:
+        # xlsxwriter vuelca cada fila al disco en cuanto se completa
+        import xlsxwriter
+
+        output = tempfile.TemporaryFile()
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        worksheet = workbook.add_worksheet('Movimientos')
+
+        # Anchos calculados de forma incremental mientras se escriben las filas
+        anchos = [len(encabezado) for encabezado, _ in COLUMNAS_EXPORTACION]
+        for col, (encabezado, _) in enumerate(COLUMNAS_EXPORTACION):
+            worksheet.write(0, col, encabezado)
 
+        for fila, movimiento in enumerate(iter_movements_by_product(db, product_id), start=1):
+            for col, (_, valor) in enumerate(COLUMNAS_EXPORTACION):
+                dato = valor(movimiento)
+                worksheet.write(fila, col, dato)
+                if dato is not None:
+                    anchos[col] = max(anchos[col], len(str(dato)))
+
+        for col, ancho in enumerate(anchos):
+            worksheet.set_column(col, col, min(ancho, ANCHO_MAXIMO_COLUMNA) + 2)
+
+        workbook.close()
         output.seek(0)
         
         return send_file(
@@ -197,41 +340,115 @@ def exportar_movimientos(product_id):
 
     except Exception as e:
         flash(f'Error al exportar: {str(e)}', 'error')
-        return redirect(url_for('movimientos_producto', product_id=product_id))
+        return redirect(url_for('movimientos', product_id=product_id))
+
+# Exportación en CSV generada por bloques mientras se envía la respuesta
+@app.route('/exportar_movimientos/<int:product_id>/csv')
+def exportar_movimientos_csv(product_id):
+    db = get_db()
+    producto = get_product_by_id(db, product_id)
+    if not producto:
+        flash('Producto no encontrado', 'error')
+        return redirect(url_for('index'))
 
+    def generar(filas_por_bloque=1000):
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([encabezado for encabezado, _ in COLUMNAS_EXPORTACION])
+        for i, movimiento in enumerate(iter_movements_by_product(db, product_id), start=1):
+            writer.writerow([valor(movimiento) for _, valor in COLUMNAS_EXPORTACION])
+            if i % filas_por_bloque == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(generar()), mimetype='text/csv')
+    response.headers.set(
+        'Content-Disposition', 'attachment',
+        filename=f'movimientos_{producto["nombre"]}_{datetime.now().strftime("%Y%m%d")}.csv'
+    )
+    return response
+
+# Los PDF se generan en segundo plano: la ruta encola el trabajo y redirige
+# a la página de estado, que se refresca hasta que el archivo está listo
 @app.route('/generar_pdf_movimientos/<int:product_id>')
 def generar_pdf_movimientos(product_id):
     try:
         db = get_db()
         producto = get_product_by_id(db, product_id)
-        movimientos = get_movements_by_product(db, product_id)
-        
-        # Renderizar el template HTML para el PDF
-        html = render_template(
-            'movimientos_pdf.html',
-            producto=producto,
-            movimientos=movimientos,
-            now=datetime.now()
-        )
-        
-        # Convertir HTML a PDF
-        pdf = pdfkit.from_string(html, False)
-        
-        # Crear respuesta con el PDF
-        response = send_file(
-            BytesIO(pdf),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'movimientos_{producto["nombre"]}_{datetime.now().strftime("%Y%m%d")}.pdf'
+        if not producto:
+            flash('Producto no encontrado', 'error')
+            return redirect(url_for('index'))
+
+        def render_html():
+            movimientos = get_movements_by_product(db, product_id)
+            return render_template(
+                'movimientos_pdf.html',
+                producto=producto,
+                movimientos=movimientos,
+                estadisticas=get_movement_statistics(db, product_id),
+                now=datetime.now()
+            )
+
+        reporte = request_report(
+            db, app.config['DATABASE'], app.config['REPORTS_DIR'],
+            product_id, get_last_movement_id(db, product_id), render_html,
+            max_workers=app.config['REPORT_WORKERS'], opciones_pool=opciones_pool()
         )
-        
-        return response
+        if reporte is None:
+            flash('Error al encolar el reporte', 'error')
+            return redirect(url_for('movimientos', product_id=product_id))
+
+        return redirect(url_for('estado_reporte', job_id=reporte['id']))
 
     except Exception as e:
         flash(f'Error al generar PDF: {str(e)}', 'error')
-        return redirect(url_for('movimientos_producto', product_id=product_id))
+        return redirect(url_for('movimientos', product_id=product_id))
+
+@app.route('/reportes/<int:job_id>')
+def estado_reporte(job_id):
+    db = get_db()
+    reporte = get_report_job(db, job_id)
+    if reporte is None:
+        flash('Reporte no encontrado', 'error')
+        return redirect(url_for('index'))
+
+    if request.args.get('formato') == 'json':
+        return jsonify(reporte)
+
+    producto = get_product_by_id(db, reporte['producto_id'])
+    return render_template('reporte_estado.html', reporte=reporte, producto=producto, now=datetime.now())
+
+@app.route('/reportes/<int:job_id>/descargar')
+def descargar_reporte(job_id):
+    db = get_db()
+    reporte = get_report_job(db, job_id)
+    if reporte is None or reporte['estado'] != 'listo':
+        flash('El reporte todavía no está disponible', 'error')
+        return redirect(url_for('estado_reporte', job_id=job_id))
+
+    producto = get_product_by_id(db, reporte['producto_id'])
+    return send_file(
+        os.path.abspath(reporte['archivo']),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'movimientos_{producto["nombre"]}_{datetime.now().strftime("%Y%m%d")}.pdf'
+    )
+
+# Búsqueda de productos (productos_fts). Con ?formato=json devuelve las
+# sugerencias para escribir y sugerir desde buscar.html
+@app.route('/buscar')
+def buscar():
+    q = request.args.get('q', '').strip()
+    if request.args.get('formato') == 'json':
+        limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+        productos = search_products(get_db(), q, limit) if len(q) >= app.config['SEARCH_MIN_CHARS'] else []
+        return jsonify({'q': q, 'datos': productos})
+    productos = search_products(get_db(), q, get_page_size()) if q else []
+    return render_template('buscar.html', q=q, productos=productos,
+                           minimo=app.config['SEARCH_MIN_CHARS'], now=datetime.now())
 
-# Ruta para stock bajo
 @app.route('/stock_bajo')
 def stock_bajo():
     db = get_db()
@@ -267,6 +484,59 @@ def agregar_producto():
     # Si es GET, mostrar formulario de agregar
     return render_template('agregar_producto.html', now=datetime.now())
 
+# Importación masiva de productos desde CSV o XLSX: el archivo se guarda y se
+# importa en segundo plano; la página de estado se refresca hasta terminar
+EXTENSIONES_IMPORTACION = ('.csv', '.xlsx', '.xlsm')
+
+@app.route('/importar', methods=['GET', 'POST'])
+def importar():
+    if request.method == 'POST':
+        archivo = request.files.get('archivo')
+        nombre = secure_filename(archivo.filename) if archivo else ''
+        if not nombre.lower().endswith(EXTENSIONES_IMPORTACION):
+            flash('Seleccione un archivo CSV o XLSX', 'error')
+            return redirect(url_for('importar'))
+
+        os.makedirs(app.config['IMPORTS_DIR'], exist_ok=True)
+        ruta = os.path.join(app.config['IMPORTS_DIR'], f'{datetime.now().strftime("%Y%m%d%H%M%S")}_{nombre}')
+        archivo.save(ruta)
+        job_id = importacion.iniciar(
+            app.config['DATABASE'], ruta, f'{ruta}.errores.csv',
+            tamano_lote=app.config['IMPORT_BATCH_SIZE'],
+            crear_faltantes=request.form.get('crear_faltantes') == 'on',
+            opciones_pool=opciones_pool()
+        )
+        if job_id is None:
+            flash('No se pudo iniciar la importación', 'error')
+            return redirect(url_for('importar'))
+        return redirect(url_for('estado_importacion', job_id=job_id))
+
+    return render_template('importar.html', importacion=None, now=datetime.now())
+
+@app.route('/importar/<int:job_id>')
+def estado_importacion(job_id):
+    importacion_actual = get_import_job(get_db(), job_id)
+    if importacion_actual is None:
+        flash('Importación no encontrada', 'error')
+        return redirect(url_for('importar'))
+
+    if request.args.get('formato') == 'json':
+        return jsonify(importacion_actual)
+    return render_template('importar.html', importacion=importacion_actual, now=datetime.now())
+
+@app.route('/importar/<int:job_id>/errores')
+def errores_importacion(job_id):
+    importacion_actual = get_import_job(get_db(), job_id)
+    if importacion_actual is None or not importacion_actual['archivo_errores']:
+        flash('La importación no tiene filas con errores', 'error')
+        return redirect(url_for('importar'))
+    return send_file(
+        os.path.abspath(importacion_actual['archivo_errores']),
+        mimetype='text/csv',
+        as_attachment=True,
+        download_name=f'errores_{importacion_actual["archivo"]}.csv'
+    )
+
 @app.route('/actualizar_producto/<int:product_id>', methods=['GET', 'POST'])
 def actualizar_producto(product_id):
     db = get_db()
@@ -292,23 +562,20 @@ def actualizar_producto(product_id):
                 flash('Producto no encontrado', 'error')
                 return redirect(url_for('index'))
 
-            cantidad_actual = producto_actual['cantidad']
-            
-            # Calcular nueva cantidad
-            nueva_cantidad = cantidad_actual + cantidad_agregar - cantidad_retirar
-            
-            if nueva_cantidad < 0:
-                flash('No se puede retirar más cantidad de la disponible', 'error')
-                return redirect(url_for('actualizar_producto', product_id=product_id))
-
-            # Actualizar la cantidad usando update_product_quantity
-            if not update_product_quantity(db, product_id, nueva_cantidad):
-                flash('Error al actualizar la cantidad', 'error')
-                return redirect(url_for('actualizar_producto', product_id=product_id))
+            # Aplicar la diferencia de forma atómica; el stock nunca queda negativo
+            diferencia = cantidad_agregar - cantidad_retirar
+            if diferencia != 0:
+                sentido = 'entrada' if diferencia > 0 else 'salida'
+                if apply_stock_delta(
+                    db, product_id, diferencia, 'ajuste',
+                    f'Actualización manual: {sentido} de {abs(diferencia)} unidades',
+                    'sistema'
+                ) is None:
+                    flash('No se puede retirar más cantidad de la disponible', 'error')
+                    return redirect(url_for('actualizar_producto', product_id=product_id))
 
             # Actualizar otros detalles del producto
-            if not update_product_details(
-                db, product_id, 
+            if not update_product_details(db, product_id, 
                 nombre=nombre,
                 descripcion=descripcion,
                 precio=nuevo_precio,
@@ -356,11 +623,141 @@ def eliminar_producto(product_id):
     result = delete_product(db, product_id)
     
     if result:
+        # Sus movimientos se borran por lotes en el hilo de mantenimiento
+        compactacion.avisar()
         flash('Producto eliminado correctamente', 'success')
     else:
         flash('Error al eliminar el producto', 'error')
     
     return redirect(url_for('index'))
 
+# Verificar el resumen por categoría contra los productos: flask verificar-resumen [--reparar]
+@app.cli.command('verificar-resumen')
+@click.option('--reparar', is_flag=True, help='Reconstruir el resumen si hay diferencias')
+def verificar_resumen(reparar):
+    db = get_db()
+    diferencias = check_category_summary(db)
+    for categoria_id, campo, real, calculado in diferencias:
+        click.echo(f'categoria {categoria_id}: {campo} = {real} (esperado {calculado})')
+    if not diferencias:
+        click.echo('El resumen por categoría es consistente')
+    elif reparar and rebuild_category_summary(db):
+        click.echo('Resumen reconstruido')
+
+# Cargar los datos de ejemplo en una base vacía: flask seed
+@app.cli.command('seed')
+def seed():
+    if seed_database(app.config['DATABASE']):
+        click.echo('Datos iniciales insertados')
+    else:
+        click.echo('La base ya tiene productos; no se insertó nada')
+
+# Aplicar migraciones pendientes con sus backfills por lotes: flask migrar [--lote N] [--estado]
+@app.cli.command('migrar')
+@click.option('--lote', default=5000, show_default=True, help='Filas por lote de backfill')
+@click.option('--estado', 'solo_estado', is_flag=True, help='Mostrar las migraciones registradas')
+def migrar_cmd(lote, solo_estado):
+    db = get_db()
+    if solo_estado:
+        for version, (nombre, estado, progreso, filas, aplicada, duracion) in estado_migraciones(db).items():
+            click.echo(f'{version:>4} {nombre:<24} {estado:<9} id {progreso:>10} {filas:>10} filas {duracion:8.2f}s')
+        return
+
+    def informar(migracion, actual, final, filas, segundos):
+        ritmo = filas / segundos if segundos else 0
+        click.echo(f'  {migracion.nombre}: id {actual}/{final} ({actual * 100 // final}%), '
+                   f'{filas} filas, {ritmo:,.0f} filas/s')
+
+    resultados = migrar(db, tamano_lote=lote, progreso=informar)
+    if resultados is None:
+        click.echo('La migración falló; se puede reintentar y continúa donde quedó')
+    elif not resultados:
+        click.echo('El esquema está al día')
+    for version, nombre, filas, segundos in resultados or []:
+        click.echo(f'{version} {nombre}: {filas} filas en {segundos:.2f}s')
+
+# Escribir los cortes de stock pendientes: flask compactar-stock [--desde AAAA-MM-DD] [--dias N]
+@app.cli.command('compactar-stock')
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Fecha del primer corte si todavía no hay ninguno (por defecto hoy)')
+@click.option('--dias', default=None, type=int, help='Días entre cortes')
+def compactar_stock(desde, dias):
+    db = get_db()
+    cortes = compact_stock_snapshots(
+        db, dias=dias or app.config['STOCK_SNAPSHOT_DAYS'], desde=desde,
+        retener_dias=app.config['STOCK_SNAPSHOT_RETAIN_DAYS']
+    )
+    if cortes is None:
+        click.echo('La compactación falló; se puede reintentar y continúa donde quedó')
+        return
+    for corte, productos, segundos in cortes:
+        click.echo(f'{corte}: {productos} productos en {segundos:.2f}s')
+    if not cortes:
+        click.echo('Los cortes de stock están al día')
+
+# Archivar los movimientos viejos y borrar el historial de los productos
+# eliminados: flask archivar-movimientos [--retener-dias N] [--lote N]
+@app.cli.command('archivar-movimientos')
+@click.option('--retener-dias', type=int, default=None, help='Días de movimientos que quedan en la base')
+@click.option('--lote', default=5000, show_default=True, help='Movimientos por transacción')
+def archivar_movimientos(retener_dias, lote):
+    db = get_db()
+    retener_dias = retener_dias or app.config['MOVEMENT_RETAIN_DAYS']
+    if retener_dias:
+        movidos = archive_movements(db, app.config['MOVEMENT_ARCHIVE_DIR'], retener_dias, lote)
+        if movidos is None:
+            click.echo('El archivado falló; se puede reintentar y continúa donde quedó')
+            return
+        for periodo, filas in movidos:
+            click.echo(f'{periodo}: {filas} movimientos archivados')
+        if not movidos:
+            click.echo('No hay movimientos para archivar')
+    terminados = purge_deleted_products(db, lote)
+    if terminados:
+        click.echo(f'Historial borrado de {terminados} producto(s) eliminados')
+
+# Importar productos desde la consola: flask importar catalogo.csv [--errores errores.csv] [--lote N]
+@app.cli.command('importar')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--errores', 'archivo_errores', help='CSV donde se copian las filas con errores')
+@click.option('--lote', default=5000, show_default=True, help='Productos por transacción')
+@click.option('--sin-crear', is_flag=True, help='Rechazar categorías y proveedores que no existen')
+def importar_cmd(archivo, archivo_errores, lote, sin_crear):
+    def informar(resumen):
+        ritmo = resumen['filas'] / resumen['segundos'] if resumen['segundos'] else 0
+        click.echo(f"  {resumen['filas']} filas, {resumen['insertados']} nuevos, "
+                   f"{resumen['actualizados']} actualizados, {resumen['errores']} errores, {ritmo:,.0f} filas/s")
+
+    resumen = importacion.importar_productos(
+        get_db(), archivo, archivo_errores or f'{archivo}.errores.csv',
+        tamano_lote=lote, crear_faltantes=not sin_crear, progreso=informar
+    )
+    click.echo(f"{resumen['filas']} filas en {resumen['segundos']:.1f}s: {resumen['insertados']} nuevos, "
+               f"{resumen['actualizados']} actualizados, {resumen['sin_cambios']} sin cambios, "
+               f"{resumen['errores']} con errores")
+    if resumen['archivo_errores']:
+        click.echo(f"Filas con errores en {resumen['archivo_errores']}")
+    if resumen['error']:
+        click.echo(f"La importación se detuvo: {resumen['error']}. Se puede repetir sin duplicar productos")
+
+# Estadísticas del pool de conexiones
+@app.route('/estado_pool')
+def estado_pool():
+    return jsonify(get_connection_pool().stats())
+
+# Estadísticas de la caché de productos y del catálogo de categorías
+@app.route('/estado_cache')
+def estado_cache():
+    return jsonify({
+        'productos': product_cache.stats(),
+        'categorias': category_catalog.stats(),
+        'paginas': fragment_cache.stats()
+    })
+
+# Latencias, filas y errores por sentencia y ruta en formato Prometheus
+@app.route('/metrics')
+def metrics():
+    return Response(registro_consultas.prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
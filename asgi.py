@@ -0,0 +1,209 @@
+"""Modo de despliegue ASGI.
+
+Las rutas de la API JSON y el alta de lotes de movimientos se atienden con
+handlers asíncronos que ejecutan SQLite en database_async (un pool de hilos
+acotado con una conexión por hilo). El resto de las rutas, incluidas las
+respuestas NDJSON en streaming, pasan a la aplicación Flask a través de
+asgiref.
+
+    uvicorn asgi:app --workers 2
+"""
+import json
+import re
+from urllib.parse import parse_qsl
+
+import database_async as db
+from api import (
+    CAMPOS_CATEGORIA, CAMPOS_MOVIMIENTO, ErrorPeticion, armar_pagina, campos_pedidos,
+    columnas_producto, cursor_movimiento, dumps, fecha_filtro, fila_movimiento, fila_producto,
+    filas_categorias, filas_valor, limite, siguiente_movimiento
+)
+from app import app as flask_app, opciones_pool
+from database import CAMPOS_PRODUCTO, ensure_schema, validate_movimientos
+from metricas import ruta_actual
+
+from werkzeug.http import parse_accept_header
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # sin asgiref solo se atienden las rutas asíncronas
+    WsgiToAsgi = None
+
+_wsgi = WsgiToAsgi(flask_app) if WsgiToAsgi is not None else None
+
+
+# Handlers asíncronos: reciben la query string como dict y el cuerpo en bytes
+# y devuelven (status, objeto a serializar)
+
+async def productos(consulta, cuerpo):
+    campos = campos_pedidos(CAMPOS_PRODUCTO, consulta.get('campos', ''))
+    limit = limite(consulta.get('limit'), False, flask_app.config)
+    columnas = columnas_producto(campos)
+    filas = await db.iter_products(
+        columnas, limit, _entero(consulta, 'after'), _entero(consulta, 'categoria_id')
+    )
+    return 200, armar_pagina(filas, limit, fila_producto(columnas, campos), lambda fila: fila[0])
+
+
+async def producto(consulta, cuerpo, product_id):
+    campos = campos_pedidos(CAMPOS_PRODUCTO, consulta.get('campos', ''))
+    producto = await db.get_product_by_id(product_id)
+    if producto is None:
+        return 404, {'error': 'Producto no encontrado'}
+    return 200, {campo: producto.get(campo) for campo in campos}
+
+
+async def categorias(consulta, cuerpo):
+    campos = campos_pedidos(CAMPOS_CATEGORIA, consulta.get('campos', ''))
+    return 200, {'datos': filas_categorias(await db.get_all_categories(), campos)}
+
+
+async def valor_por_categoria(consulta, cuerpo):
+    # Mismo criterio que api.valor_por_categoria: ?fecha= valúa el stock al cierre de ese día
+    fecha = fecha_filtro('fecha', consulta.get('fecha'))
+    if fecha is not None:
+        return 200, {'datos': filas_valor(await db.get_inventory_value_at(fecha.date()))}
+    return 200, {'datos': filas_valor(await db.get_inventory_value_by_category())}
+
+
+async def movimientos(consulta, cuerpo, product_id):
+    campos = campos_pedidos(CAMPOS_MOVIMIENTO, consulta.get('campos', ''))
+    limit = limite(consulta.get('limit'), False, flask_app.config)
+    after = cursor_movimiento(consulta.get('after'))
+    fecha_inicio = fecha_filtro('fecha_inicio', consulta.get('fecha_inicio'))
+    fecha_fin = fecha_filtro('fecha_fin', consulta.get('fecha_fin'))
+
+    if await db.get_product_by_id(product_id) is None:
+        return 404, {'error': 'Producto no encontrado'}
+    filas = await db.iter_movements_by_product(
+        product_id, fecha_inicio, fecha_fin, consulta.get('tipo'), limit=limit, after=after
+    )
+    return 200, armar_pagina(filas, limit, fila_movimiento(campos), siguiente_movimiento)
+
+
+async def movimientos_lote(consulta, cuerpo):
+    try:
+        datos = json.loads(cuerpo or b'null')
+    except ValueError:
+        datos = None
+    movimientos = datos.get('movimientos') if isinstance(datos, dict) else datos
+    if not isinstance(movimientos, list):
+        return 400, {'error': 'Se esperaba una lista de movimientos'}
+
+    errores = validate_movimientos(movimientos)
+    if errores:
+        return 400, {'error': 'Lote inválido', 'detalles': errores}
+
+    insertados = await db.insert_movimientos_batch(movimientos)
+    if insertados is None:
+        return 409, {'error': 'Lote rechazado: producto inexistente o stock insuficiente'}
+    return 201, {'insertados': insertados}
+
+
+def _entero(consulta, nombre):
+    valor = consulta.get(nombre)
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErrorPeticion(f'{nombre} debe ser un entero') from None
+
+
+# (método, patrón, handler, endpoint de Flask con el que se etiquetan las métricas)
+RUTAS = [
+    ('GET', re.compile(r'/api/v1/productos'), productos, 'api.productos'),
+    ('GET', re.compile(r'/api/v1/productos/(?P<product_id>\d+)'), producto, 'api.producto'),
+    ('GET', re.compile(r'/api/v1/productos/(?P<product_id>\d+)/movimientos'), movimientos, 'api.movimientos'),
+    ('GET', re.compile(r'/api/v1/categorias'), categorias, 'api.categorias'),
+    ('GET', re.compile(r'/api/v1/valor_por_categoria'), valor_por_categoria, 'api.valor_por_categoria'),
+    ('POST', re.compile(r'/movimientos/lote'), movimientos_lote, 'movimientos_lote'),
+]
+
+
+def _buscar_ruta(metodo, ruta):
+    for metodo_ruta, patron, handler, endpoint in RUTAS:
+        coincidencia = patron.fullmatch(ruta)
+        if coincidencia and metodo_ruta == metodo:
+            parametros = {nombre: int(valor) for nombre, valor in coincidencia.groupdict().items()}
+            return handler, endpoint, parametros
+    return None, None, None
+
+
+def _es_ndjson(scope, consulta):
+    """Mismo criterio que api.es_ndjson: ?formato=ndjson o Accept: application/x-ndjson"""
+    if consulta.get('formato') == 'ndjson':
+        return True
+    accept = next((valor for nombre, valor in scope['headers'] if nombre == b'accept'), b'')
+    return parse_accept_header(accept.decode('latin-1')).best == 'application/x-ndjson'
+
+
+async def _leer_cuerpo(receive):
+    partes = []
+    while True:
+        mensaje = await receive()
+        partes.append(mensaje.get('body', b''))
+        if not mensaje.get('more_body'):
+            return b''.join(partes)
+
+
+async def _responder(send, status, cuerpo):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(cuerpo)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': cuerpo})
+
+
+def configurar():
+    """Crear el executor de SQLite con la configuración de la aplicación Flask"""
+    ensure_schema(flask_app.config['DATABASE'])
+    return db.configure(
+        flask_app.config['DATABASE'],
+        max_workers=flask_app.config['DATABASE_WORKERS'],
+        **opciones_pool()
+    )
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            configurar()
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            db.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope['type'] == 'http':
+        consulta = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        handler, endpoint, parametros = _buscar_ruta(scope['method'], scope['path'])
+        # El streaming NDJSON lo sirve la aplicación Flask
+        if handler is not None and not _es_ndjson(scope, consulta):
+            cuerpo = await _leer_cuerpo(receive)
+            if not db.configured():
+                # Servidor sin soporte de lifespan
+                configurar()
+            # Misma etiqueta de ruta que en las métricas de la aplicación Flask
+            token = ruta_actual.set(endpoint)
+            try:
+                status, respuesta = await handler(consulta, cuerpo, **parametros)
+            except ErrorPeticion as e:
+                status, respuesta = 400, {'error': str(e), **e.detalles}
+            finally:
+                ruta_actual.reset(token)
+            return await _responder(send, status, dumps(respuesta))
+
+    if _wsgi is None:
+        return await _responder(send, 501, dumps({'error': 'Ruta disponible solo con asgiref instalado'}))
+    return await _wsgi(scope, receive, send)
@@ -0,0 +1,18 @@
+"""Scripts de benchmark para la capa de datos del inventario.
+
+Se ejecutan como módulos desde la raíz del proyecto, por ejemplo:
+
+    python -m bench.stress_movimientos
+"""
+import os
+import tempfile
+
+from database import initialize_database
+
+
+def crear_base_temporal(nombre='bench.db'):
+    """Crear una base de datos inicializada en un directorio temporal"""
+    directorio = tempfile.mkdtemp(prefix='inventario_bench_')
+    ruta = os.path.join(directorio, nombre)
+    initialize_database(ruta)
+    return ruta
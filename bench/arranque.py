@@ -0,0 +1,65 @@
+"""Arranque en frío de la aplicación: import de app.py y primera petición.
+
+Cada medición corre en un proceso nuevo de Python (sin módulos ni .pyc en
+memoria compartida con el proceso que mide) y reporta la mediana de:
+
+- import: tiempo de `import app`;
+- primera: la primera petición GET / con el cliente de pruebas de Flask,
+  que incluye la verificación del esquema (ensure_schema) y abrir el pool;
+- total: ambos sumados.
+
+Escenarios: 'lista' usa una base ya inicializada (PRAGMA user_version al
+día, solo se lee el pragma) y 'nueva' un archivo vacío por medición (crea el
+esquema completo en la primera petición).
+
+    python -m bench.arranque --repeticiones 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench import crear_base_temporal
+
+MEDIR = '''
+import json, time
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+respuesta = app.app.test_client().get('/')
+fin = time.perf_counter()
+assert respuesta.status_code == 200, respuesta.status_code
+print(json.dumps({'import': importado - inicio, 'primera': fin - importado, 'total': fin - inicio}))
+'''
+
+
+def medir(base):
+    entorno = dict(os.environ, INVENTARIO_DB=base)
+    salida = subprocess.run([sys.executable, '-c', MEDIR], env=entorno, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    lista = crear_base_temporal()
+    escenarios = {
+        'lista': lambda: lista,
+        'nueva': lambda: os.path.join(tempfile.mkdtemp(prefix='inventario_bench_'), 'nueva.db'),
+    }
+
+    print(f"{'escenario':<10} {'import (ms)':>12} {'primera (ms)':>13} {'total (ms)':>11}")
+    for nombre, base in escenarios.items():
+        medidas = [medir(base()) for _ in range(args.repeticiones)]
+        medianas = {clave: statistics.median(m[clave] for m in medidas) * 1000 for clave in medidas[0]}
+        print(f"{nombre:<10} {medianas['import']:>12.1f} {medianas['primera']:>13.1f} {medianas['total']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
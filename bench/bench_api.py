@@ -0,0 +1,106 @@
+"""Latencia y rendimiento de la API JSON frente a las rutas HTML.
+
+Con el cliente de pruebas de Flask (sin red, así se mide solo la
+aplicación) pide la misma información por la ruta HTML y por /api/v1:
+una página de productos, el historial completo de un producto como página
+HTML, como páginas JSON recorridas con el cursor y como NDJSON en streaming.
+
+    python -m bench.bench_api --productos 20000 --movimientos 100000
+"""
+import argparse
+import statistics
+import time
+
+from bench import crear_base_temporal
+
+
+def cargar(conn, productos, movimientos):
+    conn.executemany(
+        "INSERT INTO productos(numero_serie, nombre, cantidad, precio, categoria_id) VALUES(?, ?, ?, ?, ?)",
+        ((f'API{i}', f'Producto {i}', i % 50, 1.0 + i % 100, 1 + i % 15) for i in range(productos))
+    )
+    conn.executemany('''INSERT INTO movimientos(
+                            producto_id, tipo, cantidad, stock_anterior,
+                            stock_posterior, precio, fecha, usuario, descripcion
+                        ) VALUES(1, ?, 1, 0, 1, 10.0, ?, 'bench', 'Venta')''',
+                     (('entrada' if i % 2 else 'salida',
+                       f'2024-01-{1 + i // 86400 % 28:02d} {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}')
+                      for i in range(movimientos)))
+    conn.commit()
+
+
+def medir(cliente, url, repeticiones):
+    """Latencias en ms y bytes de la respuesta"""
+    latencias = []
+    tamano = 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        tamano = len(respuesta.get_data())
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        assert respuesta.status_code == 200, (url, respuesta.status_code)
+    return latencias, tamano
+
+
+def recorrer_paginas(cliente, url):
+    """Recorrer todas las páginas JSON siguiendo el cursor; devuelve filas leídas"""
+    filas = 0
+    siguiente = None
+    while True:
+        respuesta = cliente.get(url, query_string={'limit': 500, 'after': siguiente} if siguiente else {'limit': 500})
+        datos = respuesta.get_json()
+        filas += len(datos['datos'])
+        siguiente = datos['siguiente']
+        if siguiente is None:
+            return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--movimientos', type=int, default=100000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    from app import app, get_connection_pool
+    from http_cache import fragment_cache
+
+    app.config['DATABASE'] = crear_base_temporal()
+    # Medir el render real de la ruta HTML, no la caché de páginas
+    fragment_cache.maxsize = 0
+    pool = get_connection_pool()
+    conn = pool.acquire()
+    cargar(conn, args.productos, args.movimientos)
+    pool.release(conn)
+
+    cliente = app.test_client()
+    casos = [
+        ('html: /', '/?limit=50'),
+        ('api: productos', '/api/v1/productos?limit=50'),
+        ('api: productos[campos]', '/api/v1/productos?limit=50&campos=id,nombre,precio'),
+        ('html: /actualizar_producto/1', '/actualizar_producto/1'),
+        ('api: productos/1', '/api/v1/productos/1'),
+        ('html: /movimientos/1', '/movimientos/1'),
+        ('api: movimientos ndjson', '/api/v1/productos/1/movimientos?formato=ndjson'),
+    ]
+    print(f"{'caso':<26} {'p50 (ms)':>9} {'p99 (ms)':>9} {'KB':>9}")
+    for nombre, url in casos:
+        latencias, tamano = medir(cliente, url, args.repeticiones)
+        latencias.sort()
+        p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+        print(f"{nombre:<26} {statistics.median(latencias):>9.2f} {p99:>9.2f} {tamano / 1024:>9.1f}")
+
+    inicio = time.perf_counter()
+    filas = recorrer_paginas(cliente, '/api/v1/productos/1/movimientos')
+    duracion = time.perf_counter() - inicio
+    print(f"api: movimientos paginados {filas} filas en {duracion:.2f} s ({filas / duracion:,.0f} filas/s)")
+
+    inicio = time.perf_counter()
+    respuesta = cliente.get('/api/v1/productos?formato=ndjson')
+    filas = respuesta.get_data().count(b'\n')
+    duracion = time.perf_counter() - inicio
+    print(f"api: productos ndjson      {filas} filas en {duracion:.2f} s ({filas / duracion:,.0f} filas/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Búsqueda de productos: LIKE '%texto%' contra search_products (FTS5).
+
+Genera el catálogo con bench.generador y simula a alguien escribiendo en
+/buscar: cada consulta se pide letra por letra ("ca", "cab", "cabl"...),
+como las pediría el script de sugerencias. Para cada método informa p50 y
+p99 en ms sobre todas las pulsaciones.
+
+    python -m bench.bench_busqueda --productos 1000000
+    python -m bench.bench_busqueda --base /tmp/grande.db
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from bench.generador import generar
+from database import search_products
+from pool import ConnectionPool
+
+CONSULTAS = ['cable boreal', 'monitor', 'auriculares inalámbricos', 'taladro puma', 'SN00001234', 'zafiro ax']
+
+
+def like(conn, q, limit=20):
+    """Búsqueda previa a productos_fts: recorrido completo con LIKE"""
+    patron = f'%{q}%'
+    return conn.execute('''
+        SELECT id, numero_serie, nombre, descripcion, cantidad, precio, categoria_id
+        FROM productos
+        WHERE nombre LIKE ? OR descripcion LIKE ? OR numero_serie LIKE ?
+        LIMIT ?
+    ''', (patron, patron, patron, limit)).fetchall()
+
+
+def pulsaciones(consulta, minimo=2):
+    return [consulta[:i] for i in range(minimo, len(consulta) + 1) if not consulta[:i].endswith(' ')]
+
+
+def medir(conn, buscar, consultas, repeticiones):
+    latencias = []
+    for consulta in consultas:
+        for parcial in pulsaciones(consulta):
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                buscar(conn, parcial)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+    latencias.sort()
+    return statistics.median(latencias), latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', help='base generada con bench.generador')
+    parser.add_argument('--productos', type=int, default=1000000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    base = args.base
+    if base is None:
+        base = os.path.join(tempfile.mkdtemp(prefix='inventario_bench_'), 'busqueda.db')
+        print(f"Generando {args.productos:,} productos en {base}")
+        generar(base, args.productos, args.productos)
+
+    pool = ConnectionPool(base)
+    conn = pool.acquire()
+    print(f"{'método':<16} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for nombre, buscar, repeticiones in [
+        ('search_products', search_products, args.repeticiones),
+        ('LIKE %texto%', like, 1),
+    ]:
+        buscar(conn, CONSULTAS[0])  # calentar la caché de páginas
+        p50, p99 = medir(conn, buscar, CONSULTAS, repeticiones)
+        print(f"{nombre:<16} {p50:>9.2f} {p99:>9.2f}")
+
+    pool.release(conn)
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
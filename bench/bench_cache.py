@@ -0,0 +1,71 @@
+"""Lecturas con y sin las cachés de cache.py.
+
+Repite N lecturas de un conjunto de productos (distribución sesgada, como
+las páginas de movimientos de los productos más consultados) y compara la
+consulta directa con la lectura a través de product_cache, que en cada
+acierto solo ejecuta PRAGMA data_version. Después compara la lista de
+categorías de la barra lateral: el LEFT JOIN + GROUP BY sobre productos que
+se hacía en cada página contra category_catalog.
+
+    python -m bench.bench_cache --lecturas 100000
+"""
+import argparse
+import random
+import time
+
+from bench import crear_base_temporal
+from cache import category_catalog, product_cache
+from database import _load_product, add_product, get_all_categories, get_product_by_id
+from pool import ConnectionPool
+
+
+def categorias_con_join(conn):
+    """Réplica de get_all_categories antes del catálogo"""
+    return conn.execute("""
+        SELECT c.id, c.nombre, c.descripcion, COUNT(p.id) as total_productos
+        FROM categorias c
+        LEFT JOIN productos p ON c.id = p.categoria_id
+        GROUP BY c.id, c.nombre, c.descripcion
+        ORDER BY c.nombre
+    """).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lecturas', type=int, default=100000)
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--paginas', type=int, default=1000)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(crear_base_temporal())
+    conn = pool.acquire()
+    total = conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
+    azar = random.Random(7)
+    ids = [min(total, int(azar.paretovariate(1.2))) for _ in range(args.lecturas)]
+
+    for nombre, funcion in (('sin caché', _load_product), ('con caché', get_product_by_id)):
+        inicio = time.perf_counter()
+        for product_id in ids:
+            funcion(conn, product_id)
+        duracion = time.perf_counter() - inicio
+        print(f"{nombre:<10} {duracion * 1000:>9.1f} ms  {duracion / args.lecturas * 1e6:>6.2f} us/lectura")
+    print(product_cache.stats())
+
+    # Catálogo de categorías con un inventario de tamaño realista
+    for i in range(args.productos):
+        add_product(conn, f'C{i}', f'Producto {i}', 1, 1.0, categoria_id=1 + i % 15)
+    for nombre, funcion in (('categorías: join', categorias_con_join),
+                            ('categorías: catálogo', get_all_categories)):
+        inicio = time.perf_counter()
+        for _ in range(args.paginas):
+            funcion(conn)
+        duracion = time.perf_counter() - inicio
+        print(f"{nombre:<21} {duracion / args.paginas * 1e6:>9.1f} us/página")
+    print(category_catalog.stats())
+
+    pool.release(conn)
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Estadísticas en Python contra agregación en SQL.
+
+Para cada volumen carga N productos y N movimientos de un producto y mide:
+- productos: traer todas las filas y recorrerlas en Python (como hacía
+  productos_por_categoria), una agregación condicional sobre productos y
+  get_category_summary (resumen materializado);
+- movimientos: get_movements_by_product + pasadas en Python (como hacía la
+  ruta movimientos) contra get_movement_statistics.
+
+    python -m bench.bench_estadisticas --filas 10000 100000 1000000
+"""
+import argparse
+import time
+
+from bench import crear_base_temporal
+from database import (
+    get_all_products, get_category_summary, get_movement_statistics,
+    get_movements_by_product
+)
+from pool import ConnectionPool
+
+PRODUCTO_ID = 1
+
+
+def cargar(conn, filas):
+    conn.execute("DELETE FROM movimientos")
+    conn.execute("DELETE FROM productos WHERE id > 1")
+    conn.executemany(
+        "INSERT INTO productos(numero_serie, nombre, cantidad, precio, categoria_id) VALUES(?, ?, ?, ?, ?)",
+        ((f'B{i}', f'Producto {i}', i % 50, 1.0 + i % 100, 1 + i % 15) for i in range(filas))
+    )
+    conn.executemany('''INSERT INTO movimientos(
+                            producto_id, tipo, cantidad, stock_anterior,
+                            stock_posterior, precio, fecha
+                        ) VALUES(?, ?, 1, 0, 1, 10.0, ?)''',
+                     ((PRODUCTO_ID, 'entrada' if i % 2 else 'salida',
+                       f'2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}')
+                      for i in range(filas)))
+    conn.commit()
+
+
+def productos_en_python(conn):
+    productos = get_all_products(conn)
+    return {
+        'total_productos': len(productos),
+        'valor_total': sum(float(p[5]) * float(p[4]) for p in productos),
+        'stock_promedio': sum(float(p[4]) for p in productos) / len(productos),
+        'productos_sin_stock': len([p for p in productos if int(p[4]) <= 0])
+    }
+
+
+def productos_en_sql(conn):
+    # Lo que hacía get_product_statistics antes del resumen materializado:
+    # recorre productos completa en cada llamada
+    fila = conn.execute('''
+        SELECT COUNT(*),
+               COALESCE(SUM(cantidad * precio), 0),
+               COALESCE(AVG(cantidad), 0),
+               COALESCE(SUM(CASE WHEN cantidad <= 0 THEN 1 ELSE 0 END), 0)
+        FROM productos
+    ''').fetchone()
+    return {
+        'total_productos': fila[0],
+        'valor_total': fila[1],
+        'stock_promedio': fila[2],
+        'productos_sin_stock': fila[3]
+    }
+
+
+def movimientos_en_python(conn):
+    movimientos = get_movements_by_product(conn, PRODUCTO_ID)
+    return {
+        'total_entradas': sum(m['cantidad'] for m in movimientos if m['tipo'] == 'entrada'),
+        'total_salidas': sum(m['cantidad'] for m in movimientos if m['tipo'] == 'salida'),
+        'valor_total': sum(m['cantidad'] * m['precio'] for m in movimientos),
+        'total_movimientos': len(movimientos)
+    }
+
+
+def cronometrar(funcion, conn, repeticiones):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(conn)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(crear_base_temporal())
+    conn = pool.acquire()
+    casos = [
+        ('productos: python', productos_en_python),
+        ('productos: sql', productos_en_sql),
+        ('productos: resumen', lambda c: get_category_summary(c)),
+        ('movimientos: python', movimientos_en_python),
+        ('movimientos: sql', lambda c: get_movement_statistics(c, PRODUCTO_ID)),
+    ]
+    for filas in args.filas:
+        cargar(conn, filas)
+        print(f"--- {filas} filas")
+        for nombre, funcion in casos:
+            print(f"{nombre:<22} {cronometrar(funcion, conn, args.repeticiones):>10.2f} ms")
+    pool.release(conn)
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
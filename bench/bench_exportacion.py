@@ -0,0 +1,69 @@
+"""Memoria pico de la exportación de movimientos: lista completa contra iterador.
+
+Carga N movimientos de un producto y compara el pico de memoria (tracemalloc)
+de recorrerlos con get_movements_by_product, que materializa la lista, frente
+a iter_movements_by_product, que lee el cursor por bloques.
+
+    python -m bench.bench_exportacion --filas 10000 100000 500000
+"""
+import argparse
+import csv
+import os
+import time
+import tracemalloc
+
+from bench import crear_base_temporal
+from database import get_movements_by_product, iter_movements_by_product
+from pool import ConnectionPool
+
+PRODUCTO_ID = 1
+
+
+def cargar_movimientos(conn, filas):
+    conn.execute("DELETE FROM movimientos WHERE producto_id = ?", (PRODUCTO_ID,))
+    conn.executemany('''INSERT INTO movimientos(
+                            producto_id, tipo, cantidad, stock_anterior,
+                            stock_posterior, precio, fecha, usuario, descripcion
+                        ) VALUES(?, 'entrada', 1, ?, ?, 10.0, ?, 'bench', 'Movimiento de prueba')''',
+                     ((PRODUCTO_ID, i, i + 1, f'2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}')
+                      for i in range(filas)))
+    conn.commit()
+
+
+def escribir_csv(movimientos):
+    with open(os.devnull, 'w', newline='') as destino:
+        writer = csv.writer(destino)
+        for m in movimientos:
+            writer.writerow((m['fecha'], m['tipo'], m['cantidad'], m['stock_anterior'],
+                             m['stock_posterior'], m['precio'], m['usuario'], m['descripcion']))
+
+
+def medir(conn, fuente):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    escribir_csv(fuente(conn, PRODUCTO_ID))
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duracion, pico / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    pool = ConnectionPool(crear_base_temporal())
+    conn = pool.acquire()
+    print(f"{'filas':>9} {'lista (MB)':>11} {'iterador (MB)':>14} {'lista (s)':>10} {'iterador (s)':>13}")
+    for filas in args.filas:
+        cargar_movimientos(conn, filas)
+        t_lista, m_lista = medir(conn, get_movements_by_product)
+        t_iter, m_iter = medir(conn, iter_movements_by_product)
+        print(f"{filas:>9} {m_lista:>11.1f} {m_iter:>14.1f} {t_lista:>10.2f} {t_iter:>13.2f}")
+    pool.release(conn)
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
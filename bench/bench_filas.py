@@ -0,0 +1,100 @@
+"""Costo por fila de get_movements_by_product: dict por fila contra Movimiento.
+
+Mide tiempo y memoria asignada (pico de tracemalloc) al materializar N
+movimientos con el formato anterior (dict de 10 claves con strptime por fila)
+y con la fila compacta Movimiento (__slots__, fecha memoizada, campos de
+presentación perezosos), leyendo además la fecha de cada fila como hace la
+plantilla.
+
+    python -m bench.bench_filas --filas 100000
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from bench import crear_base_temporal
+from database import get_movements_by_product
+from pool import ConnectionPool
+
+PRODUCTO_ID = 1
+
+
+def movimientos_como_dict(conn, product_id):
+    """Réplica de get_movements_by_product antes de Movimiento"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT m.fecha, m.tipo, m.cantidad, m.stock_anterior, m.stock_posterior,
+               p.precio, m.usuario, m.descripcion
+        FROM movimientos m
+        JOIN productos p ON m.producto_id = p.id
+        WHERE m.producto_id = ?
+        ORDER BY m.fecha DESC
+    """, (product_id,))
+    return [
+        {
+            'fecha': datetime.strptime(m[0], '%Y-%m-%d %H:%M:%S') if isinstance(m[0], str) else m[0],
+            'tipo': m[1],
+            'cantidad': m[2],
+            'stock_anterior': m[3],
+            'stock_posterior': m[4],
+            'precio': m[5],
+            'usuario': m[6],
+            'descripcion': m[7],
+            'tipo_badge': 'success' if m[1] == 'entrada' else 'danger',
+            'cantidad_signo': '+' if m[1] == 'entrada' else '-'
+        }
+        for m in cursor.fetchall()
+    ]
+
+
+def cargar(conn, filas):
+    conn.execute("DELETE FROM movimientos WHERE producto_id = ?", (PRODUCTO_ID,))
+    # Varias filas por segundo, como un historial real con ráfagas de ventas
+    conn.executemany('''INSERT INTO movimientos(
+                            producto_id, tipo, cantidad, stock_anterior,
+                            stock_posterior, precio, fecha, usuario, descripcion
+                        ) VALUES(?, ?, 1, 0, 1, 10.0, ?, 'bench', 'Venta')''',
+                     ((PRODUCTO_ID, 'entrada' if i % 2 else 'salida',
+                       f'2024-01-{1 + i // 86400 % 28:02d} {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}')
+                      for i in range(0, filas * 4, 4)))
+    conn.commit()
+
+
+def medir(conn, funcion):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    filas = funcion(conn, PRODUCTO_ID)
+    for m in filas:
+        m['fecha']
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duracion, pico / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=100000)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(crear_base_temporal())
+    conn = pool.acquire()
+    cargar(conn, args.filas)
+
+    # Tiempos sin tracemalloc (que infla el costo de cada asignación)
+    for nombre, funcion in (('dict', movimientos_como_dict), ('Movimiento', get_movements_by_product)):
+        inicio = time.perf_counter()
+        for m in funcion(conn, PRODUCTO_ID):
+            m['fecha']
+        duracion = time.perf_counter() - inicio
+        _, memoria = medir(conn, funcion)
+        print(f"{nombre:<11} {args.filas} filas  {duracion * 1000:>9.1f} ms  "
+              f"{duracion / args.filas * 1e6:>6.2f} us/fila  pico {memoria:>7.1f} MB")
+
+    pool.release(conn)
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
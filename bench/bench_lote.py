@@ -0,0 +1,82 @@
+"""Ingesta de movimientos: línea por línea contra lote en una transacción.
+
+Simula tickets de venta del POS y mide movimientos/segundo registrando cada
+línea con insert_movimiento (un commit por línea) y el ticket completo con
+insert_movimientos_batch (un commit por ticket).
+
+    python -m bench.bench_lote --tickets 20 --lineas 500
+"""
+import argparse
+import random
+import time
+
+from bench import crear_base_temporal
+from database import insert_movimiento, insert_movimientos_batch
+from pool import ConnectionPool
+
+
+def generar_ticket(rng, productos, lineas):
+    return [
+        {
+            'producto_id': rng.choice(productos),
+            'tipo': rng.choice(('entrada', 'salida')),
+            'cantidad': 1,
+            'descripcion': 'Venta POS',
+            'usuario': 'bench',
+        }
+        for _ in range(lineas)
+    ]
+
+
+def preparar(tickets, lineas):
+    pool = ConnectionPool(crear_base_temporal())
+    conn = pool.acquire()
+    # Stock suficiente para que ninguna salida se rechace
+    conn.execute("UPDATE productos SET cantidad = ?", (tickets * lineas,))
+    conn.commit()
+    productos = [fila[0] for fila in conn.execute("SELECT id FROM productos")]
+    return pool, conn, productos
+
+
+def por_linea(conn, ticket):
+    for mov in ticket:
+        insert_movimiento(conn, mov['producto_id'], mov['tipo'], mov['cantidad'],
+                          mov['descripcion'], mov['usuario'])
+
+
+def por_lote(conn, ticket):
+    if insert_movimientos_batch(conn, ticket) is None:
+        raise RuntimeError("Lote rechazado durante el benchmark")
+
+
+def medir(nombre, aplicar, tickets, lineas, semilla):
+    pool, conn, productos = preparar(tickets, lineas)
+    rng = random.Random(semilla)
+    lote = [generar_ticket(rng, productos, lineas) for _ in range(tickets)]
+
+    inicio = time.perf_counter()
+    for ticket in lote:
+        aplicar(conn, ticket)
+    duracion = time.perf_counter() - inicio
+
+    pool.release(conn)
+    pool.close_all()
+    total = tickets * lineas
+    print(f"{nombre:<10} {total:>8} movimientos  {duracion:>8.3f} s  {total / duracion:>10.1f} mov/s")
+    return total / duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=20)
+    parser.add_argument('--lineas', type=int, default=500, help='líneas por ticket')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    base = medir('por_linea', por_linea, args.tickets, args.lineas, args.semilla)
+    lote = medir('por_lote', por_lote, args.tickets, args.lineas, args.semilla)
+    print(f"aceleración: x{lote / base:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Costo de la instrumentación de consultas (metricas.py).
+
+Mide las mismas operaciones con el registro activo y desactivado sobre la
+misma conexión del pool: una lectura por clave primaria, una página de 50
+productos, un recorrido de N filas con iter_products (el peor caso: cada
+fila pasa por CursorInstrumentado.__next__) y una venta con
+apply_stock_delta.
+
+    python -m bench.bench_metricas --productos 20000 --repeticiones 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import database
+from bench.generador import generar
+from metricas import registro
+from pool import ConnectionPool
+
+
+def operaciones(productos):
+    return [
+        ('_load_product', lambda c, i: database._load_product(c, 1 + i % productos)),
+        ('get_all_products[50]', lambda c, i: database.get_all_products(c, 50, i % productos)),
+        (f'iter_products[{productos}]', lambda c, i: sum(1 for _ in database.iter_products(c, ('id', 'precio')))),
+        ('apply_stock_delta', lambda c, i: database.apply_stock_delta(c, 1 + i % productos, 1, 'entrada',
+                                                                      'bench', 'bench')),
+    ]
+
+
+def medir(conn, operacion, repeticiones):
+    inicio = time.perf_counter()
+    for i in range(repeticiones):
+        operacion(conn, i)
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=2000)
+    args = parser.parse_args()
+
+    ruta = os.path.join(tempfile.mkdtemp(prefix='inventario_bench_'), 'metricas.db')
+    generar(ruta, args.productos, args.productos)
+    pool = ConnectionPool(ruta)
+    conn = pool.acquire()
+    registro.configurar(umbral_lento=float('inf'))
+
+    print(f"{'operación':<24} {'sin (µs)':>10} {'con (µs)':>10} {'costo':>8}")
+    for nombre, operacion in operaciones(args.productos):
+        repeticiones = args.repeticiones if not nombre.startswith('iter') else max(1, args.repeticiones // 200)
+        registro.activo = False
+        medir(conn, operacion, repeticiones)  # calentar la caché de páginas
+        sin = medir(conn, operacion, repeticiones)
+        registro.activo = True
+        con = medir(conn, operacion, repeticiones)
+        print(f"{nombre:<24} {sin:>10.1f} {con:>10.1f} {(con / sin - 1) * 100:>7.1f}%")
+
+    pool.release(conn)
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
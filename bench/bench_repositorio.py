@@ -0,0 +1,107 @@
+"""Suite común de rendimiento para los backends de repositorio.py.
+
+Ejecuta la misma secuencia de operaciones (altas de productos, lecturas por
+id, páginas de productos, actualizaciones de detalle e historial de
+movimientos) contra cada backend y muestra operaciones por segundo:
+
+- sqlite: SQLiteRepository sobre una conexión del pool;
+- mysql-simulado: MySQLRepository sobre bench.mysql_simulado (SQLite con la
+  interfaz de mysql.connector), para medir el costo propio del driver;
+- mysql: MySQLRepository sobre un servidor real, si se indica --mysql y
+  mysql.connector está instalado. La base debe tener el esquema de
+  inventario.sql.
+
+    python -m bench.bench_repositorio --operaciones 2000
+    python -m bench.bench_repositorio --mysql root@localhost/inventario
+"""
+import argparse
+import time
+
+from bench import crear_base_temporal, mysql_simulado
+from pool import ConnectionPool
+from repositorio import MySQLRepository, SQLiteRepository
+
+
+def suite(repo, operaciones, prefijo):
+    """Operaciones de la suite: (nombre, función sin argumentos, repeticiones)"""
+    ids = []
+
+    def alta():
+        ids.append(repo.add_product(f'{prefijo}{len(ids)}', f'Producto {len(ids)}', 10, 5.0,
+                                    'Alta de prueba', 1, 1))
+
+    def lectura():
+        repo.get_product_by_id(ids[lectura.i % len(ids)])
+        lectura.i += 1
+    lectura.i = 0
+
+    def pagina():
+        repo.get_all_products(50, ids[pagina.i % len(ids)] - 50)
+        pagina.i += 1
+    pagina.i = 0
+
+    def actualizacion():
+        repo.update_product_details(ids[actualizacion.i % len(ids)], nombre=f'Renombrado {actualizacion.i}')
+        actualizacion.i += 1
+    actualizacion.i = 0
+
+    def historial():
+        repo.get_movements_by_product(ids[historial.i % len(ids)])
+        historial.i += 1
+    historial.i = 0
+
+    return [
+        ('add_product', alta, operaciones),
+        ('get_product_by_id', lectura, operaciones * 5),
+        ('get_all_products[50]', pagina, operaciones),
+        ('update_product_details', actualizacion, operaciones),
+        ('get_movements_by_product', historial, operaciones),
+    ]
+
+
+def correr(nombre, repo, operaciones):
+    print(f"--- {nombre}")
+    for operacion, funcion, repeticiones in suite(repo, operaciones, f'{nombre[:3].upper()}-'):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        duracion = time.perf_counter() - inicio
+        print(f"{operacion:<26} {repeticiones / duracion:>12,.0f} ops/s")
+
+
+def conectar_mysql(destino):
+    """usuario[:clave]@host/base -> conexión de mysql.connector"""
+    import mysql.connector
+
+    credenciales, _, resto = destino.partition('@')
+    usuario, _, clave = credenciales.partition(':')
+    host, _, base = resto.partition('/')
+    return mysql.connector.connect(host=host, user=usuario, password=clave, database=base)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operaciones', type=int, default=2000)
+    parser.add_argument('--mysql', help='usuario[:clave]@host/base de un servidor MySQL de prueba')
+    args = parser.parse_args()
+
+    pool = ConnectionPool(crear_base_temporal())
+    conn = pool.acquire()
+    correr('sqlite', SQLiteRepository(conn), args.operaciones)
+    pool.release(conn)
+    pool.close_all()
+
+    simulada = mysql_simulado.connect(crear_base_temporal())
+    correr('mysql-simulado', MySQLRepository(simulada), args.operaciones)
+    print(f"sentencias preparadas: {simulada.preparaciones}")
+    simulada.close()
+
+    if args.mysql:
+        conn = conectar_mysql(args.mysql)
+        correr('mysql', MySQLRepository(conn), args.operaciones)
+        MySQLRepository.close(conn)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Costo de preparar las sentencias de database.py, por consulta y bajo carga.
+
+sqlite3 guarda las sentencias preparadas de cada conexión por su texto exacto
+(cached_statements). El script mide cada lectura de query_plans.casos() y,
+si Flask está instalado, cada ruta de suite.rutas() con la caché desactivada
+(0: cada execute vuelve a preparar) y con la del pool; la diferencia es lo
+que cuesta preparar. Después reparte la mezcla de todas las lecturas entre
+varios hilos con distintos tamaños de caché, y cuenta los textos distintos
+que envía la aplicación: lo que la caché tiene que poder guardar.
+
+    python -m bench.bench_sentencias --productos 20000 --movimientos 200000 --hilos 4
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import consultas
+import database
+from bench import crear_base_temporal, query_plans
+from bench.generador import generar
+from bench.suite import rutas
+from metricas import registro
+from pool import DEFAULT_CACHED_STATEMENTS, ConnectionPool
+
+# Llamadas de query_plans.casos() que escriben: no se repiten en el benchmark
+ESCRITURAS = ('insert_', 'update_', 'delete_', 'purge_', 'archive_', 'compact_', 'import_',
+              'get_or_create_report_job')
+
+
+def lecturas():
+    return [(nombre, llamada) for nombre, llamada in query_plans.casos() if not nombre.startswith(ESCRITURAS)]
+
+
+def medir(funcion, repeticiones):
+    funcion()  # calentar la caché de páginas (y la de sentencias)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def textos_distintos(ruta, llamadas):
+    """Textos de sentencia distintos que envían las llamadas (claves de la caché de sqlite3)"""
+    activo = registro.activo
+    registro.configurar(umbral_lento=float('inf'))
+    pool = ConnectionPool(ruta)
+    conn = pool.acquire()
+    registro._formas.clear()  # sin las PRAGMA de la conexión
+    try:
+        for _, llamada in llamadas:
+            llamada(conn)
+        return len(registro._formas)
+    finally:
+        pool.release(conn)
+        pool.close_all()
+        registro.activo = activo
+
+
+def por_consulta(ruta, repeticiones, tamanos):
+    """µs por llamada de cada lectura con cada tamaño de caché"""
+    registro.activo = False
+    conexiones = {}
+    for tamano in tamanos:
+        conexiones[tamano] = ConnectionPool(ruta, cached_statements=tamano).acquire()
+    resultados = []
+    for nombre, llamada in lecturas():
+        resultados.append((nombre, [medir(lambda: llamada(conexiones[tamano]), repeticiones) for tamano in tamanos]))
+    for conn in conexiones.values():
+        conn.close()
+    return resultados
+
+
+def por_ruta(ruta, repeticiones, tamanos):
+    """µs por petición de cada ruta con cada tamaño de caché; vacío si Flask no está instalado"""
+    os.environ['INVENTARIO_DB'] = ruta
+    try:
+        from app import app, get_connection_pool
+    except ImportError as e:
+        print(f"Rutas omitidas: {e}")
+        return []
+    from http_cache import fragment_cache
+
+    fragment_cache.maxsize = 0
+    registro.activo = False
+    cliente = app.test_client()
+    pool = get_connection_pool()
+    tiempos = {ruta_: [] for ruta_ in rutas(app)}
+    for tamano in tamanos:
+        # Las conexiones nuevas del pool se abren con el tamaño a medir
+        pool.cached_statements = tamano
+        pool.close_all()
+        for ruta_ in tiempos:
+            tiempos[ruta_].append(medir(lambda: cliente.get(ruta_).get_data(), repeticiones))
+    return list(tiempos.items())
+
+
+def bajo_carga(ruta, llamadas, tamano, hilos, segundos):
+    """Llamadas por segundo de la mezcla, con `hilos` conexiones en paralelo"""
+    registro.activo = False
+    pool = ConnectionPool(ruta, max_idle=hilos, cached_statements=tamano)
+    totales = [0] * hilos
+    fin = time.perf_counter() + segundos
+
+    def trabajar(numero):
+        conn = pool.acquire()
+        try:
+            # Cada hilo recorre la mezcla desde un punto distinto
+            i = numero * len(llamadas) // hilos
+            while time.perf_counter() < fin:
+                llamadas[i % len(llamadas)](conn)
+                i += 1
+            totales[numero] = i - numero * len(llamadas) // hilos
+        finally:
+            pool.release(conn)
+
+    trabajadores = [threading.Thread(target=trabajar, args=(n,)) for n in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    pool.close_all()
+    return sum(totales) / segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', help='base existente (si no, se genera una)')
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--movimientos', type=int, default=200000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=5.0)
+    parser.add_argument('--limite-us', type=float, default=1000.0, help='lecturas que entran en la mezcla')
+    args = parser.parse_args()
+
+    ruta = args.base
+    if ruta is None:
+        ruta = os.path.join(tempfile.mkdtemp(prefix='inventario_bench_'), 'sentencias.db')
+        print(f"Generando {args.productos:,} productos y {args.movimientos:,} movimientos en {ruta}")
+        generar(ruta, args.productos, args.movimientos)
+
+    # Todas las combinaciones de filtros del historial comparten un texto
+    variantes = [
+        (f'filtros {n}', lambda c, n=n: database.get_movement_statistics(
+            c, 1, '2020-01-01' if n & 1 else None, '2100-01-01' if n & 2 else None, 'salida' if n & 4 else None))
+        for n in range(8)
+    ]
+    # casos() incluye escrituras (y archiva todo al final): se cuentan en una base aparte
+    pequena = crear_base_temporal()
+    print(f"Sentencias en consultas.SENTENCIAS: {len(consultas.SENTENCIAS)}")
+    print(f"Textos distintos de query_plans.casos(): {textos_distintos(pequena, query_plans.casos())}"
+          f" (cached_statements del pool: {DEFAULT_CACHED_STATEMENTS})")
+    print(f"Textos distintos de get_movement_statistics con sus 8 combinaciones de filtros: "
+          f"{textos_distintos(pequena, variantes)}")
+
+    tamanos = (0, 128, DEFAULT_CACHED_STATEMENTS)
+    encabezado = ' '.join(f"{f'caché {t} (µs)':>16}" for t in tamanos)
+    print(f"\n{'consulta':<44} {encabezado} {'preparar':>9}")
+    consultas_medidas = por_consulta(ruta, args.repeticiones, tamanos)
+    for nombre, tiempos in consultas_medidas + por_ruta(ruta, args.repeticiones, tamanos):
+        columnas = ' '.join(f'{t:>16.1f}' for t in tiempos)
+        print(f"{nombre:<44} {columnas} {(tiempos[0] - tiempos[-1]) / tiempos[0] * 100:>8.1f}%")
+
+    # La mezcla es la de una petición: sin los recorridos del catálogo completo,
+    # que tardan mil veces más y taparían el resto
+    rapidas = {nombre for nombre, tiempos in consultas_medidas if tiempos[-1] < args.limite_us}
+    llamadas = [llamada for nombre, llamada in lecturas() if nombre in rapidas]
+    print(f"\nMezcla de {len(llamadas)} lecturas de menos de {args.limite_us:.0f} µs "
+          f"en {args.hilos} hilos durante {args.segundos:.0f} s")
+    for tamano in tamanos:
+        por_segundo = bajo_carga(ruta, llamadas, tamano, args.hilos, args.segundos)
+        print(f"cached_statements={tamano:<5} {por_segundo:>10,.0f} llamadas/s")
+
+
+if __name__ == '__main__':
+    main()
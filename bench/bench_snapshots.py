@@ -0,0 +1,77 @@
+"""Valor del inventario a una fecha: historial completo contra stock_snapshots.
+
+Genera el historial con bench.generador (los movimientos terminan el
+2025-01-01) y mide get_inventory_value_at para varios cierres de mes, primero
+sin cortes (se recorre todo el historial hasta la fecha) y después de
+compactar los últimos --dias días con compact_stock_snapshots. También
+informa lo que tarda el primer corte y cada corte diario siguiente.
+
+    python -m bench.bench_snapshots --productos 100000 --movimientos 5000000
+    python -m bench.bench_snapshots --base /tmp/grande.db
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import database
+from bench.generador import generar
+from pool import ConnectionPool
+
+FIN = datetime(2025, 1, 1)
+FECHAS = [date(2024, 10, 31), date(2024, 11, 30), date(2024, 12, 15), date(2024, 12, 31)]
+
+
+def medir(conn, fecha, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        database.get_inventory_value_at(conn, fecha)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', help='base generada con bench.generador (se modifica: usar una copia)')
+    parser.add_argument('--productos', type=int, default=100000)
+    parser.add_argument('--movimientos', type=int, default=5000000)
+    parser.add_argument('--dias', type=int, default=90, help='días de cortes diarios a compactar')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    base = args.base
+    if base is None:
+        base = os.path.join(tempfile.mkdtemp(prefix='inventario_bench_'), 'snapshots.db')
+        print(f"Generando {args.productos:,} productos y {args.movimientos:,} movimientos en {base}")
+        generar(base, args.productos, args.movimientos)
+
+    database.ensure_schema(base)
+    pool = ConnectionPool(base)
+    conn = pool.acquire()
+    conn.execute("DELETE FROM stock_snapshots")
+    conn.execute("DELETE FROM stock_snapshot_cortes")
+    conn.commit()
+
+    sin = {fecha: medir(conn, fecha, args.repeticiones) for fecha in FECHAS}
+
+    inicio = time.perf_counter()
+    cortes = database.compact_stock_snapshots(conn, FIN, desde=FIN - timedelta(days=args.dias))
+    total = time.perf_counter() - inicio
+    diarios = [segundos for _, _, segundos in cortes[1:]]
+    print(f"Compactación: {len(cortes)} cortes en {total:.1f}s "
+          f"(primero {cortes[0][2]:.2f}s, siguientes p50 {statistics.median(diarios or [0]):.3f}s)")
+
+    print(f"{'fecha':<12} {'sin cortes (ms)':>16} {'con cortes (ms)':>16} {'razón':>8}")
+    for fecha in FECHAS:
+        con = medir(conn, fecha, args.repeticiones)
+        print(f"{fecha.isoformat():<12} {sin[fecha]:>16.1f} {con:>16.1f} {sin[fecha] / con:>7.1f}x")
+
+    pool.release(conn)
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""Prueba de carga HTTP con tráfico mixto de lectura y escritura.
+
+Levanta la aplicación en modo síncrono (servidor de Flask con hilos) o
+asíncrono (uvicorn con asgi.py) sobre una base temporal y la ataca con N
+clientes concurrentes durante unos segundos. Cada cliente usa conexiones
+keep-alive y mezcla lecturas de la API (páginas de productos, un producto,
+movimientos, categorías) con altas de movimientos. Informa p50/p99 por tipo
+de petición y peticiones por segundo.
+
+    python -m bench.carga --modo sync async --clientes 32 --duracion 10
+
+Con --url se mide un servidor ya levantado en lugar de iniciar uno.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from bench import crear_base_temporal
+
+SERVIDORES = {
+    'sync': ['-m', 'flask', '--app', 'app', 'run', '--with-threads', '--port', '{puerto}'],
+    'async': ['-m', 'uvicorn', 'asgi:app', '--log-level', 'warning', '--port', '{puerto}'],
+}
+
+
+def peticion_aleatoria(azar, productos, proporcion_escrituras):
+    """(tipo, método, ruta, cuerpo) de la siguiente petición"""
+    if azar.random() < proporcion_escrituras:
+        lote = [{'producto_id': azar.randint(1, productos), 'tipo': 'entrada', 'cantidad': 1,
+                 'usuario': 'carga'}]
+        return 'escritura', 'POST', '/movimientos/lote', json.dumps(lote).encode()
+    producto_id = azar.randint(1, productos)
+    tipo, ruta = azar.choice([
+        ('productos', f'/api/v1/productos?limit=50&after={azar.randint(0, productos)}'),
+        ('producto', f'/api/v1/productos/{producto_id}'),
+        ('movimientos', f'/api/v1/productos/{producto_id}/movimientos?limit=50'),
+        ('categorias', '/api/v1/categorias'),
+    ])
+    return tipo, 'GET', ruta, b''
+
+
+async def leer_respuesta(lector):
+    """Leer una respuesta HTTP/1.x; devuelve (status, mantener la conexión)"""
+    linea = await lector.readline()
+    if not linea:
+        raise ConnectionError('conexión cerrada')
+    version, status = linea.split()[:2]
+    cabeceras = {}
+    while True:
+        linea = await lector.readline()
+        if linea in (b'\r\n', b'\n', b''):
+            break
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        cabeceras[nombre.strip().lower()] = valor.strip()
+
+    if cabeceras.get('transfer-encoding') == 'chunked':
+        while True:
+            tamano = int((await lector.readline()).strip(), 16)
+            await lector.readexactly(tamano + 2)
+            if tamano == 0:
+                break
+    elif 'content-length' in cabeceras:
+        await lector.readexactly(int(cabeceras['content-length']))
+    else:
+        await lector.read()
+        return int(status), False
+
+    mantener = version == b'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+    return int(status), mantener
+
+
+async def cliente(host, puerto, fin, azar, productos, proporcion_escrituras, resultados):
+    conexion = None
+    while time.perf_counter() < fin:
+        tipo, metodo, ruta, cuerpo = peticion_aleatoria(azar, productos, proporcion_escrituras)
+        inicio = time.perf_counter()
+        try:
+            if conexion is None:
+                conexion = await asyncio.open_connection(host, puerto)
+            lector, escritor = conexion
+            escritor.write(
+                f'{metodo} {ruta} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(cuerpo)}\r\n\r\n'.encode() + cuerpo
+            )
+            await escritor.drain()
+            status, mantener = await leer_respuesta(lector)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            conexion = None
+            resultados.setdefault('errores', []).append(0)
+            continue
+        resultados.setdefault(tipo, []).append(time.perf_counter() - inicio)
+        if status >= 500:
+            resultados.setdefault('errores', []).append(0)
+        if not mantener:
+            conexion[1].close()
+            conexion = None
+    if conexion is not None:
+        conexion[1].close()
+
+
+async def atacar(url, clientes, duracion, productos, proporcion_escrituras):
+    partes = urlsplit(url)
+    resultados = {}
+    fin = time.perf_counter() + duracion
+    await asyncio.gather(*(
+        cliente(partes.hostname, partes.port or 80, fin, random.Random(i), productos,
+                proporcion_escrituras, resultados)
+        for i in range(clientes)
+    ))
+    return resultados
+
+
+def informe(modo, resultados, duracion):
+    errores = len(resultados.pop('errores', []))
+    total = sum(len(latencias) for latencias in resultados.values())
+    print(f"--- {modo}: {total} peticiones, {total / duracion:,.0f} req/s, {errores} errores")
+    print(f"{'tipo':<12} {'n':>7} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for tipo, latencias in sorted(resultados.items()):
+        latencias.sort()
+        p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+        print(f"{tipo:<12} {len(latencias):>7} {statistics.median(latencias) * 1000:>9.2f} {p99 * 1000:>9.2f}")
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def esperar_puerto(puerto, limite=30):
+    fin = time.time() + limite
+    while time.time() < fin:
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'el servidor no abrió el puerto {puerto}')
+
+
+def levantar(modo, base):
+    puerto = puerto_libre()
+    comando = [sys.executable] + [parte.format(puerto=puerto) for parte in SERVIDORES[modo]]
+    entorno = dict(os.environ, INVENTARIO_DB=base)
+    proceso = subprocess.Popen(comando, env=entorno, stdout=subprocess.DEVNULL)
+    esperar_puerto(puerto)
+    return proceso, f'http://127.0.0.1:{puerto}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modo', nargs='+', choices=sorted(SERVIDORES), default=['sync', 'async'])
+    parser.add_argument('--url', help='servidor ya levantado (se ignora --modo)')
+    parser.add_argument('--clientes', type=int, default=32)
+    parser.add_argument('--duracion', type=float, default=10.0)
+    parser.add_argument('--escrituras', type=float, default=0.2, help='proporción de altas de movimientos')
+    parser.add_argument('--productos', type=int, default=15)
+    args = parser.parse_args()
+
+    if args.url:
+        resultados = asyncio.run(atacar(args.url, args.clientes, args.duracion, args.productos, args.escrituras))
+        informe(args.url, resultados, args.duracion)
+        return
+
+    for modo in args.modo:
+        proceso, url = levantar(modo, crear_base_temporal())
+        try:
+            resultados = asyncio.run(atacar(url, args.clientes, args.duracion, args.productos, args.escrituras))
+            informe(modo, resultados, args.duracion)
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Generador de datos sintéticos a escala de producción.
+
+Carga categorías, proveedores, productos y movimientos con executemany en
+transacciones grandes y PRAGMA synchronous=OFF mientras dura la carga. El
+resultado es reproducible: la misma semilla y los mismos volúmenes generan
+exactamente la misma base.
+
+Los datos son coherentes con los que escribe la aplicación: cada producto
+empieza con un movimiento 'Registro inicial del producto', la cadena
+stock_anterior -> stock_posterior de sus movimientos nunca queda negativa y
+termina en productos.cantidad, y el resumen por categoría y los contadores
+de cambios los mantienen sus triggers.
+
+    python -m bench.generador /tmp/grande.db --productos 1000000 --movimientos 50000000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from database import ensure_schema
+
+# Productos por transacción (con todos sus movimientos)
+LOTE_PRODUCTOS = 10000
+
+USUARIOS = ['admin', 'caja1', 'caja2', 'deposito', 'sistema']
+
+# Vocabulario de nombres y descripciones: la búsqueda de texto (productos_fts)
+# necesita términos con frecuencias variadas, no 'Producto N' en todas las filas
+TIPOS = [
+    'Cable', 'Monitor', 'Teclado', 'Mouse', 'Auriculares', 'Parlante', 'Cargador', 'Batería',
+    'Lámpara', 'Silla', 'Escritorio', 'Mochila', 'Cafetera', 'Licuadora', 'Tostadora', 'Ventilador',
+    'Taladro', 'Destornillador', 'Martillo', 'Llave', 'Pinza', 'Cuaderno', 'Bolígrafo', 'Marcador',
+    'Camiseta', 'Pantalón', 'Zapatilla', 'Gorra', 'Reloj', 'Cámara', 'Impresora', 'Router',
+]
+MARCAS = [
+    'Acme', 'Andina', 'Boreal', 'Cóndor', 'Delta', 'Estrella', 'Faro', 'Galaxia', 'Halcón', 'Iris',
+    'Jaguar', 'Kiwi', 'Lince', 'Maya', 'Nimbus', 'Orión', 'Puma', 'Quasar', 'Rayo', 'Sol',
+    'Titán', 'Urano', 'Vértice', 'Yunque', 'Zafiro',
+]
+ADJETIVOS = [
+    'inalámbrico', 'portátil', 'compacto', 'reforzado', 'ergonómico', 'recargable', 'profesional',
+    'económico', 'premium', 'resistente', 'silencioso', 'liviano', 'digital', 'clásico', 'industrial',
+]
+
+
+def _cadena_movimientos(azar, producto_id, cantidad, precio, inicio, segundos):
+    """Movimientos de un producto en orden cronológico y su stock final.
+
+    Las fechas van como segundos Unix; SQLite las formatea al insertar.
+    """
+    aleatorio = azar.random
+    fechas = sorted(inicio + int(aleatorio() * segundos) for _ in range(cantidad))
+    stock = 1 + int(aleatorio() * 100)
+    filas = [(producto_id, 'entrada', stock, 0, stock, precio, fechas[0], 'admin',
+              'Registro inicial del producto')]
+    for fecha in fechas[1:]:
+        sorteo = aleatorio()
+        usuario = USUARIOS[int(aleatorio() * len(USUARIOS))]
+        if sorteo < 0.05:
+            nuevo = int(aleatorio() * (stock + 20))
+            if nuevo == stock:
+                nuevo += 1
+            sentido = 'entrada' if nuevo > stock else 'salida'
+            filas.append((producto_id, 'ajuste', abs(nuevo - stock), stock, nuevo, precio, fecha, 'sistema',
+                          f'Actualización manual: {sentido} de {abs(nuevo - stock)} unidades'))
+            stock = nuevo
+        elif sorteo < 0.6 and stock > 0:
+            unidades = 1 + int(aleatorio() * min(stock, 5))
+            filas.append((producto_id, 'salida', unidades, stock, stock - unidades, precio, fecha,
+                          usuario, 'Venta'))
+            stock -= unidades
+        else:
+            unidades = 1 + int(aleatorio() * 50)
+            filas.append((producto_id, 'entrada', unidades, stock, stock + unidades, precio, fecha,
+                          usuario, 'Reposición'))
+            stock += unidades
+    return filas, stock
+
+
+def generar(ruta, productos=100000, movimientos=1000000, categorias=50, proveedores=200,
+            semilla=1, dias=730, progreso=None):
+    """Cargar una base nueva con los volúmenes indicados.
+
+    Los movimientos se reparten en partes iguales entre los productos (cada
+    producto tiene al menos su registro inicial). `progreso` recibe
+    (productos cargados, movimientos cargados, segundos) después de cada
+    transacción. Devuelve (productos, movimientos, segundos).
+    """
+    if not ensure_schema(ruta):
+        raise RuntimeError(f'no se pudo crear el esquema en {ruta}')
+    azar = random.Random(semilla)
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")  # 256 MB durante la carga
+    if conn.execute("SELECT EXISTS (SELECT 1 FROM productos)").fetchone()[0]:
+        conn.close()
+        raise RuntimeError(f'{ruta} ya tiene productos')
+
+    inicio_carga = time.perf_counter()
+    with conn:
+        conn.executemany("INSERT INTO categorias(nombre, descripcion) VALUES(?, ?)",
+                         ((f'Categoría {i}', f'Categoría sintética {i}') for i in range(1, categorias + 1)))
+        conn.executemany(
+            "INSERT INTO proveedores(nombre, contacto, telefono, email) VALUES(?, ?, ?, ?)",
+            ((f'Proveedor {i}', f'Contacto {i}', f'555-{i:07d}', f'proveedor{i}@ejemplo.com')
+             for i in range(1, proveedores + 1))
+        )
+
+    por_producto, resto = divmod(max(movimientos, productos), productos)
+    segundos = dias * 86400
+    inicio = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()) - segundos
+    cargados = movimientos_cargados = 0
+
+    while cargados < productos:
+        filas_productos = []
+        filas_movimientos = []
+        for producto_id in range(cargados + 1, min(cargados + LOTE_PRODUCTOS, productos) + 1):
+            precio = round(0.5 + azar.random() * 1999.5, 2)
+            cantidad = por_producto + (1 if producto_id <= resto else 0)
+            cadena, stock = _cadena_movimientos(azar, producto_id, cantidad, precio, inicio, segundos)
+            filas_movimientos.extend(cadena)
+            tipo = TIPOS[int(azar.random() * len(TIPOS))]
+            marca = MARCAS[int(azar.random() * len(MARCAS))]
+            adjetivo = ADJETIVOS[int(azar.random() * len(ADJETIVOS))]
+            modelo = f'{chr(65 + int(azar.random() * 26))}{chr(65 + int(azar.random() * 26))}-{int(azar.random() * 10000)}'
+            filas_productos.append((
+                producto_id, f'SN{producto_id:09d}', f'{tipo} {marca} {modelo}',
+                f'{tipo} {adjetivo} {marca} {modelo}',
+                stock, precio, 1 + int(azar.random() * categorias), 1 + int(azar.random() * proveedores), cadena[0][6]
+            ))
+        with conn:
+            conn.executemany('''
+                INSERT INTO productos(id, numero_serie, nombre, descripcion, cantidad, precio,
+                                      categoria_id, proveedor_id, fecha_registro)
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+            ''', filas_productos)
+            conn.executemany('''
+                INSERT INTO movimientos(producto_id, tipo, cantidad, stock_anterior, stock_posterior,
+                                        precio, fecha, usuario, descripcion)
+                VALUES(?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'), ?, ?)
+            ''', filas_movimientos)
+        cargados += len(filas_productos)
+        movimientos_cargados += len(filas_movimientos)
+        if progreso:
+            progreso(cargados, movimientos_cargados, time.perf_counter() - inicio_carga)
+
+    # Estadísticas para el planificador con la distribución real de los datos
+    conn.execute("ANALYZE")
+    conn.close()
+    return cargados, movimientos_cargados, time.perf_counter() - inicio_carga
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('ruta', help='archivo SQLite nuevo')
+    parser.add_argument('--productos', type=int, default=100000)
+    parser.add_argument('--movimientos', type=int, default=1000000)
+    parser.add_argument('--categorias', type=int, default=50)
+    parser.add_argument('--proveedores', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    def informar(productos, movimientos, segundos):
+        print(f"{productos:>10,} productos {movimientos:>12,} movimientos "
+              f"{movimientos / segundos:>10,.0f} movimientos/s", flush=True)
+
+    productos, movimientos, segundos = generar(
+        args.ruta, args.productos, args.movimientos, args.categorias, args.proveedores,
+        args.semilla, progreso=informar
+    )
+    print(f"{productos:,} productos y {movimientos:,} movimientos en {segundos:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Conexión con la interfaz de mysql.connector que ejecuta sobre SQLite.
+
+Sirve para probar y medir MySQLRepository sin un servidor MySQL: acepta
+marcadores %s, cursor(prepared=True), cursor(dictionary=True) (filas como
+dict columna -> valor) y lastrowid como mysql.connector, y
+cuenta cuántas veces se "prepara" una sentencia (un cursor preparado de
+mysql.connector vuelve a preparar cuando cambia el texto de la sentencia).
+
+    conn = mysql_simulado.connect(ruta)
+    MySQLRepository(conn).get_product_by_id(1)
+"""
+import sqlite3
+
+from pool import DEFAULT_PRAGMAS
+
+
+class CursorSimulado:
+    def __init__(self, conexion, prepared, dictionary=False):
+        self._conexion = conexion
+        self._cursor = conexion._sqlite.cursor()
+        if dictionary:
+            self._cursor.row_factory = sqlite3.Row
+        self.prepared = prepared
+        self.dictionary = dictionary
+        self._ultima = None
+
+    def _fila(self, fila):
+        return dict(fila) if self.dictionary and fila is not None else fila
+
+    def execute(self, sql, params=()):
+        if sql != self._ultima:
+            self._conexion.preparaciones += 1
+            self._ultima = sql
+        self._cursor.execute(sql.replace('%s', '?').replace('%%', '%'), params)
+        return self
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def fetchone(self):
+        return self._fila(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._fila(fila) for fila in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionSimulada:
+    def __init__(self, database):
+        self._sqlite = sqlite3.connect(database, check_same_thread=False)
+        for nombre in ('journal_mode', 'synchronous', 'foreign_keys', 'busy_timeout'):
+            self._sqlite.execute(f"PRAGMA {nombre} = {DEFAULT_PRAGMAS[nombre]}")
+        self.preparaciones = 0
+
+    def cursor(self, prepared=False, dictionary=False):
+        return CursorSimulado(self, prepared, dictionary)
+
+    def commit(self):
+        self._sqlite.commit()
+
+    def rollback(self):
+        self._sqlite.rollback()
+
+    def close(self):
+        self._sqlite.close()
+
+
+def connect(database):
+    return ConexionSimulada(database)
@@ -0,0 +1,186 @@
+"""Regresión de planes de consulta para database.py.
+
+Ejecuta cada función de database.py sobre una base temporal, captura las
+sentencias que realmente envía a SQLite (set_trace_callback devuelve el SQL
+con los parámetros ya expandidos) y revisa su EXPLAIN QUERY PLAN. Termina con
+código de salida 1 si alguna recorre una tabla completa (SCAN sin índice).
+
+    python -m bench.query_plans
+"""
+import re
+import sys
+import tempfile
+from datetime import datetime
+
+import database
+from bench import crear_base_temporal
+from pool import ConnectionPool
+
+# Tablas pequeñas (una fila por categoría/proveedor) cuyo recorrido completo es aceptable;
+# productos_fts_config es la tabla de configuración interna de FTS5, archivos_movimientos
+# tiene una fila por año archivado y productos_eliminados solo los borrados pendientes
+TABLAS_PEQUENAS = {'categorias', 'proveedores', 'resumen_categorias', 'productos_fts_config',
+                   'archivos_movimientos', 'productos_eliminados'}
+
+# Funciones que recorren todo el catálogo a propósito, con su motivo
+PERMITIDOS = {
+    'check_category_summary': 'recalcula el resumen desde productos para compararlo (flask verificar-resumen)',
+    'rebuild_category_summary': 'reconstruye el resumen desde productos; se corre a mano tras una reparación',
+    '_buscar_con_like': 'búsqueda sin productos_fts, solo mientras su backfill está pendiente',
+}
+
+_SCAN = re.compile(r'^SCAN (?:\w+\.)?(\w+)(.*)$')
+_MATERIALIZE = re.compile(r'^MATERIALIZE (\w+)')
+_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+
+
+def casos():
+    """Llamadas representativas a cada consulta de database.py"""
+    desde = datetime(2000, 1, 1)
+    hasta = datetime(2100, 1, 1)
+    return [
+        ('get_all_products', lambda c: database.get_all_products(c)),
+        ('get_all_products[pagina]', lambda c: database.get_all_products(c, 10, 5)),
+        # Las lecturas cacheadas se revisan con su función de carga
+        ('get_product_by_id', lambda c: database._load_product(c, 1)),
+        ('get_products_with_details', lambda c: database.get_products_with_details(c)),
+        ('get_products_with_details[pagina]',
+         lambda c: database.get_products_with_details(c, 10, 5)),
+        ('get_all_categories', lambda c: database._load_categories(c)),
+        ('get_products_by_category', lambda c: database.get_products_by_category(c, 1)),
+        ('get_products_by_category[pagina]', lambda c: database.get_products_by_category(c, 1, 10, 1)),
+        ('get_products_ordered_by_price', lambda c: database.get_products_ordered_by_price(c, 'ASC')),
+        ('get_products_ordered_by_price[pagina]',
+         lambda c: database.get_products_ordered_by_price(c, 'ASC', 10, (50.0, 3))),
+        ('get_products_ordered_by_price[desc]',
+         lambda c: database.get_products_ordered_by_price(c, 'DESC', 10, (50.0, 3))),
+        ('get_inventory_value_by_category', lambda c: database.get_inventory_value_by_category(c)),
+        ('get_category_summary', lambda c: database.get_category_summary(c)),
+        ('get_category_summary[categoria]', lambda c: database.get_category_summary(c, 1)),
+        ('check_category_summary', lambda c: database.check_category_summary(c)),
+        ('get_name_ids[categorias]', lambda c: database.get_name_ids(c, 'categorias')),
+        ('get_name_ids[proveedores]', lambda c: database.get_name_ids(c, 'proveedores')),
+        ('get_movement_statistics', lambda c: database.get_movement_statistics(c, 1)),
+        ('get_movement_statistics[todos]',
+         lambda c: database.get_movement_statistics(c, 1, desde, hasta, 'entrada')),
+        ('iter_products', lambda c: list(database.iter_products(c, ('id', 'nombre'), 10, 5))),
+        ('iter_products[categoria]',
+         lambda c: list(database.iter_products(c, ('id', 'precio'), 10, 1, categoria_id=2))),
+        ('iter_movements_by_product[pagina]', lambda c: list(database.iter_movements_by_product(
+            c, 1, limit=10, after=('2100-01-01 00:00:00', 10 ** 9)))),
+        ('get_movements_by_product', lambda c: database.get_movements_by_product(c, 1)),
+        ('get_movements_by_product[fechas]',
+         lambda c: database.get_movements_by_product(c, 1, desde, hasta)),
+        ('get_movements_by_product[tipo]',
+         lambda c: database.get_movements_by_product(c, 1, tipo='salida')),
+        ('get_movements_by_product[todos]',
+         lambda c: database.get_movements_by_product(c, 1, desde, hasta, 'entrada')),
+        ('search_products', lambda c: database.search_products(c, 'lap del')),
+        ('search_products[serie]', lambda c: database.search_products(c, 'E00')),
+        # Lo que usa search_products mientras falta el backfill de productos_fts
+        ('_buscar_con_like', lambda c: database._buscar_con_like(c.cursor(), ['lap', 'del'], 20)),
+        ('get_change_stamp', lambda c: database.get_change_stamp(c, 'productos', 'producto:1')),
+        ('compact_stock_snapshots', lambda c: database.compact_stock_snapshots(c, hasta, dias=1, desde=hasta)),
+        ('get_stock_at', lambda c: database.get_stock_at(c, hasta)),
+        ('get_inventory_value_at', lambda c: database.get_inventory_value_at(c, hasta.date())),
+        ('get_low_stock_products', lambda c: database.get_low_stock_products(c, 5)),
+        ('get_last_movement_id', lambda c: database.get_last_movement_id(c, 1)),
+        ('get_report_job', lambda c: database.get_report_job(c, 1)),
+        ('get_or_create_report_job', lambda c: database.get_or_create_report_job(c, 1, 1)),
+        ('insert_movimiento', lambda c: database.insert_movimiento(c, 1, 'entrada', 1)),
+        ('insert_movimientos_batch', lambda c: database.insert_movimientos_batch(
+            c, [{'producto_id': 2, 'tipo': 'entrada', 'cantidad': 1}])),
+        ('update_product_quantity', lambda c: database.update_product_quantity(c, 3, 50)),
+        ('update_product_price', lambda c: database.update_product_price(c, 4, 10.0)),
+        ('update_product_details', lambda c: database.update_product_details(c, 5, nombre='X')),
+        ('update_product_details[categoria]',
+         lambda c: database.update_product_details(c, 6, categoria_id=2)),
+        ('import_products_batch', lambda c: database.import_products_batch(
+            c, [('IMP-1', 'Importado', None, 5, 1.0, 1, None), ('SN-1', 'X', None, None, 2.0, None, None)])),
+        ('rebuild_category_summary', lambda c: database.rebuild_category_summary(c)),
+        ('delete_product', lambda c: database.delete_product(c, 20)),
+        ('purge_deleted_products', lambda c: database.purge_deleted_products(c)),
+        # Al final: archiva todos los movimientos de la base temporal
+        ('archive_movements', lambda c: database.archive_movements(
+            c, tempfile.mkdtemp(prefix='inventario_archivo_'), retener_dias=0, hasta=hasta)),
+        ('iter_movements_by_product[archivo]', lambda c: list(database.iter_movements_by_product(c, 1))),
+    ]
+
+
+def capturar(conn, llamada):
+    """Ejecutar una llamada y devolver las sentencias que envió a SQLite"""
+    sentencias = []
+    conn.set_trace_callback(sentencias.append)
+    try:
+        llamada(conn)
+    finally:
+        conn.set_trace_callback(None)
+    return [
+        sql for sql in sentencias
+        if sql.lstrip().split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+    ]
+
+
+def problemas_del_plan(sql, plan):
+    """Devolver las líneas del plan que recorren una tabla completa"""
+    # El plan nombra las tablas por su alias (SCAN p): resolverlos
+    alias = {}
+    for tabla, nombre in _ALIAS.findall(sql):
+        alias[nombre or tabla] = tabla
+    # Subconsultas materializadas (acotadas por su propio plan, que también se revisa)
+    materializadas = {m.group(1) for m in map(_MATERIALIZE.match, plan) if m}
+    problemas = []
+    for detalle in plan:
+        coincidencia = _SCAN.match(detalle)
+        if not coincidencia:
+            continue
+        tabla, resto = coincidencia.groups()
+        if 'INDEX' in resto or 'VIRTUAL TABLE' in resto:
+            continue
+        if alias.get(tabla, tabla) in TABLAS_PEQUENAS or tabla in materializadas:
+            continue
+        problemas.append(detalle)
+    return problemas
+
+
+def revisar(conn, nombre, llamada):
+    """Ejecutar un caso y devolver (estado, sql, plan) por cada sentencia que envió.
+
+    estado es 'ok', 'SCAN' (recorre una tabla completa) o 'PERMITIDO (motivo)'.
+    """
+    resultados = []
+    for sql in capturar(conn, llamada):
+        plan = [fila[3] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        problemas = problemas_del_plan(sql, plan)
+        base = nombre.split('[', 1)[0]
+        if problemas and base in PERMITIDOS:
+            estado = f"PERMITIDO ({PERMITIDOS[base]})"
+        elif problemas:
+            estado = "SCAN"
+        else:
+            estado = "ok"
+        resultados.append((estado, sql, plan))
+    return resultados
+
+
+def main():
+    pool = ConnectionPool(crear_base_temporal())
+    conn = pool.acquire()
+    fallos = 0
+
+    for nombre, llamada in casos():
+        for estado, sql, plan in revisar(conn, nombre, llamada):
+            fallos += estado == "SCAN"
+            print(f"{estado:<10} {nombre}")
+            for detalle in plan:
+                print(f"           {detalle}")
+
+    pool.release(conn)
+    pool.close_all()
+    if fallos:
+        print(f"{fallos} consulta(s) recorren una tabla completa")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
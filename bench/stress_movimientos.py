@@ -0,0 +1,136 @@
+"""Prueba de estrés de ventas concurrentes sobre un mismo producto.
+
+Compara el camino anterior (SELECT + cálculo en Python + UPDATE) con
+apply_stock_delta y con insert_movimientos_batch, y verifica que no se
+pierdan actualizaciones: el stock final debe coincidir con el inicial menos
+las ventas confirmadas.
+
+apply_stock_delta hace dos sentencias por venta (UPDATE ... RETURNING y el
+INSERT del movimiento) contra las tres del camino anterior, y el UPDATE
+condicional toma el bloqueo de escritura antes de leer el stock, así que las
+ventas concurrentes se serializan en vez de pisarse. Cuando las ventas
+llegan juntas (una caja que sincroniza, una importación), agruparlas en
+insert_movimientos_batch paga el bloqueo y el commit una vez por lote. La
+invariante de no perder actualizaciones se verifica en tests/test_stock.py.
+
+    python -m bench.stress_movimientos --hilos 8 --ventas 500 --lote 50
+"""
+import argparse
+import sqlite3
+import threading
+import time
+
+from bench import crear_base_temporal
+from database import apply_stock_delta, insert_movimientos_batch
+from pool import ConnectionPool
+
+PRODUCTO_ID = 1
+
+
+def venta_legacy(conn, producto_id, cantidad):
+    """Réplica de insert_movimiento antes del motor atómico"""
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT cantidad, precio FROM productos WHERE id = ?", (producto_id,))
+        stock_anterior, precio = cur.fetchone()
+        stock_posterior = stock_anterior - cantidad
+        if stock_posterior < 0:
+            return None
+        cur.execute('''INSERT INTO movimientos(
+                        producto_id, tipo, cantidad, stock_anterior,
+                        stock_posterior, precio, descripcion, usuario
+                    ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)''', (
+            producto_id, 'salida', cantidad, stock_anterior,
+            stock_posterior, precio, 'stress', 'bench'
+        ))
+        cur.execute("UPDATE productos SET cantidad = ? WHERE id = ?", (stock_posterior, producto_id))
+        conn.commit()
+        return cur.lastrowid
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        return None
+
+
+def venta_atomica(conn, producto_id, cantidad):
+    return apply_stock_delta(conn, producto_id, -cantidad, 'salida', 'stress', 'bench')
+
+
+def ventas_en_lote(conn, producto_id, cantidad, ventas):
+    """Varias ventas en una transacción; devuelve cuántas se confirmaron"""
+    movimiento = {'producto_id': producto_id, 'tipo': 'salida', 'cantidad': cantidad,
+                  'descripcion': 'stress', 'usuario': 'bench'}
+    return insert_movimientos_batch(conn, [movimiento] * ventas) or 0
+
+
+def ejecutar(nombre, venta, hilos, ventas, lote=None):
+    ruta = crear_base_temporal()
+    pool = ConnectionPool(ruta, max_idle=hilos)
+
+    conn = pool.acquire()
+    stock_inicial = hilos * ventas
+    conn.execute("UPDATE productos SET cantidad = ? WHERE id = ?", (stock_inicial, PRODUCTO_ID))
+    conn.execute("DELETE FROM movimientos WHERE producto_id = ?", (PRODUCTO_ID,))
+    conn.commit()
+    pool.release(conn)
+
+    confirmadas = [0] * hilos
+    barrera = threading.Barrier(hilos)
+
+    def trabajador(indice):
+        conn = pool.acquire()
+        barrera.wait()
+        if lote:
+            for inicio in range(0, ventas, lote):
+                confirmadas[indice] += ventas_en_lote(conn, PRODUCTO_ID, 1, min(lote, ventas - inicio))
+        else:
+            for _ in range(ventas):
+                if venta(conn, PRODUCTO_ID, 1) is not None:
+                    confirmadas[indice] += 1
+        pool.release(conn)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracion = time.perf_counter() - inicio
+
+    conn = pool.acquire()
+    stock_final = conn.execute(
+        "SELECT cantidad FROM productos WHERE id = ?", (PRODUCTO_ID,)
+    ).fetchone()[0]
+    registrados = conn.execute(
+        "SELECT COUNT(*) FROM movimientos WHERE producto_id = ?", (PRODUCTO_ID,)
+    ).fetchone()[0]
+    pool.release(conn)
+    pool.close_all()
+
+    total = sum(confirmadas)
+    esperado = stock_inicial - total
+    perdidas = stock_final - esperado
+    print(f"{nombre:<10} ventas={total:>6}/{hilos * ventas:<6} "
+          f"fallidas={hilos * ventas - total:>5} "
+          f"{total / duracion:>9.1f} ventas/s  "
+          f"stock_final={stock_final} esperado={esperado} "
+          f"movimientos={registrados} actualizaciones_perdidas={perdidas}")
+    return perdidas == 0 and registrados == total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--ventas', type=int, default=500, help='ventas por hilo')
+    parser.add_argument('--lote', type=int, default=50, help='ventas por transacción en el modo lote')
+    args = parser.parse_args()
+
+    ejecutar('legacy', venta_legacy, args.hilos, args.ventas)
+    correcto = ejecutar('atomico', venta_atomica, args.hilos, args.ventas)
+    correcto = ejecutar(f'lote {args.lote}', None, args.hilos, args.ventas, args.lote) and correcto
+    if not correcto:
+        raise SystemExit("apply_stock_delta perdió actualizaciones")
+
+
+if __name__ == '__main__':
+    main()
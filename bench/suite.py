@@ -0,0 +1,261 @@
+"""Suite de tiempos de database.py y de las rutas de app.py a escala.
+
+Corre cada llamada de query_plans.casos() (una por consulta de database.py)
+y, si Flask está instalado, cada ruta GET de app.url_map (rutas() las arma
+con valores de ejemplo) con el cliente de pruebas, sobre una base generada
+con bench.generador. Guarda mediana, p95 y mínimo en un JSON por corrida
+para poder seguir regresiones:
+
+    python -m bench.generador /tmp/grande.db --productos 1000000 --movimientos 50000000
+    python -m bench.suite --base /tmp/grande.db --salida bench/resultados
+    python -m bench.suite --base /tmp/grande.db --comparar bench/resultados/20250101-120000.json
+
+Con --comparar se muestra la razón contra una corrida anterior y el proceso
+termina con código 1 si alguna medición empeoró más que --umbral. Las
+llamadas de escritura modifican la base: conviene usar una copia.
+
+Es un script y no una suite de pytest-benchmark: a estas escalas una corrida
+tarda minutos y necesita una base generada aparte, así que no entra en
+pytest -q. El JSON guardado y --comparar cumplen el papel de
+--benchmark-autosave y --benchmark-compare sin agregar dependencias. Con
+pytest-benchmark instalado, bench/test_benchmark.py mide los mismos casos
+sobre la base chica de crear_base_temporal:
+
+    python -m pytest bench/test_benchmark.py --benchmark-autosave
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench import query_plans
+from bench.generador import generar
+from database import (
+    create_import_job, finish_report_job, get_last_movement_id, get_or_create_report_job,
+    update_import_job
+)
+from pool import ConnectionPool
+
+# Valores de ejemplo para los argumentos de las rutas
+EJEMPLOS = {'product_id': 1, 'categoria_id': 1, 'order': 'asc'}
+
+# Parámetros de consulta sin los que la ruta no hace trabajo
+PARAMETROS = {'buscar': {'q': 'lap'}}
+
+# Rutas GET que no se miden, con su motivo
+OMITIDAS = {
+    'static': 'archivos estáticos',
+    'eliminar_producto': 'borra el producto',
+    'generar_pdf_movimientos': 'encola la conversión a PDF (wkhtmltopdf) en cada petición',
+}
+
+# Producto de los trabajos de ejemplo de preparar_trabajos
+PRODUCTO_TRABAJOS = 1
+
+
+def preparar_trabajos(base):
+    """Un reporte terminado y una importación con errores para las rutas /reportes e /importar.
+
+    Reutiliza los de una llamada anterior si sus archivos siguen en disco.
+    Devuelve los argumentos por endpoint que se suman a EJEMPLOS.
+    """
+    pool = ConnectionPool(base)
+    conn = pool.acquire()
+    try:
+        fila = conn.execute(
+            "SELECT id, archivo FROM reportes WHERE estado = 'listo' ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if fila is not None and os.path.exists(fila[1]):
+            reporte_id = fila[0]
+        else:
+            reporte, _ = get_or_create_report_job(
+                conn, PRODUCTO_TRABAJOS, get_last_movement_id(conn, PRODUCTO_TRABAJOS)
+            )
+            reporte_id = reporte['id']
+            archivo = os.path.join(tempfile.mkdtemp(prefix='inventario_bench_'), 'reporte.pdf')
+            with open(archivo, 'wb') as f:
+                f.write(b'%PDF-1.4\n%%EOF\n')
+            finish_report_job(conn, reporte_id, archivo=archivo)
+
+        fila = conn.execute(
+            "SELECT id, archivo_errores FROM importaciones WHERE archivo_errores IS NOT NULL "
+            "ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if fila is not None and os.path.exists(fila[1]):
+            importacion_id = fila[0]
+        else:
+            importacion_id = create_import_job(conn, 'suite.csv')
+            archivo = os.path.join(tempfile.mkdtemp(prefix='inventario_bench_'), 'suite.csv.errores.csv')
+            with open(archivo, 'w', encoding='utf-8') as f:
+                f.write('fila,error,numero_serie,nombre,cantidad,precio\n2,Falta el número de serie,,Sin serie,1,1.0\n')
+            update_import_job(conn, importacion_id, estado='terminada', filas=1, insertados=0,
+                              actualizados=0, sin_cambios=0, errores=1, archivo_errores=archivo)
+    finally:
+        pool.release(conn)
+        pool.close_all()
+    return {
+        'estado_reporte': {'job_id': reporte_id},
+        'descargar_reporte': {'job_id': reporte_id},
+        'estado_importacion': {'job_id': importacion_id},
+        'errores_importacion': {'job_id': importacion_id},
+    }
+
+
+def rutas(app, trabajos=None):
+    """URLs de cada ruta GET de app.url_map, con los argumentos de EJEMPLOS.
+
+    Los de las rutas de reportes e importaciones salen de trabajos (por
+    defecto, preparar_trabajos sobre la base de la aplicación). Una ruta
+    nueva entra sola en la suite; si tiene un argumento sin valor de
+    ejemplo falla aquí, para agregarlo a EJEMPLOS o a OMITIDAS.
+    """
+    if trabajos is None:
+        trabajos = preparar_trabajos(app.config['DATABASE'])
+    adaptador = app.url_map.bind('localhost')
+    urls = []
+    for regla in sorted(app.url_map.iter_rules(), key=lambda regla: regla.rule):
+        if 'GET' not in regla.methods or regla.endpoint in OMITIDAS:
+            continue
+        propios = trabajos.get(regla.endpoint, {})
+        faltan = regla.arguments - EJEMPLOS.keys() - propios.keys()
+        if faltan:
+            raise KeyError(f"{regla.rule}: sin valor de ejemplo para {', '.join(sorted(faltan))}")
+        valores = {argumento: EJEMPLOS[argumento] for argumento in regla.arguments if argumento in EJEMPLOS}
+        valores.update(propios)
+        valores.update(PARAMETROS.get(regla.endpoint, {}))
+        urls.append(adaptador.build(regla.endpoint, valores))
+    return urls
+
+
+def cronometrar(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'mediana_ms': statistics.median(tiempos),
+        'p95_ms': tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))],
+        'min_ms': tiempos[0],
+        'repeticiones': repeticiones,
+    }
+
+
+def medir_funciones(base, repeticiones):
+    pool = ConnectionPool(base)
+    conn = pool.acquire()
+    resultados = {}
+    for nombre, llamada in query_plans.casos():
+        resultados[f'database.{nombre}'] = cronometrar(lambda: llamada(conn), repeticiones)
+    pool.release(conn)
+    pool.close_all()
+    return resultados
+
+
+def medir_rutas(base, repeticiones):
+    """Tiempos de las rutas; vacío si Flask no está instalado"""
+    os.environ['INVENTARIO_DB'] = base
+    try:
+        from app import app
+    except ImportError as e:
+        print(f"Rutas omitidas: {e}")
+        return {}
+    from http_cache import fragment_cache
+
+    # Sin páginas en caché se mide el trabajo de cada petición
+    fragment_cache.maxsize = 0
+    cliente = app.test_client()
+    resultados = {}
+    for ruta in rutas(app):
+        def pedir(ruta=ruta):
+            respuesta = cliente.get(ruta)
+            respuesta.get_data()
+            assert respuesta.status_code == 200, (ruta, respuesta.status_code)
+        resultados[f'ruta {ruta}'] = cronometrar(pedir, repeticiones)
+    return resultados
+
+
+def metadatos(base):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    conn = sqlite3.connect(base)
+    productos, movimientos = conn.execute(
+        "SELECT (SELECT COUNT(*) FROM productos), (SELECT COUNT(*) FROM movimientos)"
+    ).fetchone()
+    conn.close()
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'productos': productos,
+        'movimientos': movimientos,
+    }
+
+
+def comparar(anterior, actual, umbral):
+    """Imprimir la razón actual/anterior; devuelve cuántas mediciones empeoraron"""
+    peores = 0
+    print(f"{'medición':<52} {'antes (ms)':>11} {'ahora (ms)':>11} {'razón':>7}")
+    for nombre, medida in actual.items():
+        previa = anterior.get(nombre)
+        if previa is None:
+            continue
+        razon = medida['mediana_ms'] / previa['mediana_ms'] if previa['mediana_ms'] else 1.0
+        marca = ' REGRESIÓN' if razon > umbral else ''
+        peores += bool(marca)
+        print(f"{nombre:<52} {previa['mediana_ms']:>11.3f} {medida['mediana_ms']:>11.3f} {razon:>7.2f}{marca}")
+    return peores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', help='base generada con bench.generador (si no, se genera una)')
+    parser.add_argument('--productos', type=int, default=100000)
+    parser.add_argument('--movimientos', type=int, default=1000000)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--salida', default=os.path.join('bench', 'resultados'))
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    parser.add_argument('--umbral', type=float, default=1.25, help='razón a partir de la cual hay regresión')
+    args = parser.parse_args()
+
+    base = args.base
+    if base is None:
+        base = os.path.join(tempfile.mkdtemp(prefix='inventario_bench_'), 'suite.db')
+        print(f"Generando {args.productos:,} productos y {args.movimientos:,} movimientos en {base}")
+        generar(base, args.productos, args.movimientos)
+
+    corrida = metadatos(base)
+    resultados = medir_funciones(base, args.repeticiones)
+    resultados.update(medir_rutas(base, args.repeticiones))
+    corrida['resultados'] = resultados
+
+    for nombre, medida in resultados.items():
+        print(f"{nombre:<52} {medida['mediana_ms']:>10.3f} ms  p95 {medida['p95_ms']:>10.3f} ms")
+
+    os.makedirs(args.salida, exist_ok=True)
+    archivo = os.path.join(args.salida, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(archivo, 'w', encoding='utf-8') as f:
+        json.dump(corrida, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {archivo}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)['resultados']
+        if comparar(anterior, resultados, args.umbral):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
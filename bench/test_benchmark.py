@@ -0,0 +1,67 @@
+"""Entrada de pytest-benchmark para los casos de bench.suite.
+
+Mide cada llamada de query_plans.casos() y cada ruta de suite.rutas() sobre
+la base chica de crear_base_temporal, para seguir regresiones con las
+opciones de pytest-benchmark:
+
+    python -m pytest bench/test_benchmark.py --benchmark-autosave
+    python -m pytest bench/test_benchmark.py --benchmark-compare
+
+No está en testpaths: pytest -q no lo corre. Sin pytest-benchmark instalado
+el módulo se omite; las mediciones a escala siguen en python -m bench.suite.
+"""
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from bench import crear_base_temporal, query_plans, suite
+from pool import ConnectionPool
+
+CASOS = query_plans.casos()
+
+
+@pytest.fixture(scope='module')
+def base():
+    return crear_base_temporal()
+
+
+@pytest.fixture(scope='module')
+def conn(base):
+    pool = ConnectionPool(base)
+    conexion = pool.acquire()
+    yield conexion
+    pool.release(conexion)
+    pool.close_all()
+
+
+@pytest.fixture(scope='module')
+def cliente(base):
+    os.environ['INVENTARIO_DB'] = base
+    app = pytest.importorskip('app').app
+    from http_cache import fragment_cache
+
+    # Sin páginas en caché se mide el trabajo de cada petición
+    fragment_cache.maxsize = 0
+    # La aplicación pudo importarse antes con otra base
+    app.config['DATABASE'] = base
+    app.config['TESTING'] = True
+    return app.test_client(), suite.rutas(app)
+
+
+@pytest.mark.parametrize('nombre,llamada', CASOS, ids=[nombre for nombre, _ in CASOS])
+def test_funcion(benchmark, conn, nombre, llamada):
+    benchmark(llamada, conn)
+
+
+def test_rutas(benchmark, cliente):
+    cliente, urls = cliente
+
+    def pedir_todas():
+        for url in urls:
+            respuesta = cliente.get(url)
+            respuesta.get_data()
+            assert respuesta.status_code == 200, (url, respuesta.status_code)
+
+    benchmark(pedir_todas)
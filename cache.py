@@ -0,0 +1,233 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+class DataVersionTracker:
+    """Detectar escrituras hechas por otras conexiones con PRAGMA data_version.
+
+    SQLite cambia el valor de data_version de una conexión cuando otra
+    conexión (de este u otro proceso) confirma cambios en la base de datos.
+    Guardando el último valor visto por conexión se sabe, con una PRAGMA que
+    no toca ninguna tabla, si algo cambió desde la última consulta.
+    """
+
+    def __init__(self):
+        self._versiones = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def changed(self, conn):
+        """True si hubo escrituras ajenas desde la última vez (o si la conexión es nueva).
+
+        Devuelve None si la conexión no admite seguimiento (sqlite3.Connection
+        sin subclase no acepta referencias débiles); en ese caso no se debe
+        usar la caché con ella.
+        """
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        try:
+            with self._lock:
+                anterior = self._versiones.get(conn)
+                self._versiones[conn] = version
+        except TypeError:
+            return None
+        return anterior != version
+
+
+class ProductCache:
+    """Caché LRU en memoria de productos por id, con TTL y límite de tamaño.
+
+    Las funciones de escritura de database.py invalidan la entrada del
+    producto que modifican. Cada entrada guarda además la versión de su
+    contador 'producto:<id>' en contadores_cambios (lo mantienen los
+    triggers): cuando DataVersionTracker detecta escrituras de otras
+    conexiones, las entradas no se descartan sino que se revalidan una por
+    una al leerlas, comparando esa versión, y solo se recargan los productos
+    que cambiaron.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # product_id -> (vence, producto, versión del contador, época)
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._tracker = DataVersionTracker()
+        # Se incrementa en cada invalidación; una lectura que empezó antes de
+        # una invalidación no guarda su resultado (podría estar desactualizado)
+        self._generacion = 0
+        # Se incrementa con cada escritura ajena detectada; una entrada de una
+        # época anterior se revalida con su contador antes de usarse
+        self._epoca = 0
+        self._stats = {'hits': 0, 'misses': 0, 'invalidaciones': 0, 'reinicios': 0,
+                       'revalidaciones': 0, 'sin_cache': 0}
+
+    def configure(self, maxsize=None, ttl=None):
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._datos.clear()
+
+    @staticmethod
+    def _version(conn, product_id):
+        fila = conn.execute(
+            "SELECT version FROM contadores_cambios WHERE clave = ?", (f'producto:{product_id}',)
+        ).fetchone()
+        return fila[0] if fila else 0
+
+    def get(self, conn, product_id, cargar):
+        """Devolver el producto desde la caché o cargarlo con cargar()"""
+        cambio = self._tracker.changed(conn)
+        if cambio is None:
+            with self._lock:
+                self._stats['sin_cache'] += 1
+            return cargar()
+
+        ahora = time.monotonic()
+        with self._lock:
+            if cambio:
+                self._epoca += 1
+                self._stats['reinicios'] += 1
+            epoca = self._epoca
+            entrada = self._datos.get(product_id)
+            if entrada is not None and entrada[0] <= ahora:
+                entrada = None
+            if entrada is not None and entrada[3] == epoca:
+                self._datos.move_to_end(product_id)
+                self._stats['hits'] += 1
+                return dict(entrada[1])
+            generacion = self._generacion
+
+        # La versión se lee antes de cargar: si el producto cambia en el medio,
+        # la entrada queda con una versión vieja y la próxima revalidación la recarga
+        version = self._version(conn, product_id)
+        if entrada is not None and entrada[2] == version:
+            with self._lock:
+                if generacion == self._generacion and self._datos.get(product_id) is entrada:
+                    self._datos[product_id] = entrada[:3] + (epoca,)
+                    self._datos.move_to_end(product_id)
+                    self._stats['hits'] += 1
+                    self._stats['revalidaciones'] += 1
+                    return dict(entrada[1])
+
+        with self._lock:
+            self._stats['misses'] += 1
+        producto = cargar()
+
+        with self._lock:
+            if generacion != self._generacion:
+                return producto
+            if producto is None:
+                self._datos.pop(product_id, None)
+                return None
+            self._datos[product_id] = (ahora + self.ttl, dict(producto), version, epoca)
+            self._datos.move_to_end(product_id)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+        return producto
+
+    def invalidate(self, *product_ids):
+        """Invalidar productos concretos (o toda la caché si no se indica ninguno)"""
+        with self._lock:
+            if product_ids:
+                for product_id in product_ids:
+                    self._datos.pop(product_id, None)
+            else:
+                self._datos.clear()
+            self._generacion += 1
+            self._stats['invalidaciones'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tamano'] = len(self._datos)
+        total = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+        return stats
+
+
+class CategoryCatalog:
+    """Catálogo en memoria de las categorías con su número de productos.
+
+    Guarda la lista ordenada por nombre (tuplas id, nombre, descripcion,
+    total_productos, como las devolvía la consulta) y un índice por id. Los
+    conteos se ajustan en sitio cuando database.py agrega, elimina o cambia
+    de categoría un producto; el alta o baja de categorías y las escrituras
+    de otros procesos obligan a recargar la lista.
+    """
+
+    def __init__(self):
+        self._lista = None
+        self._por_id = {}
+        self._lock = threading.Lock()
+        self._tracker = DataVersionTracker()
+        self._generacion = 0
+        self._stats = {'hits': 0, 'recargas': 0, 'ajustes': 0, 'sin_cache': 0}
+
+    def categories(self, conn, cargar):
+        """Devolver la lista de categorías, cargándola con cargar() si hace falta"""
+        cambio = self._tracker.changed(conn)
+        if cambio is None:
+            with self._lock:
+                self._stats['sin_cache'] += 1
+            return cargar()
+
+        with self._lock:
+            if cambio:
+                self._lista = None
+                self._generacion += 1
+            if self._lista is not None:
+                self._stats['hits'] += 1
+                return list(self._lista)
+            self._stats['recargas'] += 1
+            generacion = self._generacion
+
+        categorias = cargar()
+        with self._lock:
+            if generacion == self._generacion:
+                self._lista = list(categorias)
+                self._por_id = {cat[0]: i for i, cat in enumerate(self._lista)}
+        return categorias
+
+    def get(self, conn, categoria_id, cargar):
+        """Buscar una categoría por id; None si no existe"""
+        categorias = self.categories(conn, cargar)
+        with self._lock:
+            if self._lista is not None:
+                posicion = self._por_id.get(categoria_id)
+                return self._lista[posicion] if posicion is not None else None
+        return next((cat for cat in categorias if cat[0] == categoria_id), None)
+
+    def adjust_count(self, categoria_id, delta):
+        """Sumar delta al número de productos de una categoría"""
+        if categoria_id is None:
+            return
+        with self._lock:
+            self._generacion += 1
+            self._stats['ajustes'] += 1
+            if self._lista is None:
+                return
+            posicion = self._por_id.get(categoria_id)
+            if posicion is None:
+                # Categoría desconocida para el catálogo: recargar
+                self._lista = None
+                return
+            cat = self._lista[posicion]
+            self._lista[posicion] = cat[:3] + (cat[3] + delta,)
+
+    def invalidate(self):
+        with self._lock:
+            self._lista = None
+            self._generacion += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['categorias'] = len(self._lista) if self._lista is not None else 0
+        return stats
+
+
+product_cache = ProductCache()
+category_catalog = CategoryCatalog()
@@ -0,0 +1,105 @@
+"""Mantenimiento del historial en segundo plano.
+
+Un hilo por proceso escribe los cortes diarios pendientes de stock_snapshots
+(database.compact_stock_snapshots), mueve a los archivos por año los
+movimientos más viejos que la retención (archive_movements) y borra por
+lotes el historial de los productos eliminados (purge_deleted_products).
+Cada lote es una transacción corta, así que las ventas que llegan mientras
+tanto solo esperan lo que tarda un lote. avisar() despierta al hilo después
+de eliminar un producto.
+
+    compactacion.iniciar('inventario.db', intervalo=3600)
+"""
+import threading
+import time
+
+from database import archive_movements, compact_stock_snapshots, ensure_schema, purge_deleted_products
+from pool import get_pool
+
+_hilo = None
+_detener = threading.Event()
+_despertar = threading.Event()
+_lock = threading.Lock()
+
+
+def _con_conexion(database, opciones_pool, funcion, *args, **kwargs):
+    pool = get_pool(database, **(opciones_pool or {}))
+    conn = pool.acquire()
+    try:
+        return funcion(conn, *args, **kwargs)
+    finally:
+        pool.release(conn)
+
+
+def compactar(database, dias=1, retener_dias=None, opciones_pool=None):
+    """Escribir los cortes pendientes con una conexión del pool"""
+    return _con_conexion(database, opciones_pool, compact_stock_snapshots, dias=dias, retener_dias=retener_dias)
+
+
+def archivar(database, directorio, retener_dias, opciones_pool=None):
+    """Mover a los archivos por año los movimientos anteriores a la retención"""
+    return _con_conexion(database, opciones_pool, archive_movements, directorio, retener_dias=retener_dias)
+
+
+def purgar(database, opciones_pool=None):
+    """Borrar el historial de los productos eliminados"""
+    return _con_conexion(database, opciones_pool, purge_deleted_products)
+
+
+def _bucle(database, intervalo, dias, retener_dias, directorio, retener_movimientos, opciones_pool):
+    # El hilo puede arrancar antes que la primera petición: migra él mismo
+    # (ensure_schema lo hace una sola vez por proceso)
+    if not ensure_schema(database):
+        print("Mantenimiento detenido: no se pudo preparar el esquema")
+        return
+    proximo = 0
+    while not _detener.is_set():
+        _despertar.clear()
+        if intervalo and time.monotonic() >= proximo:
+            compactar(database, dias, retener_dias, opciones_pool)
+            if directorio and retener_movimientos:
+                archivar(database, directorio, retener_movimientos, opciones_pool)
+            proximo = time.monotonic() + intervalo
+        purgar(database, opciones_pool)
+        # Sin intervalo solo se trabaja cuando avisar() lo pide
+        _despertar.wait(max(0, proximo - time.monotonic()) if intervalo else None)
+
+
+def iniciar(database, intervalo=3600, dias=1, retener_dias=None, directorio=None, retener_movimientos=None,
+            opciones_pool=None):
+    """Arrancar el hilo de mantenimiento (una sola vez por proceso).
+
+    Antes del primer ciclo el hilo crea o migra el esquema con ensure_schema.
+    intervalo es el tiempo entre compactaciones (0 las desactiva; el hilo
+    sigue borrando los productos eliminados). Los movimientos se archivan
+    en `directorio` solo si se indican el directorio y retener_movimientos.
+    opciones_pool son los argumentos de pool.get_pool (max_idle, pragmas,
+    cached_statements) por si el hilo es el primero en crear el pool.
+    """
+    global _hilo
+    with _lock:
+        if _hilo is None or not _hilo.is_alive():
+            _detener.clear()
+            _hilo = threading.Thread(
+                target=_bucle,
+                args=(database, intervalo, dias, retener_dias, directorio, retener_movimientos, opciones_pool),
+                name='compactacion-stock', daemon=True
+            )
+            _hilo.start()
+        return _hilo
+
+
+def avisar():
+    """Despertar al hilo para que borre ya el historial de los productos eliminados"""
+    _despertar.set()
+
+
+def detener(timeout=None):
+    """Pedir al hilo que termine después del trabajo en curso"""
+    global _hilo
+    with _lock:
+        hilo, _hilo = _hilo, None
+    _detener.set()
+    _despertar.set()
+    if hilo is not None:
+        hilo.join(timeout)
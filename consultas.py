@@ -0,0 +1,158 @@
+"""Registro de las sentencias de database.py cuyo texto dependía de los argumentos.
+
+sqlite3 guarda en cada conexión las sentencias ya preparadas, indexadas por
+su texto exacto (cached_statements). Una consulta armada concatenando
+filtros produce un texto distinto por combinación de argumentos: cada uno se
+prepara de nuevo y ocupa un lugar en esa caché, desplazando a las demás.
+Aquí cada sentencia se define una sola vez con los filtros opcionales como
+parámetros: los rangos de fechas sin límite usan valores centinela (así el
+índice sigue acotando el rango), los filtros que el índice no usa se
+escriben como (:valor IS NULL OR columna = :valor) y las columnas opcionales
+de un UPDATE con COALESCE.
+
+    cur.execute(consultas.MOVIMIENTOS_PRODUCTO, consultas.filtro_movimientos(producto_id, ...))
+
+SENTENCIAS reúne todas para contarlas (bench.bench_sentencias) y para
+revisar sus planes (bench.query_plans).
+"""
+from datetime import date, datetime
+
+SENTENCIAS = {}
+
+# Límites de un rango de fechas sin filtro: toda fecha de movimientos.fecha
+# ('AAAA-MM-DD HH:MM:SS') es mayor que el primero y menor que el segundo
+FECHA_MINIMA = ''
+FECHA_MAXIMA = '9999-12-31 23:59:59'
+
+
+def registrar(nombre, sql):
+    """Registrar una sentencia con un nombre único y devolver su texto"""
+    if nombre in SENTENCIAS:
+        raise ValueError(f'Sentencia registrada dos veces: {nombre}')
+    SENTENCIAS[nombre] = sql
+    return sql
+
+
+def texto_fecha(valor):
+    """Fecha como la guarda el adaptador de sqlite3 (para comparar con movimientos.fecha)"""
+    if isinstance(valor, datetime):
+        return valor.isoformat(' ')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def filtro_movimientos(producto_id, fecha_inicio=None, fecha_fin=None, tipo=None, after=None, limit=None):
+    """Parámetros de MOVIMIENTOS_PRODUCTO / ESTADISTICAS_MOVIMIENTOS (y sus variantes de archivo)"""
+    hasta = texto_fecha(fecha_fin) or FECHA_MAXIMA
+    if after:
+        # El keyset acota el rango del índice por fecha
+        hasta = min(hasta, texto_fecha(after[0]))
+    return {
+        'producto_id': producto_id,
+        'desde': texto_fecha(fecha_inicio) or FECHA_MINIMA,
+        'hasta': hasta,
+        'tipo': tipo or None,
+        'antes_fecha': texto_fecha(after[0]) if after else None,
+        'antes_id': after[1] if after else None,
+        'limite': -1 if limit is None else limit,
+    }
+
+
+# Historial de un producto (iter_movements_by_product)
+
+_FILTRO_MOVIMIENTOS = '''
+      AND m.fecha >= :desde AND m.fecha <= :hasta
+      AND (:tipo IS NULL OR m.tipo = :tipo)
+      AND (:antes_id IS NULL OR m.fecha < :antes_fecha OR m.id < :antes_id)
+'''
+
+MOVIMIENTOS_PRODUCTO = registrar('movimientos_producto', '''
+    SELECT m.id, m.fecha, m.tipo, m.cantidad, m.stock_anterior, m.stock_posterior,
+           p.precio, m.usuario, m.descripcion
+    FROM movimientos m
+    JOIN productos p ON m.producto_id = p.id
+    WHERE m.producto_id = :producto_id''' + _FILTRO_MOVIMIENTOS + '''
+    ORDER BY m.fecha DESC, m.id DESC
+    LIMIT :limite
+''')
+
+# En los archivos no está la tabla productos: el precio (el actual del
+# producto, igual que en la base principal) llega como parámetro
+MOVIMIENTOS_ARCHIVO = registrar('movimientos_archivo', '''
+    SELECT m.id, m.fecha, m.tipo, m.cantidad, m.stock_anterior, m.stock_posterior,
+           :precio, m.usuario, m.descripcion
+    FROM movimientos m
+    WHERE m.producto_id = :producto_id''' + _FILTRO_MOVIMIENTOS + '''
+    ORDER BY m.fecha DESC, m.id DESC
+    LIMIT :limite
+''')
+
+# Totales del historial filtrado (get_movement_statistics)
+
+_TOTALES_MOVIMIENTOS = '''
+    SELECT COALESCE(SUM(CASE WHEN m.stock_posterior >= m.stock_anterior THEN m.cantidad ELSE 0 END), 0),
+           COALESCE(SUM(CASE WHEN m.stock_posterior < m.stock_anterior THEN m.cantidad ELSE 0 END), 0),
+           COALESCE(SUM(m.cantidad * {precio}), 0),
+           COUNT(*)
+'''
+
+ESTADISTICAS_MOVIMIENTOS = registrar('estadisticas_movimientos', _TOTALES_MOVIMIENTOS.format(precio='p.precio') + '''
+    FROM movimientos m
+    JOIN productos p ON m.producto_id = p.id
+    WHERE m.producto_id = :producto_id''' + _FILTRO_MOVIMIENTOS)
+
+ESTADISTICAS_ARCHIVO = registrar('estadisticas_archivo', _TOTALES_MOVIMIENTOS.format(precio=':precio') + '''
+    FROM movimientos m
+    WHERE m.producto_id = :producto_id''' + _FILTRO_MOVIMIENTOS)
+
+# Archivos de movimientos que se cruzan con un rango de fechas
+ARCHIVOS_EN_RANGO = registrar('archivos_en_rango', '''
+    SELECT archivo FROM archivos_movimientos
+    WHERE filas > 0 AND hasta >= :desde AND desde <= :hasta
+    ORDER BY periodo DESC
+''')
+
+# update_product_details: None conserva el valor actual de la columna
+ACTUALIZAR_DETALLES_PRODUCTO = registrar('actualizar_detalles_producto', '''
+    UPDATE productos SET
+        nombre = COALESCE(:nombre, nombre),
+        descripcion = COALESCE(:descripcion, descripcion),
+        precio = COALESCE(:precio, precio),
+        categoria_id = COALESCE(:categoria_id, categoria_id),
+        proveedor_id = COALESCE(:proveedor_id, proveedor_id)
+    WHERE id = :id
+    RETURNING categoria_id
+''')
+
+# update_import_job: None conserva el valor; un estado final fecha el trabajo
+ACTUALIZAR_IMPORTACION = registrar('actualizar_importacion', '''
+    UPDATE importaciones SET
+        estado = COALESCE(:estado, estado),
+        filas = COALESCE(:filas, filas),
+        insertados = COALESCE(:insertados, insertados),
+        actualizados = COALESCE(:actualizados, actualizados),
+        sin_cambios = COALESCE(:sin_cambios, sin_cambios),
+        errores = COALESCE(:errores, errores),
+        archivo_errores = COALESCE(:archivo_errores, archivo_errores),
+        error = COALESCE(:error, error),
+        segundos = COALESCE(:segundos, segundos),
+        terminado = CASE WHEN COALESCE(:estado, 'en_curso') <> 'en_curso' THEN CURRENT_TIMESTAMP ELSE terminado END
+    WHERE id = :id
+''')
+
+# Productos paginados por id (iter_products), con y sin filtro de categoría.
+# La lista de columnas la elige quien llama, así que el texto se arma una
+# vez por combinación y se reutiliza
+_PRODUCTOS = {}
+
+
+def productos(columnas, por_categoria):
+    clave = (columnas, por_categoria)
+    sql = _PRODUCTOS.get(clave)
+    if sql is None:
+        sql = f"SELECT {columnas} FROM productos WHERE id > :after"
+        if por_categoria:
+            sql += " AND categoria_id = :categoria_id"
+        sql = _PRODUCTOS[clave] = sql + " ORDER BY id LIMIT :limite"
+    return sql
@@ -1,12 +1,90 @@
+import heapq
+import json
+import os
+import re
 import sqlite3
+import threading
+import time
+from itertools import islice
+from pathlib import Path
 from sqlite3 import Error
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 
-def create_connection():
+import consultas
+from cache import category_catalog, product_cache
+from migraciones import APLICADA, VERSION_ESQUEMA, migrar
+
+DEFAULT_DATABASE = 'inventario.db'
+
+def _parse_fecha(valor):
+    """Convertir un TIMESTAMP de SQLite ('YYYY-MM-DD HH:MM:SS') a datetime"""
+    # fromisoformat está implementado en C y es decenas de veces más rápido que strptime
+    return datetime.fromisoformat(valor)
+
+class Movimiento:
+    """Fila de la tabla movimientos.
+
+    Usa __slots__ en lugar de un dict por fila; la fecha se convierte a
+    datetime la primera vez que se lee (y queda guardada, así las plantillas
+    que la usan varias veces no la vuelven a convertir) y los campos de
+    presentación también se calculan solo cuando se usan.
+    Admite acceso tipo diccionario (m['fecha']) por compatibilidad.
+    """
+    __slots__ = ('id', '_fecha', 'tipo', 'cantidad', 'stock_anterior',
+                 'stock_posterior', 'precio', 'usuario', 'descripcion')
+
+    CAMPOS = ('id', 'fecha', 'tipo', 'cantidad', 'stock_anterior',
+              'stock_posterior', 'precio', 'usuario', 'descripcion')
+
+    def __init__(self, id, fecha, tipo, cantidad, stock_anterior, stock_posterior, precio, usuario, descripcion):
+        self.id = id
+        self._fecha = fecha
+        self.tipo = tipo
+        self.cantidad = cantidad
+        self.stock_anterior = stock_anterior
+        self.stock_posterior = stock_posterior
+        self.precio = precio
+        self.usuario = usuario
+        self.descripcion = descripcion
+
+    @property
+    def fecha(self):
+        if isinstance(self._fecha, str):
+            self._fecha = _parse_fecha(self._fecha)
+        return self._fecha
+
+    @property
+    def tipo_badge(self):
+        if self.tipo == 'ajuste':
+            return 'warning'
+        return 'success' if self.tipo == 'entrada' else 'danger'
+
+    @property
+    def cantidad_signo(self):
+        # Los ajustes pueden sumar o restar: el sentido sale del stock
+        return '+' if self.stock_posterior >= self.stock_anterior else '-'
+
+    def __getitem__(self, campo):
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def as_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+    def __repr__(self):
+        return f'Movimiento(id={self.id!r}, fecha={self._fecha!r}, tipo={self.tipo!r}, cantidad={self.cantidad!r})'
+
+def movimiento_factory(cursor, row):
+    """row_factory de sqlite3 que construye objetos Movimiento"""
+    return Movimiento(*row)
+
+def create_connection(db_file=DEFAULT_DATABASE):
     """Crear una conexión a la base de datos SQLite"""
     conn = None
     try:
-        conn = sqlite3.connect('inventario.db')
+        conn = sqlite3.connect(db_file)
         # Habilitar las claves foráneas
         conn.execute("PRAGMA foreign_keys = 1")
         return conn
@@ -15,70 +93,82 @@ def create_connection():
     return conn
 
 def create_tables(conn):
-    """Crear tablas en la base de datos"""
+    """Crear las tablas (o completar las que falten) aplicando las migraciones de migraciones.py"""
+    return migrar(conn) is not None
+
+# Consulta que recalcula el resumen por categoría desde cero
+_RESUMEN_DESDE_PRODUCTOS = '''
+    SELECT COALESCE(categoria_id, 0) AS categoria_id,
+           SUM(COALESCE(cantidad, 0) * precio) AS valor_total,
+           SUM(COALESCE(cantidad, 0)) AS unidades,
+           COUNT(*) AS total_productos,
+           SUM(COALESCE(cantidad, 0) <= 0) AS productos_sin_stock
+    FROM productos
+    GROUP BY COALESCE(categoria_id, 0)
+'''
+
+def rebuild_category_summary(conn):
+    """Reconstruir el resumen por categoría a partir de la tabla de productos"""
     try:
-        cursor = conn.cursor()
-        
-        # Tabla de Categorías
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS categorias (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT NOT NULL UNIQUE,
-            descripcion TEXT
-        )
-        ''')
-        
-        # Tabla de Proveedores
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS proveedores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT NOT NULL,
-            contacto TEXT,
-            telefono TEXT,
-            email TEXT UNIQUE
-        )
-        ''')
-        
-        # Tabla de Productos
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS productos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            numero_serie TEXT UNIQUE,
-            nombre TEXT NOT NULL,
-            descripcion TEXT,
-            cantidad INTEGER DEFAULT 0,
-            precio REAL NOT NULL,
-            categoria_id INTEGER,
-            proveedor_id INTEGER,
-            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (categoria_id) REFERENCES categorias (id) ON DELETE SET NULL,
-            FOREIGN KEY (proveedor_id) REFERENCES proveedores (id) ON DELETE SET NULL
-        )
-        ''')
-        
-        # Tabla de Movimientos actualizada
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS movimientos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            producto_id INTEGER NOT NULL,
-            tipo TEXT NOT NULL,  -- 'entrada' o 'salida'
-            cantidad INTEGER NOT NULL,
-            stock_anterior INTEGER NOT NULL,
-            stock_posterior INTEGER NOT NULL,
-            precio REAL NOT NULL,
-            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            usuario TEXT,
-            descripcion TEXT,
-            FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
-        )
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("DELETE FROM resumen_categorias")
+        cur.execute(f'''
+            INSERT INTO resumen_categorias (categoria_id, valor_total, unidades, total_productos, productos_sin_stock)
+            {_RESUMEN_DESDE_PRODUCTOS}
         ''')
-        
         conn.commit()
+        category_catalog.invalidate()
         return True
     except Error as e:
-        print(f"Error al crear tablas: {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"Error al reconstruir el resumen por categoría: {e}")
         return False
 
+def check_category_summary(conn, tolerancia=0.005):
+    """Comparar el resumen mantenido por triggers con uno recalculado desde cero.
+
+    Devuelve la lista de diferencias como tuplas
+    (categoria_id, campo, valor_en_resumen, valor_recalculado); vacía si
+    ambos coinciden.
+    """
+    cur = conn.cursor()
+    campos = ('valor_total', 'unidades', 'total_productos', 'productos_sin_stock')
+
+    cur.execute(_RESUMEN_DESDE_PRODUCTOS)
+    esperado = {fila[0]: fila[1:] for fila in cur.fetchall()}
+    cur.execute(f"SELECT categoria_id, {', '.join(campos)} FROM resumen_categorias")
+    actual = {fila[0]: fila[1:] for fila in cur.fetchall()}
+
+    diferencias = []
+    for categoria_id in sorted(set(esperado) | set(actual)):
+        vacio = (0.0, 0, 0, 0)
+        for campo, real, calculado in zip(campos, actual.get(categoria_id, vacio), esperado.get(categoria_id, vacio)):
+            if abs((real or 0) - (calculado or 0)) > tolerancia:
+                diferencias.append((categoria_id, campo, real, calculado))
+    return diferencias
+
+def get_change_stamp(conn, *claves):
+    """Versiones de los contadores indicados y la fecha del cambio más reciente.
+
+    Devuelve (versiones, actualizado): una tupla con la versión de cada clave
+    en el mismo orden (0 si el contador todavía no existe) y un datetime UTC,
+    o None si ninguno se modificó aún.
+    """
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT clave, version, actualizado FROM contadores_cambios
+        WHERE clave IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(claves),))
+    filas = {fila[0]: fila for fila in cur.fetchall()}
+    versiones = tuple(filas[clave][1] if clave in filas else 0 for clave in claves)
+    fechas = [fila[2] for fila in filas.values() if fila[2]]
+    actualizado = None
+    if fechas:
+        actualizado = datetime.fromisoformat(max(fechas)).replace(tzinfo=timezone.utc)
+    return versiones, actualizado
+
 # Funciones para INSERTAR datos (INSERT)
 
 def insert_categoria(conn, nombre, descripcion=None):
@@ -89,18 +179,19 @@ def insert_categoria(conn, nombre, descripcion=None):
         cur = conn.cursor()
         cur.execute(sql, (nombre, descripcion))
         conn.commit()
+        category_catalog.invalidate()
         return cur.lastrowid
     except Error as e:
         print(f"Error al insertar categoría: {e}")
         return None
 
-def insert_proveedor(conn, nombre, contacto=None, telefono=None, email=None):
+def insert_proveedor(conn, nombre, contacto=None, telefono=None, email=None, direccion=None):
     """Insertar un nuevo proveedor"""
-    sql = '''INSERT INTO proveedores(nombre, contacto, telefono, email)
-             VALUES(?, ?, ?, ?)'''
+    sql = '''INSERT INTO proveedores(nombre, contacto, telefono, email, direccion)
+             VALUES(?, ?, ?, ?, ?)'''
     try:
         cur = conn.cursor()
-        cur.execute(sql, (nombre, contacto, telefono, email))
+        cur.execute(sql, (nombre, contacto, telefono, email, direccion))
         conn.commit()
         return cur.lastrowid
     except Error as e:
@@ -108,65 +199,327 @@ def insert_proveedor(conn, nombre, contacto=None, telefono=None, email=None):
         return None
 
 def add_product(conn, numero_serie, nombre, cantidad, precio, descripcion=None, categoria_id=None, proveedor_id=None):
-    """Insertar un nuevo producto"""
+    """Insertar un nuevo producto junto con su movimiento de entrada inicial"""
     sql = '''INSERT INTO productos(numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id)
-             VALUES(?, ?, ?, ?, ?, ?, ?)'''
+             VALUES(?, ?, ?, ?, ?, ?, ?)
+             RETURNING id, categoria_id'''
     try:
         cur = conn.cursor()
         cur.execute(sql, (numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id))
-        conn.commit()
-        
-        # Registrar el movimiento de entrada inicial
+        # categoria_id puede llegar como texto desde el formulario: usar el valor guardado
+        producto_id, categoria_guardada = cur.fetchone()
+
+        # Registrar el movimiento de entrada inicial en la misma transacción
         if cantidad > 0:
-            insert_movimiento(conn, cur.lastrowid, 'entrada', cantidad, 'Registro inicial del producto')
-        
-        return cur.lastrowid
+            cur.execute('''INSERT INTO movimientos(
+                            producto_id, tipo, cantidad, stock_anterior,
+                            stock_posterior, precio, descripcion
+                        ) VALUES(?, 'entrada', ?, 0, ?, ?, ?)''', (
+                producto_id, cantidad, cantidad, precio, 'Registro inicial del producto'
+            ))
+
+        conn.commit()
+        product_cache.invalidate(producto_id)
+        category_catalog.adjust_count(categoria_guardada, 1)
+        return producto_id
     except Error as e:
+        if conn.in_transaction:
+            conn.rollback()
         print(f"Error al insertar producto: {e}")
         return None
 
-def insert_movimiento(conn, producto_id, tipo, cantidad, descripcion=None, usuario=None):
-    """Insertar un nuevo movimiento de inventario"""
+# Importación masiva de productos (importacion.py)
+
+def get_name_ids(conn, tabla):
+    """Mapa nombre (sin mayúsculas ni espacios sobrantes) -> id de 'categorias' o 'proveedores'"""
+    if tabla not in ('categorias', 'proveedores'):
+        raise ValueError(f'Tabla no admitida: {tabla}')
+    cur = conn.cursor()
+    # Con nombres repetidos (proveedores) gana el id más antiguo
+    cur.execute(f"SELECT nombre, id FROM {tabla} ORDER BY id DESC")
+    return {nombre.strip().casefold(): id_ for nombre, id_ in cur.fetchall()}
+
+def import_products_batch(conn, filas, usuario=None):
+    """Insertar o actualizar por numero_serie un lote de productos en una transacción.
+
+    filas son tuplas (numero_serie, nombre, descripcion, cantidad, precio,
+    categoria_id, proveedor_id) sin numero_serie repetidos; None en
+    descripcion, cantidad, categoria_id o proveedor_id conserva el valor del
+    producto existente (o 0 / NULL si es nuevo). Los productos nuevos con
+    stock reciben su movimiento de entrada inicial y los existentes cuyo
+    stock cambia, un movimiento 'ajuste'; los que no cambian no se escriben.
+    Devuelve (insertados, actualizados, sin_cambios) o None si falla.
+    """
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute('''
+            SELECT numero_serie, id, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id
+            FROM productos
+            WHERE numero_serie IN (SELECT value FROM json_each(?))
+        ''', (json.dumps([fila[0] for fila in filas]),))
+        previos = {fila[0]: fila for fila in cur.fetchall()}
+
+        valores = []
+        for numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id in filas:
+            previo = previos.get(numero_serie)
+            if previo is None:
+                valores.append((numero_serie, nombre, descripcion, cantidad or 0, precio, categoria_id, proveedor_id))
+            else:
+                valores.append((
+                    numero_serie, nombre,
+                    previo[3] if descripcion is None else descripcion,
+                    previo[4] if cantidad is None else cantidad,
+                    precio,
+                    previo[6] if categoria_id is None else categoria_id,
+                    previo[7] if proveedor_id is None else proveedor_id,
+                ))
+
+        # El WHERE evita reescribir (y disparar los triggers de) los productos sin cambios
+        cur.executemany('''
+            INSERT INTO productos (numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (numero_serie) DO UPDATE SET
+                nombre = excluded.nombre,
+                descripcion = excluded.descripcion,
+                cantidad = excluded.cantidad,
+                precio = excluded.precio,
+                categoria_id = excluded.categoria_id,
+                proveedor_id = excluded.proveedor_id
+            WHERE (nombre, descripcion, cantidad, precio, categoria_id, proveedor_id)
+                  IS NOT (excluded.nombre, excluded.descripcion, excluded.cantidad,
+                          excluded.precio, excluded.categoria_id, excluded.proveedor_id)
+        ''', valores)
+
+        cur.execute('''
+            SELECT numero_serie, id FROM productos
+            WHERE numero_serie IN (SELECT value FROM json_each(?))
+        ''', (json.dumps([fila[0] for fila in valores]),))
+        ids = dict(cur.fetchall())
+
+        movimientos = []
+        insertados = actualizados = 0
+        for numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id in valores:
+            previo = previos.get(numero_serie)
+            if previo is None:
+                insertados += 1
+                if cantidad > 0:
+                    movimientos.append((ids[numero_serie], 'entrada', cantidad, 0, cantidad, precio,
+                                        'Registro inicial del producto (importación)'))
+                continue
+            if previo[2:] != (nombre, descripcion, cantidad, precio, categoria_id, proveedor_id):
+                actualizados += 1
+            if cantidad != previo[4]:
+                movimientos.append((ids[numero_serie], 'ajuste', abs(cantidad - previo[4]), previo[4], cantidad,
+                                    precio, f'Importación: stock {previo[4]} -> {cantidad}'))
+
+        cur.executemany('''INSERT INTO movimientos(
+                            producto_id, tipo, cantidad, stock_anterior,
+                            stock_posterior, precio, descripcion, usuario
+                        ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)''', [m + (usuario,) for m in movimientos])
+        conn.commit()
+
+        if previos:
+            product_cache.invalidate(*(previo[1] for previo in previos.values()))
+        category_catalog.invalidate()
+        return insertados, actualizados, len(filas) - insertados - actualizados
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"Error al importar lote de productos: {e}")
+        return None
+
+def create_import_job(conn, archivo):
+    """Registrar una importación en curso y devolver su ID"""
+    try:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO importaciones (archivo) VALUES (?)", (archivo,))
+        conn.commit()
+        return cur.lastrowid
+    except sqlite3.Error as e:
+        print(f"Error al crear la importación: {e}")
+        return None
+
+# Columnas de importaciones que update_import_job puede modificar
+CAMPOS_IMPORTACION = ('estado', 'filas', 'insertados', 'actualizados', 'sin_cambios', 'errores',
+                      'archivo_errores', 'error', 'segundos')
+
+def update_import_job(conn, job_id, **campos):
+    """Actualizar el avance de una importación; al terminar (estado distinto de 'en_curso') se fecha.
+
+    Los campos que no se indican (o valen None) conservan su valor.
+    """
+    valores = {campo: campos.get(campo) for campo in CAMPOS_IMPORTACION}
+    try:
+        cur = conn.cursor()
+        cur.execute(consultas.ACTUALIZAR_IMPORTACION, {**valores, 'id': job_id})
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Error al actualizar la importación: {e}")
+        return False
+
+def get_import_job(conn, job_id):
+    """Obtener una importación por su ID (dict) o None"""
+    cur = conn.cursor()
+    cur.execute(f"SELECT id, archivo, {', '.join(CAMPOS_IMPORTACION)}, creado, terminado FROM importaciones WHERE id = ?",
+                (job_id,))
+    fila = cur.fetchone()
+    if fila is None:
+        return None
+    return dict(zip(('id', 'archivo') + CAMPOS_IMPORTACION + ('creado', 'terminado'), fila))
+
+def apply_stock_delta(conn, producto_id, delta, tipo=None, descripcion=None, usuario=None):
+    """Aplicar un cambio de stock y registrar su movimiento de forma atómica.
+
+    La primera sentencia es un UPDATE condicional con RETURNING: toma el
+    bloqueo de escritura y devuelve el stock resultante sin un SELECT previo,
+    así dos ventas concurrentes nunca leen el mismo stock anterior ni dejan
+    el producto en negativo. Si la conexión ya está en una transacción, el
+    movimiento se suma a ella y el commit queda a cargo de quien la abrió.
+    """
+    if tipo is None:
+        tipo = 'entrada' if delta >= 0 else 'salida'
+    propia = not conn.in_transaction
     try:
         cur = conn.cursor()
-        
-        # Obtener stock actual
-        cur.execute("SELECT cantidad, precio FROM productos WHERE id = ?", (producto_id,))
+        # sqlite3 abre la transacción (diferida) justo antes del UPDATE; como
+        # no hay lecturas previas, el bloqueo se toma sin riesgo de SQLITE_BUSY
+        # al promoverlo y no hace falta un BEGIN IMMEDIATE aparte
+        cur.execute("""
+            UPDATE productos
+            SET cantidad = cantidad + ?
+            WHERE id = ? AND cantidad + ? >= 0
+            RETURNING cantidad, precio
+        """, (delta, producto_id, delta))
         producto = cur.fetchone()
         if not producto:
+            # Producto inexistente o stock insuficiente
+            if propia:
+                conn.rollback()
             return None
-            
-        stock_anterior = producto[0]
+
+        stock_posterior = producto[0]
         precio = producto[1]
-        
-        # Calcular stock posterior
-        if tipo == 'entrada':
-            stock_posterior = stock_anterior + cantidad
-        else:  # salida
-            stock_posterior = stock_anterior - cantidad
-            if stock_posterior < 0:  # Evitar stock negativo
-                return None
-        
-        # Insertar movimiento
-        sql = '''INSERT INTO movimientos(
-                    producto_id, tipo, cantidad, stock_anterior, 
-                    stock_posterior, precio, descripcion, usuario
-                ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)'''
-        cur.execute(sql, (
-            producto_id, tipo, cantidad, stock_anterior,
+        stock_anterior = stock_posterior - delta
+
+        cur.execute('''INSERT INTO movimientos(
+                        producto_id, tipo, cantidad, stock_anterior,
+                        stock_posterior, precio, descripcion, usuario
+                    ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)''', (
+            producto_id, tipo, abs(delta), stock_anterior,
             stock_posterior, precio, descripcion, usuario
         ))
-        
-        # Actualizar stock en productos
-        cur.execute(
+
+        if propia:
+            conn.commit()
+        # Si la transacción es ajena, quien la confirma vuelve a invalidar
+        product_cache.invalidate(producto_id)
+        return cur.lastrowid
+    except sqlite3.Error as e:
+        if propia and conn.in_transaction:
+            conn.rollback()
+        print(f"Error al aplicar movimiento: {e}")
+        return None
+
+def insert_movimiento(conn, producto_id, tipo, cantidad, descripcion=None, usuario=None):
+    """Insertar un nuevo movimiento de inventario"""
+    delta = cantidad if tipo == 'entrada' else -cantidad
+    return apply_stock_delta(conn, producto_id, delta, tipo, descripcion, usuario)
+
+# Tipos aceptados en los lotes; los ajustes manuales ('ajuste') los registran
+# update_product_quantity y la ruta actualizar_producto con su signo
+TIPOS_MOVIMIENTO = ('entrada', 'salida')
+
+def validate_movimientos(movimientos):
+    """Validar un lote de movimientos; devuelve la lista de errores encontrados"""
+    errores = []
+    if not movimientos:
+        return ['El lote está vacío']
+    for i, mov in enumerate(movimientos):
+        if not isinstance(mov, dict):
+            errores.append(f'Línea {i}: se esperaba un objeto')
+            continue
+        if not isinstance(mov.get('producto_id'), int):
+            errores.append(f'Línea {i}: producto_id inválido')
+        if mov.get('tipo') not in TIPOS_MOVIMIENTO:
+            errores.append(f'Línea {i}: tipo debe ser entrada o salida')
+        cantidad = mov.get('cantidad')
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad <= 0:
+            errores.append(f'Línea {i}: cantidad debe ser un entero positivo')
+    return errores
+
+def insert_movimientos_batch(conn, movimientos):
+    """Aplicar un lote de movimientos en una sola transacción.
+
+    Cada movimiento es un dict con producto_id, tipo, cantidad y, de forma
+    opcional, descripcion y usuario. Las líneas se aplican en orden; si
+    alguna dejaría un producto con stock negativo (o el producto no existe)
+    se rechaza el lote completo. Devuelve el número de movimientos
+    registrados o None si el lote fue rechazado.
+    """
+    errores = validate_movimientos(movimientos)
+    if errores:
+        print(f"Lote de movimientos inválido: {'; '.join(errores)}")
+        return None
+
+    propia = not conn.in_transaction
+    try:
+        cur = conn.cursor()
+        if propia:
+            cur.execute("BEGIN IMMEDIATE")
+
+        # Leer el stock de todos los productos del lote bajo el bloqueo de escritura
+        ids = sorted({mov['producto_id'] for mov in movimientos})
+        cur.execute("""
+            SELECT id, cantidad, precio FROM productos
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(ids),))
+        stock = {fila[0]: [fila[1], fila[2]] for fila in cur.fetchall()}
+
+        filas = []
+        for i, mov in enumerate(movimientos):
+            producto = stock.get(mov['producto_id'])
+            if producto is None:
+                print(f"Lote rechazado: línea {i}, producto {mov['producto_id']} no existe")
+                if propia:
+                    conn.rollback()
+                return None
+
+            stock_anterior = producto[0]
+            if mov['tipo'] == 'entrada':
+                stock_posterior = stock_anterior + mov['cantidad']
+            else:
+                stock_posterior = stock_anterior - mov['cantidad']
+            if stock_posterior < 0:
+                print(f"Lote rechazado: línea {i}, stock insuficiente para el producto {mov['producto_id']}")
+                if propia:
+                    conn.rollback()
+                return None
+
+            producto[0] = stock_posterior
+            filas.append((
+                mov['producto_id'], mov['tipo'], mov['cantidad'], stock_anterior,
+                stock_posterior, producto[1], mov.get('descripcion'), mov.get('usuario')
+            ))
+
+        cur.executemany('''INSERT INTO movimientos(
+                            producto_id, tipo, cantidad, stock_anterior,
+                            stock_posterior, precio, descripcion, usuario
+                        ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)''', filas)
+        cur.executemany(
             "UPDATE productos SET cantidad = ? WHERE id = ?",
-            (stock_posterior, producto_id)
+            [(valores[0], producto_id) for producto_id, valores in stock.items()]
         )
-        
-        conn.commit()
-        return cur.lastrowid
+
+        if propia:
+            conn.commit()
+        product_cache.invalidate(*stock)
+        return len(filas)
     except sqlite3.Error as e:
-        print(f"Error al insertar movimiento: {e}")
+        if propia and conn.in_transaction:
+            conn.rollback()
+        print(f"Error al insertar lote de movimientos: {e}")
         return None
 
 # Funciones para INSERTAR datos masivos (para cumplir con los 15 registros por tabla)
@@ -264,17 +617,49 @@ def insert_initial_data(conn):
 
 # Funciones para CONSULTAR datos (SELECT)
 
-def get_all_products(conn):
-    """Obtener todos los productos"""
+def get_all_products(conn, limit=None, after=None):
+    """Obtener productos paginados por id (keyset: los de id mayor que after)"""
     cur = conn.cursor()
-    cur.execute("SELECT * FROM productos")
+    cur.execute(
+        "SELECT * FROM productos WHERE id > ? ORDER BY id LIMIT ?",
+        (after or 0, limit if limit is not None else -1)
+    )
     return cur.fetchall()
 
+# Columnas de productos que se pueden pedir en iter_products
+CAMPOS_PRODUCTO = ('id', 'numero_serie', 'nombre', 'descripcion', 'cantidad', 'precio',
+                   'categoria_id', 'proveedor_id', 'fecha_registro')
+
+def iter_products(conn, campos=CAMPOS_PRODUCTO, limit=None, after=None, categoria_id=None, batch_size=1000):
+    """Recorrer productos leyendo solo las columnas pedidas, paginados por id.
+
+    Devuelve tuplas en el orden de campos; las columnas desconocidas se
+    ignoran. Las filas se leen del cursor por bloques de batch_size a medida
+    que se consumen.
+    """
+    columnas = ', '.join(campo for campo in campos if campo in CAMPOS_PRODUCTO) or 'id'
+    query = consultas.productos(columnas, categoria_id is not None)
+    params = {'after': after or 0, 'categoria_id': categoria_id, 'limite': limit if limit is not None else -1}
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            productos = cursor.fetchmany(batch_size)
+            if not productos:
+                break
+            yield from productos
+    except sqlite3.Error as e:
+        print(f"Error al obtener productos: {e}")
+
 def get_product_by_id(db, product_id):
+    """Obtener un producto por id, pasando por la caché de productos"""
+    return product_cache.get(db, product_id, lambda: _load_product(db, product_id))
+
+def _load_product(db, product_id):
     cursor = db.cursor()
     try:
         cursor.execute("""
-            SELECT id, numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id 
+            SELECT id, numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id,
+                   fecha_registro
             FROM productos 
             WHERE id = ?
         """, (product_id,))
@@ -288,14 +673,15 @@ def get_product_by_id(db, product_id):
                 'cantidad': producto[4],
                 'precio': producto[5],
                 'categoria_id': producto[6],
-                'proveedor_id': producto[7]
+                'proveedor_id': producto[7],
+                'fecha_registro': producto[8]
             }
     except sqlite3.Error as e:
         print(f"Error al obtener producto: {e}")
     return None
 
-def get_products_with_details(conn):
-    """Obtener productos con detalles de categoría y proveedor (JOIN)"""
+def get_products_with_details(conn, limit=None, after=None):
+    """Obtener productos con detalles de categoría y proveedor (JOIN), paginados por id"""
     cur = conn.cursor()
     cur.execute('''
         SELECT p.id, p.numero_serie, p.nombre, p.cantidad, p.precio, 
@@ -303,19 +689,25 @@ def get_products_with_details(conn):
         FROM productos p
         LEFT JOIN categorias c ON p.categoria_id = c.id
         LEFT JOIN proveedores pv ON p.proveedor_id = pv.id
-    ''')
+        WHERE p.id > ?
+        ORDER BY p.id
+        LIMIT ?
+    ''', (after or 0, limit if limit is not None else -1))
     return cur.fetchall()
 
 def get_all_categories(conn):
-    """Obtener todas las categorías"""
+    """Obtener todas las categorías con su número de productos (desde el catálogo en memoria)"""
+    return category_catalog.categories(conn, lambda: _load_categories(conn))
+
+def _load_categories(conn):
     try:
         cur = conn.cursor()
+        # El conteo sale del resumen materializado, no de un JOIN con productos
         cur.execute("""
             SELECT c.id, c.nombre, c.descripcion,
-                   COUNT(p.id) as total_productos
+                   COALESCE(r.total_productos, 0) as total_productos
             FROM categorias c
-            LEFT JOIN productos p ON c.id = p.categoria_id
-            GROUP BY c.id, c.nombre, c.descripcion
+            LEFT JOIN resumen_categorias r ON r.categoria_id = c.id
             ORDER BY c.nombre
         """)
         return cur.fetchall()
@@ -325,89 +717,637 @@ def get_all_categories(conn):
 
 def get_category_name(conn, categoria_id):
     """Obtener el nombre de una categoría específica"""
+    categoria = category_catalog.get(conn, categoria_id, lambda: _load_categories(conn))
+    return categoria[1] if categoria else "Categoría no encontrada"
+
+# Columnas de cada resultado de search_products
+CAMPOS_BUSQUEDA = ('id', 'numero_serie', 'nombre', 'descripcion', 'cantidad', 'precio', 'categoria_id')
+
+_TERMINO_BUSQUEDA = re.compile(r'\w+')
+
+# Versión de la migración que crea y llena productos_fts
+MIGRACION_FTS = 4
+
+_aviso_busqueda_sin_fts = False
+
+def _busqueda_sin_fts(cur):
+    """True mientras el backfill de productos_fts no terminó.
+
+    Pasa en una base que ya tenía productos al migrar, hasta correr flask
+    migrar: el índice solo tiene los productos escritos después. Avisa una
+    vez por proceso.
+    """
+    global _aviso_busqueda_sin_fts
+    cur.execute("SELECT estado FROM schema_migrations WHERE version = ?", (MIGRACION_FTS,))
+    fila = cur.fetchone()
+    if fila is not None and fila[0] == APLICADA:
+        return False
+    if not _aviso_busqueda_sin_fts:
+        _aviso_busqueda_sin_fts = True
+        print("Aviso: el índice de búsqueda productos_fts está incompleto; "
+              "la búsqueda usa LIKE (lenta) hasta correr 'flask migrar'")
+    return True
+
+def _buscar_con_like(cur, terminos, limit):
+    """Buscar sin productos_fts: cada término como subcadena de alguna columna.
+
+    Recorre la tabla productos (los más recientes primero); solo se usa
+    mientras falta el backfill del índice.
+    """
+    condiciones = []
+    params = []
+    for termino in terminos:
+        # Los términos son \w+: de los comodines de LIKE solo pueden traer '_'
+        patron = '%' + termino.replace('_', '\\_') + '%'
+        condiciones.append("(nombre LIKE ? ESCAPE '\\' OR descripcion LIKE ? ESCAPE '\\' "
+                           "OR numero_serie LIKE ? ESCAPE '\\')")
+        params += [patron] * 3
+    cur.execute(f'''
+        SELECT id, numero_serie, nombre, descripcion, cantidad, precio, categoria_id
+        FROM productos
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY id DESC
+        LIMIT ?
+    ''', params + [limit])
+    return cur.fetchall()
+
+def _buscar_con_fts(cur, terminos, limit, candidatos):
+    """Las `candidatos` coincidencias más recientes en productos_fts, ordenadas por bm25"""
+    # Cada término entre comillas: la entrada del usuario no se interpreta
+    # como sintaxis de FTS5 (AND, NOT, columnas...)
+    consulta = ' '.join(f'"{termino}"*' for termino in terminos)
+    cur.execute('''
+        SELECT p.id, p.numero_serie, p.nombre, p.descripcion, p.cantidad, p.precio, p.categoria_id
+        FROM (
+            SELECT rowid, bm25(productos_fts, 10.0, 1.0, 5.0) AS puntaje
+            FROM productos_fts
+            WHERE productos_fts MATCH ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) coincidencias
+        JOIN productos p ON p.id = coincidencias.rowid
+        ORDER BY coincidencias.puntaje
+        LIMIT ?
+    ''', (consulta, candidatos, limit))
+    return cur.fetchall()
+
+def search_products(conn, q, limit=20, candidatos=200):
+    """Buscar productos por nombre, descripción o número de serie (productos_fts).
+
+    Cada palabra de q se busca como prefijo y todas deben aparecer, así
+    "cab bor" encuentra "Cable Boreal AX-12". Se ordenan por bm25 (más peso
+    para el nombre y el número de serie) las `candidatos` coincidencias más
+    recientes: con términos muy comunes ("cable" en 30.000 productos) puntuar
+    todas costaría cientos de ms, y para escribir y sugerir alcanza con
+    ordenar una ventana acotada. Una sola palabra se busca primero como
+    prefijo del número de serie en su índice único, tal como está escrita
+    (el índice distingue mayúsculas; en otra capitalización la encuentra
+    productos_fts, que no las distingue), y una última letra suelta
+    después de otras palabras se ignora (coincide con casi todo el catálogo).
+    Mientras el backfill de productos_fts está pendiente se busca con LIKE.
+    Devuelve una lista de diccionarios con las claves de CAMPOS_BUSQUEDA.
+    """
+    terminos = _TERMINO_BUSQUEDA.findall(q or '')[:8]
+    if len(terminos) > 1 and len(terminos[-1]) == 1:
+        terminos.pop()
+    if not terminos:
+        return []
     try:
         cur = conn.cursor()
-        cur.execute("SELECT nombre FROM categorias WHERE id = ?", (categoria_id,))
-        resultado = cur.fetchone()
-        return resultado[0] if resultado else "Categoría no encontrada"
-    except sqlite3.Error as e:
-        print(f"Error al obtener nombre de categoría: {e}")
-        return "Error"
+        resultados = []
+        q = q.strip()
+        if len(terminos) == 1 and ' ' not in q:
+            cur.execute('''
+                SELECT id, numero_serie, nombre, descripcion, cantidad, precio, categoria_id
+                FROM productos
+                WHERE numero_serie >= ? AND numero_serie < ?
+                ORDER BY numero_serie
+                LIMIT ?
+            ''', (q, q + '\U0010ffff', limit))
+            resultados = [dict(zip(CAMPOS_BUSQUEDA, fila)) for fila in cur.fetchall()]
+            if len(resultados) == limit:
+                return resultados
 
-def get_products_by_category(conn, categoria_id):
-    """Filtrar productos por categoría (WHERE)"""
+        if _busqueda_sin_fts(cur):
+            filas = _buscar_con_like(cur, terminos, limit + len(resultados))
+        else:
+            filas = _buscar_con_fts(cur, terminos, limit, candidatos)
+        vistos = {producto['id'] for producto in resultados}
+        for fila in filas:
+            if fila[0] not in vistos and len(resultados) < limit:
+                resultados.append(dict(zip(CAMPOS_BUSQUEDA, fila)))
+        return resultados
+    except Error as e:
+        print(f"Error al buscar productos: {e}")
+        return []
+
+def get_products_by_category(conn, categoria_id, limit=None, after=None):
+    """Filtrar productos por categoría (WHERE), paginados por id"""
     cur = conn.cursor()
-    cur.execute("SELECT * FROM productos WHERE categoria_id = ?", (categoria_id,))
+    cur.execute(
+        "SELECT * FROM productos WHERE categoria_id = ? AND id > ? ORDER BY id LIMIT ?",
+        (categoria_id, after or 0, limit if limit is not None else -1)
+    )
     return cur.fetchall()
 
-def get_products_ordered_by_price(conn, order="ASC"):
-    """Obtener productos ordenados por precio (ORDER BY)"""
+def get_products_ordered_by_price(conn, order="ASC", limit=None, after=None):
+    """Obtener productos ordenados por precio (ORDER BY).
+
+    La paginación es por keyset sobre (precio, id): after es la tupla
+    (precio, id) del último producto de la página anterior.
+    """
     cur = conn.cursor()
+    limit = limit if limit is not None else -1
     if order.upper() == "ASC":
-        cur.execute("SELECT * FROM productos ORDER BY precio ASC")
+        if after is None:
+            cur.execute("SELECT * FROM productos ORDER BY precio ASC, id ASC LIMIT ?", (limit,))
+        else:
+            cur.execute("""
+                SELECT * FROM productos
+                WHERE (precio, id) > (?, ?)
+                ORDER BY precio ASC, id ASC
+                LIMIT ?
+            """, (after[0], after[1], limit))
     else:
-        cur.execute("SELECT * FROM productos ORDER BY precio DESC")
+        if after is None:
+            cur.execute("SELECT * FROM productos ORDER BY precio DESC, id DESC LIMIT ?", (limit,))
+        else:
+            cur.execute("""
+                SELECT * FROM productos
+                WHERE (precio, id) < (?, ?)
+                ORDER BY precio DESC, id DESC
+                LIMIT ?
+            """, (after[0], after[1], limit))
     return cur.fetchall()
 
 def get_inventory_value_by_category(conn):
-    """Obtener valor del inventario agrupado por categoría (GROUP BY)"""
+    """Obtener valor del inventario por categoría (desde el resumen materializado)"""
     cur = conn.cursor()
     cur.execute('''
-        SELECT c.nombre as categoria, SUM(p.cantidad * p.precio) as valor_total
-        FROM productos p
-        JOIN categorias c ON p.categoria_id = c.id
-        GROUP BY p.categoria_id
-        HAVING valor_total > 0
-        ORDER BY valor_total DESC
+        SELECT c.nombre as categoria, ROUND(r.valor_total, 2) as valor_total
+        FROM resumen_categorias r
+        JOIN categorias c ON r.categoria_id = c.id
+        WHERE ROUND(r.valor_total, 2) > 0
+        ORDER BY r.valor_total DESC
     ''')
     return cur.fetchall()
 
-def get_movements_by_product(conn, product_id, fecha_inicio=None, fecha_fin=None, tipo=None):
-    """Obtener movimientos de un producto específico"""
+def get_category_summary(conn, categoria_id=None):
+    """Estadísticas de inventario de una categoría (o de todas) desde el resumen"""
+    cur = conn.cursor()
+    if categoria_id is None:
+        cur.execute('''
+            SELECT COALESCE(SUM(total_productos), 0), COALESCE(SUM(valor_total), 0),
+                   COALESCE(SUM(unidades), 0), COALESCE(SUM(productos_sin_stock), 0)
+            FROM resumen_categorias
+        ''')
+    else:
+        cur.execute('''
+            SELECT total_productos, valor_total, unidades, productos_sin_stock
+            FROM resumen_categorias
+            WHERE categoria_id = ?
+        ''', (categoria_id,))
+    fila = cur.fetchone() or (0, 0.0, 0, 0)
+    total_productos = fila[0]
+    return {
+        'total_productos': total_productos,
+        'valor_total': round(fila[1], 2),
+        'stock_promedio': fila[2] / total_productos if total_productos else 0.0,
+        'productos_sin_stock': fila[3]
+    }
+
+# Archivo de movimientos: archive_movements mueve los movimientos anteriores a
+# la retención a un archivo SQLite por año, registrado en archivos_movimientos
+# con el rango de fechas que contiene. Las lecturas del historial de un
+# producto suman los archivos cuyo rango se cruza con el filtro de fechas
+
+_ESQUEMA_ARCHIVO = '''
+    CREATE TABLE IF NOT EXISTS movimientos (
+        id INTEGER PRIMARY KEY,
+        producto_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        cantidad INTEGER NOT NULL,
+        stock_anterior INTEGER NOT NULL,
+        stock_posterior INTEGER NOT NULL,
+        precio REAL NOT NULL,
+        fecha TIMESTAMP,
+        usuario TEXT,
+        descripcion TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_movimientos_producto_fecha
+    ON movimientos (producto_id, fecha DESC, tipo);
+'''
+
+def _directorio_base(conn):
+    """Directorio del archivo de la base principal (las rutas del archivo son relativas a él)"""
+    cur = conn.cursor()
+    cur.execute("PRAGMA database_list")
+    for _, nombre, archivo in cur.fetchall():
+        if nombre == 'main':
+            return os.path.dirname(archivo or '')
+    return ''
+
+def _abrir_archivo(ruta, escritura=False):
+    """Conexión propia a un archivo de movimientos (de solo lectura salvo al archivar)"""
+    if escritura:
+        archivo = sqlite3.connect(ruta)
+        archivo.executescript(_ESQUEMA_ARCHIVO)
+        return archivo
+    return sqlite3.connect(f'{Path(ruta).resolve().as_uri()}?mode=ro', uri=True)
+
+def _archivos_para(conn, desde=consultas.FECHA_MINIMA, hasta=consultas.FECHA_MAXIMA):
+    """Rutas de los archivos con movimientos dentro del rango de fechas"""
+    cur = conn.cursor()
+    cur.execute(consultas.ARCHIVOS_EN_RANGO, {'desde': desde, 'hasta': hasta})
+    archivos = cur.fetchall()
+    if not archivos:
+        return []
+    base = _directorio_base(conn)
+    return [os.path.join(base, archivo) for (archivo,) in archivos]
+
+def archive_movements(conn, directorio, retener_dias=730, lote=5000, hasta=None):
+    """Mover a archivos por año los movimientos anteriores a la retención.
+
+    El límite es la medianoche de `hasta` (hoy, UTC) menos retener_dias, y
+    nunca pasa del último corte completo de stock_snapshots: get_stock_at
+    reconstruye el stock desde un corte con los movimientos que siguen en la
+    base. Cada lote de `lote` movimientos se copia primero al archivo del año
+    y después se borra de la base en su propia transacción; si el proceso se
+    corta entre ambos pasos, la próxima corrida copia de nuevo (INSERT OR
+    IGNORE) y borra. Devuelve una lista de (periodo, filas movidas) o None.
+    """
+    if hasta is None:
+        hasta = datetime.now(timezone.utc)
+    limite = (datetime(hasta.year, hasta.month, hasta.day) - timedelta(days=retener_dias)).strftime('%Y-%m-%d %H:%M:%S')
+    movidos = {}
+    archivo = None
     try:
+        cur = conn.cursor()
+        cur.execute("SELECT MAX(fecha) FROM stock_snapshot_cortes WHERE completo = 1")
+        ultimo_corte = cur.fetchone()[0]
+        if ultimo_corte is None:
+            print("No se archivan movimientos: falta un corte de stock (compact_stock_snapshots)")
+            return []
+        limite = min(limite, ultimo_corte)
+        base = _directorio_base(conn)
+
+        while True:
+            cur.execute("SELECT fecha FROM movimientos WHERE fecha < ? ORDER BY fecha LIMIT 1", (limite,))
+            fila = cur.fetchone()
+            if fila is None:
+                break
+            periodo = fila[0][:4]
+            fin_periodo = min(limite, f'{int(periodo) + 1}-01-01 00:00:00')
+            ruta = os.path.join(directorio, f'movimientos_{periodo}.db')
+            os.makedirs(directorio, exist_ok=True)
+            archivo = _abrir_archivo(ruta, escritura=True)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR IGNORE INTO archivos_movimientos (periodo, archivo) VALUES (?, ?)",
+                (periodo, os.path.relpath(ruta, base or '.'))
+            )
+            conn.commit()
+
+            while True:
+                cur.execute('''
+                    SELECT id, producto_id, tipo, cantidad, stock_anterior, stock_posterior,
+                           precio, fecha, usuario, descripcion
+                    FROM movimientos
+                    WHERE fecha < ?
+                    ORDER BY fecha
+                    LIMIT ?
+                ''', (fin_periodo, lote))
+                filas = cur.fetchall()
+                if not filas:
+                    break
+                copiadas = archivo.executemany(
+                    "INSERT OR IGNORE INTO movimientos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", filas
+                ).rowcount
+                archivo.commit()
+
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "DELETE FROM movimientos WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps([f[0] for f in filas]),)
+                )
+                conn.execute('''
+                    UPDATE archivos_movimientos
+                    SET filas = filas + ?,
+                        desde = MIN(COALESCE(desde, ?), ?),
+                        hasta = MAX(COALESCE(hasta, ?), ?),
+                        actualizado = CURRENT_TIMESTAMP
+                    WHERE periodo = ?
+                ''', (copiadas, filas[0][7], filas[0][7], filas[-1][7], filas[-1][7], periodo))
+                conn.commit()
+                movidos[periodo] = movidos.get(periodo, 0) + len(filas)
+
+            archivo.close()
+            archivo = None
+        return sorted(movidos.items())
+    except Error as e:
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"Error al archivar movimientos: {e}")
+        return None
+    finally:
+        if archivo is not None:
+            archivo.close()
+
+def _leer_bloques(cursor, batch_size):
+    while True:
+        filas = cursor.fetchmany(batch_size)
+        if not filas:
+            return
+        yield from filas
+
+def iter_movements_by_product(conn, product_id, fecha_inicio=None, fecha_fin=None, tipo=None, batch_size=1000,
+                              limit=None, after=None):
+    """Recorrer los movimientos de un producto sin cargarlos todos en memoria.
+
+    Lee el cursor en bloques de batch_size filas con fetchmany, de modo que la
+    memoria usada no depende del tamaño del historial. Con after (tupla fecha,
+    id del último movimiento ya leído) y limit se pagina por keyset. Si el
+    rango de fechas alcanza movimientos archivados, cada archivo se lee con
+    la misma consulta y los resultados se intercalan por fecha.
+    """
+    archivos = []
+    try:
+        params = consultas.filtro_movimientos(product_id, fecha_inicio, fecha_fin, tipo, after, limit)
         cursor = conn.cursor()
-        query = """
-            SELECT m.fecha, m.tipo, m.cantidad, m.stock_anterior, m.stock_posterior, 
-                   p.precio, m.usuario, m.descripcion
-            FROM movimientos m
-            JOIN productos p ON m.producto_id = p.id
-            WHERE m.producto_id = ?
-        """
-        params = [product_id]
-        
-        if fecha_inicio:
-            query += " AND m.fecha >= ?"
-            params.append(fecha_inicio)
-        if fecha_fin:
-            query += " AND m.fecha <= ?"
-            params.append(fecha_fin)
-        if tipo:
-            query += " AND m.tipo = ?"
-            params.append(tipo)
-            
-        query += " ORDER BY m.fecha DESC"
-        
-        cursor.execute(query, tuple(params))
-        movimientos = cursor.fetchall()
-        
-        # Convertir los resultados a diccionarios
-        return [
-            {
-                'fecha': datetime.strptime(m[0], '%Y-%m-%d %H:%M:%S') if isinstance(m[0], str) else m[0],
-                'tipo': m[1],
-                'cantidad': m[2],
-                'stock_anterior': m[3],
-                'stock_posterior': m[4],
-                'precio': m[5],
-                'usuario': m[6],
-                'descripcion': m[7],
-                'tipo_badge': 'success' if m[1] == 'entrada' else 'danger',
-                'cantidad_signo': '+' if m[1] == 'entrada' else '-'
-            }
-            for m in movimientos
-        ]
+        cursor.row_factory = movimiento_factory
+        cursor.execute(consultas.MOVIMIENTOS_PRODUCTO, params)
+        fuentes = [_leer_bloques(cursor, batch_size)]
+
+        rutas = _archivos_para(conn, params['desde'], params['hasta'])
+        if rutas:
+            cur = conn.cursor()
+            cur.execute("SELECT precio FROM productos WHERE id = ?", (product_id,))
+            producto = cur.fetchone()
+            for ruta in rutas if producto else []:
+                archivo = _abrir_archivo(ruta)
+                archivos.append(archivo)
+                cursor_archivo = archivo.cursor()
+                cursor_archivo.row_factory = movimiento_factory
+                cursor_archivo.execute(consultas.MOVIMIENTOS_ARCHIVO, {**params, 'precio': producto[0]})
+                fuentes.append(_leer_bloques(cursor_archivo, batch_size))
+
+        if len(fuentes) == 1:
+            yield from fuentes[0]
+            return
+        movimientos = heapq.merge(*fuentes, key=lambda m: (m._fecha, m.id), reverse=True)
+        yield from islice(movimientos, limit)
     except sqlite3.Error as e:
         print(f"Error al obtener movimientos: {e}")
+    finally:
+        for archivo in archivos:
+            archivo.close()
+
+def get_movements_by_product(conn, product_id, fecha_inicio=None, fecha_fin=None, tipo=None):
+    """Obtener movimientos de un producto específico (lista de Movimiento)"""
+    return list(iter_movements_by_product(conn, product_id, fecha_inicio, fecha_fin, tipo))
+
+def get_movement_statistics(conn, product_id, fecha_inicio=None, fecha_fin=None, tipo=None):
+    """Totales de los movimientos de un producto en una sola consulta (agregación condicional).
+
+    Entradas y salidas se cuentan por el sentido del cambio de stock, así los
+    ajustes suman en uno u otro total según corresponda. Los movimientos
+    archivados dentro del rango se suman con la misma consulta por archivo.
+    """
+    totales = [0, 0, 0.0, 0]
+    try:
+        params = consultas.filtro_movimientos(product_id, fecha_inicio, fecha_fin, tipo)
+        cursor = conn.cursor()
+        cursor.execute(consultas.ESTADISTICAS_MOVIMIENTOS, params)
+        totales = list(cursor.fetchone())
+
+        rutas = _archivos_para(conn, params['desde'], params['hasta'])
+        if rutas:
+            cursor.execute("SELECT precio FROM productos WHERE id = ?", (product_id,))
+            producto = cursor.fetchone()
+            for ruta in rutas if producto else []:
+                archivo = _abrir_archivo(ruta)
+                try:
+                    fila = archivo.execute(consultas.ESTADISTICAS_ARCHIVO, {**params, 'precio': producto[0]}).fetchone()
+                finally:
+                    archivo.close()
+                totales = [total + valor for total, valor in zip(totales, fila)]
+    except sqlite3.Error as e:
+        print(f"Error al obtener estadísticas de movimientos: {e}")
+        totales = [0, 0, 0.0, 0]
+    return {
+        'total_entradas': totales[0],
+        'total_salidas': totales[1],
+        'valor_total': totales[2],
+        'total_movimientos': totales[3]
+    }
+
+# Snapshots de stock (stock_snapshots): cada corte guarda el stock y el precio
+# de los productos con stock > 0 según los movimientos anteriores al corte
+
+def _tope_fecha(valor):
+    """Límite exclusivo ('AAAA-MM-DD HH:MM:SS') de los movimientos incluidos en una fecha.
+
+    Un date (o 'AAAA-MM-DD') cubre el día completo, así que su límite es el
+    corte de la medianoche siguiente; un datetime incluye ese segundo.
+    """
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor) if len(valor) == 10 else datetime.fromisoformat(valor)
+    if isinstance(valor, datetime):
+        tope = valor.replace(microsecond=0) + timedelta(seconds=1)
+    else:
+        tope = datetime(valor.year, valor.month, valor.day) + timedelta(days=1)
+    return tope.strftime('%Y-%m-%d %H:%M:%S')
+
+def _copiar_corte(conn, corte, previo, desde, hasta):
+    """Escribir las filas de un corte para los productos del rango (desde, hasta].
+
+    Sin corte previo el stock sale del último movimiento de cada producto; con
+    corte previo se copian sus filas salvo las de productos que tuvieron
+    movimientos entre ambos cortes (esos los escribe _movimientos_del_corte).
+    """
+    if previo is None:
+        conn.execute('''
+            INSERT OR IGNORE INTO stock_snapshots (fecha, producto_id, cantidad, precio)
+            SELECT ?, producto_id, stock_posterior, precio FROM (
+                SELECT producto_id, stock_posterior, precio,
+                       ROW_NUMBER() OVER (PARTITION BY producto_id ORDER BY fecha DESC, id DESC) AS n
+                FROM movimientos
+                WHERE producto_id > ? AND producto_id <= ? AND fecha < ?
+            )
+            WHERE n = 1 AND stock_posterior > 0 AND producto_id IN (SELECT id FROM productos)
+        ''', (corte, desde, hasta, corte))
+    else:
+        conn.execute('''
+            INSERT OR IGNORE INTO stock_snapshots (fecha, producto_id, cantidad, precio)
+            SELECT ?, s.producto_id, s.cantidad, s.precio
+            FROM stock_snapshots s
+            WHERE s.fecha = ? AND s.producto_id > ? AND s.producto_id <= ?
+              AND s.producto_id IN (SELECT id FROM productos)
+              AND NOT EXISTS (
+                  SELECT 1 FROM movimientos m
+                  WHERE m.producto_id = s.producto_id AND m.fecha >= ? AND m.fecha < ?
+              )
+        ''', (corte, previo, desde, hasta, previo, corte))
+
+def _movimientos_del_corte(conn, corte, previo):
+    """Stock de los productos con movimientos entre dos cortes (lectura por fecha)"""
+    conn.execute('''
+        INSERT OR IGNORE INTO stock_snapshots (fecha, producto_id, cantidad, precio)
+        SELECT ?, producto_id, stock_posterior, precio FROM (
+            SELECT producto_id, stock_posterior, precio,
+                   ROW_NUMBER() OVER (PARTITION BY producto_id ORDER BY fecha DESC, id DESC) AS n
+            FROM movimientos
+            WHERE fecha >= ? AND fecha < ?
+        )
+        WHERE n = 1 AND stock_posterior > 0 AND producto_id IN (SELECT id FROM productos)
+    ''', (corte, previo, corte))
+
+def compact_stock_snapshots(conn, hasta=None, dias=1, desde=None, lote=50000, retener_dias=None):
+    """Escribir los cortes de stock pendientes hasta `hasta` (por defecto hoy, UTC).
+
+    Los cortes caen a medianoche cada `dias` días. El primero se arma desde
+    todo el historial en la fecha `desde` (o en el último corte posible si no
+    se indica); cada corte siguiente copia el anterior y aplica solo los
+    movimientos entre ambos. Cada lote de `lote` productos es una transacción
+    propia y un corte interrumpido continúa donde quedó. Con retener_dias se
+    borran los cortes más viejos salvo los del día 1 de cada mes.
+    Devuelve una lista de (corte, productos, segundos), o None si falla.
+    """
+    if hasta is None:
+        hasta = datetime.now(timezone.utc)
+    ultimo_posible = datetime(hasta.year, hasta.month, hasta.day)
+    creados = []
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT fecha, completo FROM stock_snapshot_cortes ORDER BY fecha DESC LIMIT 1")
+        fila = cur.fetchone()
+        if fila is None:
+            siguiente = datetime(desde.year, desde.month, desde.day) if desde else ultimo_posible
+            previo = None
+        elif fila[1]:
+            previo = fila[0]
+            siguiente = datetime.strptime(previo, '%Y-%m-%d %H:%M:%S') + timedelta(days=dias)
+        else:
+            # Corte a medio escribir: retomarlo
+            siguiente = datetime.strptime(fila[0], '%Y-%m-%d %H:%M:%S')
+            cur.execute("SELECT MAX(fecha) FROM stock_snapshot_cortes WHERE completo = 1")
+            previo = cur.fetchone()[0]
+
+        while siguiente <= ultimo_posible:
+            inicio = time.perf_counter()
+            corte = siguiente.strftime('%Y-%m-%d %H:%M:%S')
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR IGNORE INTO stock_snapshot_cortes (fecha) VALUES (?)", (corte,))
+            if previo is not None:
+                _movimientos_del_corte(conn, corte, previo)
+            conn.commit()
+
+            cur.execute("SELECT progreso FROM stock_snapshot_cortes WHERE fecha = ?", (corte,))
+            progreso = cur.fetchone()[0]
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM productos")
+            maximo = cur.fetchone()[0]
+            while progreso < maximo:
+                tope = min(progreso + lote, maximo)
+                conn.execute("BEGIN IMMEDIATE")
+                _copiar_corte(conn, corte, previo, progreso, tope)
+                conn.execute("UPDATE stock_snapshot_cortes SET progreso = ? WHERE fecha = ?", (tope, corte))
+                conn.commit()
+                progreso = tope
+
+            cur.execute("SELECT COUNT(*) FROM stock_snapshots WHERE fecha = ?", (corte,))
+            productos = cur.fetchone()[0]
+            duracion = time.perf_counter() - inicio
+            conn.execute('''
+                UPDATE stock_snapshot_cortes SET completo = 1, productos = ?, duracion = duracion + ?
+                WHERE fecha = ?
+            ''', (productos, duracion, corte))
+            conn.commit()
+            creados.append((corte, productos, duracion))
+            previo = corte
+            siguiente += timedelta(days=dias)
+
+        if retener_dias is not None:
+            limite = (ultimo_posible - timedelta(days=retener_dias)).strftime('%Y-%m-%d %H:%M:%S')
+            cur.execute('''
+                SELECT fecha FROM stock_snapshot_cortes
+                WHERE fecha < ? AND substr(fecha, 9, 2) <> '01'
+                  AND fecha < (SELECT MAX(fecha) FROM stock_snapshot_cortes WHERE completo = 1)
+            ''', (limite,))
+            for (corte,) in cur.fetchall():
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM stock_snapshots WHERE fecha = ?", (corte,))
+                conn.execute("DELETE FROM stock_snapshot_cortes WHERE fecha = ?", (corte,))
+                conn.commit()
+        return creados
+    except Error as e:
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"Error al compactar el stock: {e}")
+        return None
+
+# Stock de cada producto en una fecha: último corte completo hasta la fecha
+# más los movimientos entre el corte y la fecha (sin corte, todo el historial)
+_STOCK_EN_FECHA = '''
+    WITH delta AS MATERIALIZED (
+        SELECT producto_id, stock_posterior AS cantidad, precio FROM (
+            SELECT producto_id, stock_posterior, precio,
+                   ROW_NUMBER() OVER (PARTITION BY producto_id ORDER BY fecha DESC, id DESC) AS n
+            FROM movimientos
+            WHERE fecha >= :corte AND fecha < :tope
+        )
+        WHERE n = 1
+    )
+    SELECT producto_id, cantidad, precio FROM delta WHERE cantidad > 0
+    UNION ALL
+    SELECT producto_id, cantidad, precio FROM stock_snapshots
+    WHERE fecha = :corte AND producto_id NOT IN (SELECT producto_id FROM delta)
+'''
+
+def _corte_para(conn, tope):
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(fecha) FROM stock_snapshot_cortes WHERE completo = 1 AND fecha <= ?", (tope,))
+    return cur.fetchone()[0] or ''
+
+def get_stock_at(conn, fecha):
+    """Stock y precio de cada producto con stock > 0 en una fecha.
+
+    fecha es un datetime (se incluyen los movimientos hasta ese instante) o
+    un date (el día completo). Devuelve una lista de (producto_id, cantidad,
+    precio) ordenada por producto; el precio es el del último movimiento.
+    Antes del límite de archive_movements solo son exactas las fechas que
+    caen en un corte conservado (el cierre de cada mes).
+    """
+    tope = _tope_fecha(fecha)
+    try:
+        cur = conn.cursor()
+        cur.execute(f'''
+            SELECT s.producto_id, s.cantidad, s.precio
+            FROM ({_STOCK_EN_FECHA}) s
+            JOIN productos p ON p.id = s.producto_id
+            ORDER BY s.producto_id
+        ''', {'corte': _corte_para(conn, tope), 'tope': tope})
+        return cur.fetchall()
+    except Error as e:
+        print(f"Error al obtener el stock en {fecha}: {e}")
+        return []
+
+def get_inventory_value_at(conn, fecha):
+    """Valor del inventario por categoría en una fecha (mismo formato que get_inventory_value_by_category)"""
+    tope = _tope_fecha(fecha)
+    try:
+        cur = conn.cursor()
+        cur.execute(f'''
+            SELECT c.nombre as categoria, ROUND(SUM(s.cantidad * s.precio), 2) as valor_total
+            FROM ({_STOCK_EN_FECHA}) s
+            JOIN productos p ON p.id = s.producto_id
+            JOIN categorias c ON c.id = p.categoria_id
+            GROUP BY c.id
+            HAVING valor_total > 0
+            ORDER BY valor_total DESC
+        ''', {'corte': _corte_para(conn, tope), 'tope': tope})
+        return cur.fetchall()
+    except Error as e:
+        print(f"Error al obtener el valor del inventario en {fecha}: {e}")
         return []
 
 def get_low_stock_products(conn, threshold=5):
@@ -422,66 +1362,34 @@ def update_product_quantity(conn, product_id, nueva_cantidad):
     """Actualizar la cantidad de un producto y registrar el movimiento"""
     try:
         cur = conn.cursor()
-        
-        # Obtener cantidad actual y precio
-        cur.execute("SELECT cantidad, precio FROM productos WHERE id = ?", (product_id,))
+        # Tomar el bloqueo de escritura antes de leer para que la diferencia
+        # calculada no quede obsoleta por otra escritura concurrente
+        cur.execute("BEGIN IMMEDIATE")
+
+        cur.execute("SELECT cantidad FROM productos WHERE id = ?", (product_id,))
         producto = cur.fetchone()
-        
-        if producto:
-            cantidad_actual = producto[0]
-            precio_actual = producto[1]
-            diferencia = nueva_cantidad - cantidad_actual
-            
-            # Si hay diferencia, registrar el movimiento
-            if diferencia != 0:
-                # Determinar tipo de movimiento
-                tipo = 'entrada' if diferencia > 0 else 'salida'
-                cantidad_movimiento = abs(diferencia)
-                
-                # Comenzar transacción
-                cur.execute("BEGIN TRANSACTION")
-                
-                try:
-                    # Actualizar la cantidad en productos
-                    cur.execute("""
-                        UPDATE productos 
-                        SET cantidad = ? 
-                        WHERE id = ?
-                    """, (nueva_cantidad, product_id))
-                    
-                    # Registrar el movimiento
-                    cur.execute("""
-                        INSERT INTO movimientos (
-                            producto_id, tipo, cantidad, 
-                            stock_anterior, stock_posterior,
-                            precio, usuario, descripcion
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        product_id,
-                        tipo,
-                        cantidad_movimiento,
-                        cantidad_actual,
-                        nueva_cantidad,
-                        precio_actual,
-                        'sistema',
-                        f'Actualización manual: {tipo} de {cantidad_movimiento} unidades'
-                    ))
-                    
-                    # Confirmar transacción
-                    conn.commit()
-                    return True
-                    
-                except sqlite3.Error as e:
-                    # Si hay error, revertir cambios
-                    conn.rollback()
-                    print(f"Error en la transacción: {e}")
-                    return False
-            
+        if not producto:
+            conn.rollback()
+            return False  # Producto no encontrado
+
+        diferencia = nueva_cantidad - producto[0]
+        if diferencia == 0:
+            conn.rollback()
             return True  # No hay cambio en la cantidad
-            
-        return False  # Producto no encontrado
-        
+
+        sentido = 'entrada' if diferencia > 0 else 'salida'
+        descripcion = f'Actualización manual: {sentido} de {abs(diferencia)} unidades'
+        if apply_stock_delta(conn, product_id, diferencia, 'ajuste', descripcion, 'sistema') is None:
+            conn.rollback()
+            return False
+
+        conn.commit()
+        product_cache.invalidate(product_id)
+        return True
+
     except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.rollback()
         print(f"Error al actualizar cantidad: {e}")
         return False
 
@@ -491,58 +1399,234 @@ def update_product_price(conn, product_id, nuevo_precio):
         cur = conn.cursor()
         cur.execute("UPDATE productos SET precio = ? WHERE id = ?", (nuevo_precio, product_id))
         conn.commit()
+        product_cache.invalidate(product_id)
         return True
     except Error as e:
         print(f"Error al actualizar precio: {e}")
         return False
 
 def update_product_details(conn, product_id, nombre=None, descripcion=None, precio=None, categoria_id=None, proveedor_id=None):
-    """Actualizar detalles de un producto"""
+    """Actualizar detalles de un producto (los valores vacíos dejan la columna como está)"""
     try:
-        updates = []
-        parameters = []
-        
-        if nombre:
-            updates.append("nombre = ?")
-            parameters.append(nombre)
-        if descripcion:
-            updates.append("descripcion = ?")
-            parameters.append(descripcion)
-        if precio:
-            updates.append("precio = ?")
-            parameters.append(precio)
-        if categoria_id:
-            updates.append("categoria_id = ?")
-            parameters.append(categoria_id)
-        if proveedor_id:
-            updates.append("proveedor_id = ?")
-            parameters.append(proveedor_id)
-        
-        if not updates:
+        cambios = {
+            'nombre': nombre or None,
+            'descripcion': descripcion or None,
+            'precio': precio or None,
+            'categoria_id': categoria_id or None,
+            'proveedor_id': proveedor_id or None,
+        }
+        if not any(valor is not None for valor in cambios.values()):
             return False
-        
-        parameters.append(product_id)
-        
+
         cur = conn.cursor()
-        cur.execute(f"UPDATE productos SET {', '.join(updates)} WHERE id = ?", parameters)
+        categoria_anterior = None
+        if categoria_id:
+            # Leer la categoría anterior bajo el mismo bloqueo que el UPDATE
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT categoria_id FROM productos WHERE id = ?", (product_id,))
+            fila = cur.fetchone()
+            categoria_anterior = fila[0] if fila else None
+        cur.execute(consultas.ACTUALIZAR_DETALLES_PRODUCTO, {**cambios, 'id': product_id})
+        fila = cur.fetchone()
         conn.commit()
+        product_cache.invalidate(product_id)
+        if categoria_id and fila and fila[0] != categoria_anterior:
+            category_catalog.adjust_count(categoria_anterior, -1)
+            category_catalog.adjust_count(fila[0], 1)
         return True
     except Error as e:
+        if conn.in_transaction:
+            conn.rollback()
         print(f"Error al actualizar producto: {e}")
         return False
 
+# Funciones para la cola de REPORTES
+
+def get_last_movement_id(conn, product_id):
+    """Obtener el id del último movimiento de un producto (0 si no tiene)"""
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM movimientos WHERE producto_id = ?", (product_id,))
+    return cur.fetchone()[0]
+
+def get_report_job(conn, job_id):
+    """Obtener un trabajo de reporte por su ID"""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT id, producto_id, ultimo_movimiento_id, estado, archivo, error, creado, terminado
+        FROM reportes
+        WHERE id = ?
+    """, (job_id,))
+    reporte = cur.fetchone()
+    if reporte:
+        return {
+            'id': reporte[0],
+            'producto_id': reporte[1],
+            'ultimo_movimiento_id': reporte[2],
+            'estado': reporte[3],
+            'archivo': reporte[4],
+            'error': reporte[5],
+            'creado': reporte[6],
+            'terminado': reporte[7]
+        }
+    return None
+
+def get_or_create_report_job(conn, product_id, ultimo_movimiento_id, vencimiento_minutos=10):
+    """Obtener el trabajo de reporte para (producto, último movimiento) o crearlo.
+
+    Devuelve (reporte, encolar): encolar es True cuando hay que generar el
+    PDF, ya sea porque el trabajo es nuevo, porque falló o porque quedó
+    pendiente más de vencimiento_minutos (p. ej. el proceso se reinició).
+    """
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("""
+            INSERT INTO reportes (producto_id, ultimo_movimiento_id)
+            VALUES (?, ?)
+            ON CONFLICT (producto_id, ultimo_movimiento_id) DO NOTHING
+        """, (product_id, ultimo_movimiento_id))
+        encolar = cur.rowcount == 1
+
+        if not encolar:
+            cur.execute("""
+                UPDATE reportes
+                SET estado = 'pendiente', error = NULL, creado = CURRENT_TIMESTAMP, terminado = NULL
+                WHERE producto_id = ? AND ultimo_movimiento_id = ?
+                  AND (estado = 'error'
+                       OR (estado = 'pendiente' AND creado < datetime('now', ?)))
+            """, (product_id, ultimo_movimiento_id, f'-{vencimiento_minutos} minutes'))
+            encolar = cur.rowcount == 1
+
+        cur.execute(
+            "SELECT id FROM reportes WHERE producto_id = ? AND ultimo_movimiento_id = ?",
+            (product_id, ultimo_movimiento_id)
+        )
+        job_id = cur.fetchone()[0]
+        conn.commit()
+        return get_report_job(conn, job_id), encolar
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"Error al crear trabajo de reporte: {e}")
+        return None, False
+
+def finish_report_job(conn, job_id, archivo=None, error=None):
+    """Marcar un trabajo de reporte como terminado (listo o con error)"""
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE reportes
+            SET estado = ?, archivo = ?, error = ?, terminado = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, ('error' if error else 'listo', archivo, error, job_id))
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Error al actualizar trabajo de reporte: {e}")
+        return False
+
 # Funciones para ELIMINAR datos (DELETE)
 
 def delete_product(conn, product_id):
-    """Eliminar un producto por su ID"""
+    """Eliminar un producto por su ID.
+
+    Solo se borra la fila del producto, con las claves foráneas desactivadas
+    para que sus movimientos, cortes de stock y reportes no caigan en cascada
+    dentro de la misma transacción. El producto queda en productos_eliminados
+    y purge_deleted_products borra ese historial por lotes en segundo plano;
+    mientras tanto las consultas lo ignoran porque cruzan con productos.
+
+    PRAGMA foreign_keys no tiene efecto dentro de una transacción, así que
+    con una transacción abierta por quien llama el borrado caería en cascada;
+    en ese caso no se borra nada y se devuelve False.
+    """
+    if conn.in_transaction:
+        print("Error al eliminar producto: no se puede eliminar dentro de una transacción abierta")
+        return False
+
+    cur = conn.cursor()
+    cur.execute("PRAGMA foreign_keys")
+    claves_foraneas = cur.fetchone()[0]
     try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM productos WHERE id = ?", (product_id,))
+        conn.execute("PRAGMA foreign_keys = 0")
+        cur.execute("DELETE FROM productos WHERE id = ? RETURNING categoria_id", (product_id,))
+        fila = cur.fetchone()
+        if fila:
+            cur.execute("INSERT OR IGNORE INTO productos_eliminados (producto_id) VALUES (?)", (product_id,))
         conn.commit()
+        product_cache.invalidate(product_id)
+        if fila:
+            category_catalog.adjust_count(fila[0], -1)
         return True
     except Error as e:
+        if conn.in_transaction:
+            conn.rollback()
         print(f"Error al eliminar producto: {e}")
         return False
+    finally:
+        if not conn.in_transaction:
+            conn.execute(f"PRAGMA foreign_keys = {claves_foraneas}")
+
+# Borrado por lotes de lo que antes caía en cascada con el producto
+_PURGA_PRODUCTO = [
+    "DELETE FROM movimientos WHERE id IN (SELECT id FROM movimientos WHERE producto_id = ? LIMIT ?)",
+    '''DELETE FROM stock_snapshots WHERE producto_id = ?1 AND fecha IN (
+           SELECT fecha FROM stock_snapshots WHERE producto_id = ?1 LIMIT ?2)''',
+    "DELETE FROM reportes WHERE id IN (SELECT id FROM reportes WHERE producto_id = ? LIMIT ?)",
+]
+
+def purge_deleted_products(conn, lote=5000):
+    """Borrar por lotes el historial de los productos eliminados con delete_product.
+
+    Cada lote es su propia transacción, así que un producto con años de
+    movimientos no bloquea a los escritores más de lo que tarda un lote; los
+    movimientos archivados se borran de cada archivo. Un producto sale de
+    productos_eliminados cuando no le queda nada. Devuelve la cantidad de
+    productos terminados, o None si falla.
+    """
+    terminados = 0
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT producto_id FROM productos_eliminados ORDER BY solicitado, producto_id")
+        pendientes = [fila[0] for fila in cur.fetchall()]
+        if not pendientes:
+            return 0
+        cur.execute("SELECT periodo, archivo FROM archivos_movimientos WHERE filas > 0")
+        base = _directorio_base(conn)
+        archivos = [(periodo, os.path.join(base, archivo)) for periodo, archivo in cur.fetchall()]
+
+        for producto_id in pendientes:
+            for sql in _PURGA_PRODUCTO:
+                borradas = lote
+                while borradas == lote:
+                    conn.execute("BEGIN IMMEDIATE")
+                    borradas = conn.execute(sql, (producto_id, lote)).rowcount
+                    conn.commit()
+
+            for periodo, ruta in archivos:
+                archivo = _abrir_archivo(ruta, escritura=True)
+                try:
+                    borradas = lote
+                    while borradas == lote:
+                        borradas = archivo.execute(_PURGA_PRODUCTO[0], (producto_id, lote)).rowcount
+                        archivo.commit()
+                        conn.execute("BEGIN IMMEDIATE")
+                        conn.execute("UPDATE archivos_movimientos SET filas = filas - ? WHERE periodo = ?",
+                                     (borradas, periodo))
+                        conn.commit()
+                finally:
+                    archivo.close()
+
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM productos_eliminados WHERE producto_id = ?", (producto_id,))
+            conn.commit()
+            terminados += 1
+        return terminados
+    except Error as e:
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"Error al borrar el historial de productos eliminados: {e}")
+        return None
 
 def delete_categoria(conn, categoria_id):
     """Eliminar una categoría por su ID"""
@@ -550,6 +1634,9 @@ def delete_categoria(conn, categoria_id):
         cur = conn.cursor()
         cur.execute("DELETE FROM categorias WHERE id = ?", (categoria_id,))
         conn.commit()
+        # ON DELETE SET NULL modifica productos que pueden estar en caché
+        product_cache.invalidate()
+        category_catalog.invalidate()
         return True
     except Error as e:
         print(f"Error al eliminar categoría: {e}")
@@ -561,29 +1648,77 @@ def delete_proveedor(conn, proveedor_id):
         cur = conn.cursor()
         cur.execute("DELETE FROM proveedores WHERE id = ?", (proveedor_id,))
         conn.commit()
+        product_cache.invalidate()
         return True
     except Error as e:
         print(f"Error al eliminar proveedor: {e}")
         return False
 
 # Función para inicializar la base de datos
-def initialize_database():
-    """Inicializar la base de datos con tablas y datos iniciales"""
-    conn = create_connection()
-    if conn is not None:
-        create_tables(conn)
-        # Verificar si ya hay datos
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM productos")
-        count = cur.fetchone()[0]
-        
-        if count == 0:
-            # Insertar datos iniciales si la base de datos está vacía
-            insert_initial_data(conn)
-        
+# Bases ya verificadas en este proceso (ensure_schema)
+_esquemas_listos = set()
+_esquemas_lock = threading.Lock()
+
+def _tiene_productos(conn):
+    """True si la tabla productos existe y tiene filas"""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos'")
+    if cur.fetchone() is None:
+        return False
+    cur.execute("SELECT EXISTS (SELECT 1 FROM productos)")
+    return bool(cur.fetchone()[0])
+
+def ensure_schema(db_file=DEFAULT_DATABASE):
+    """Crear o migrar el esquema una sola vez por proceso.
+
+    Si PRAGMA user_version ya está en la versión actual no se ejecuta ningún
+    CREATE TABLE; las llamadas siguientes del mismo proceso no abren conexión.
+    Devuelve True si el esquema está listo.
+    """
+    if db_file in _esquemas_listos:
+        return True
+
+    with _esquemas_lock:
+        if db_file in _esquemas_listos:
+            return True
+        conn = create_connection(db_file)
+        if conn is None:
+            print("Error! No se pudo crear la conexión a la base de datos.")
+            return False
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < VERSION_ESQUEMA:
+                # El DDL pendiente se aplica siempre; los backfills de una base con
+                # datos se corren aparte (flask migrar) para no demorar el arranque
+                if migrar(conn, con_backfills=not _tiene_productos(conn)) is None:
+                    return False
+        finally:
+            conn.close()
+        _esquemas_listos.add(db_file)
+        return True
+
+def seed_database(db_file=DEFAULT_DATABASE):
+    """Insertar los datos iniciales si la base no tiene productos.
+
+    Devuelve True si se insertaron datos.
+    """
+    if not ensure_schema(db_file):
+        return False
+    conn = create_connection(db_file)
+    if conn is None:
+        return False
+    try:
+        if conn.execute("SELECT EXISTS (SELECT 1 FROM productos)").fetchone()[0]:
+            return False
+        insert_initial_data(conn)
+        return True
+    finally:
         conn.close()
-    else:
-        print("Error! No se pudo crear la conexión a la base de datos.")
+
+def initialize_database(db_file=DEFAULT_DATABASE):
+    """Inicializar la base de datos con tablas y datos iniciales"""
+    if ensure_schema(db_file):
+        seed_database(db_file)
 
 # Si este script se ejecuta directamente, inicializar la base de datos
 if __name__ == '__main__':
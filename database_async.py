@@ -0,0 +1,114 @@
+import asyncio
+import contextvars
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+import database
+from pool import get_pool
+
+
+class DatabaseExecutor:
+    """Pool de hilos acotado para las llamadas a SQLite desde código asíncrono.
+
+    Cada hilo toma una conexión de pool.ConnectionPool la primera vez y la
+    conserva, así nunca hay más conexiones abiertas que hilos y el event loop
+    no se bloquea esperando a la base de datos.
+    """
+
+    def __init__(self, database_file, max_workers=4, **pool_kwargs):
+        self.pool = get_pool(database_file, **pool_kwargs)
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sqlite')
+        self._conexiones = set()
+        self._lock = threading.Lock()
+
+    def _llamar(self, funcion, args, kwargs):
+        conn = self.pool.acquire()
+        with self._lock:
+            self._conexiones.add(conn)
+        resultado = funcion(conn, *args, **kwargs)
+        # Los generadores (iter_*) se consumen en el mismo hilo que su conexión
+        if inspect.isgenerator(resultado):
+            resultado = list(resultado)
+        return resultado
+
+    async def run(self, funcion, *args, **kwargs):
+        """Ejecutar funcion(conn, *args, **kwargs) en un hilo del pool.
+
+        La llamada corre en una copia del contexto actual, así el hilo ve las
+        ContextVar de quien llama (metricas.ruta_actual, entre otras).
+        """
+        loop = asyncio.get_running_loop()
+        contexto = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, contexto.run, partial(self._llamar, funcion, args, kwargs))
+
+    def shutdown(self):
+        """Esperar las llamadas pendientes y devolver las conexiones al pool"""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._conexiones:
+                self.pool.release(conn)
+            self._conexiones.clear()
+
+
+_executor = None
+
+
+def configure(database_file, max_workers=4, **pool_kwargs):
+    """Crear el executor que usan las funciones asíncronas de este módulo.
+
+        configure('inventario.db', max_workers=4)
+        productos = await get_all_products(50)
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+    _executor = DatabaseExecutor(database_file, max_workers, **pool_kwargs)
+    return _executor
+
+
+def configured():
+    return _executor is not None
+
+
+def get_executor():
+    if _executor is None:
+        raise RuntimeError('database_async no está configurado: llamar primero a configure()')
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def _envolver(funcion):
+    @wraps(funcion)
+    async def envoltura(*args, **kwargs):
+        return await get_executor().run(funcion, *args, **kwargs)
+    return envoltura
+
+
+# Funciones de database.py que reciben la conexión como primer argumento.
+# Las de la forma iter_* devuelven una lista (conviene pasar limit)
+FUNCIONES = (
+    'add_product', 'apply_stock_delta', 'insert_movimiento', 'insert_movimientos_batch',
+    'get_all_products', 'get_product_by_id', 'get_products_with_details', 'iter_products',
+    'get_all_categories', 'get_category_name', 'get_products_by_category',
+    'get_products_ordered_by_price', 'get_inventory_value_by_category', 'get_inventory_value_at',
+    'get_category_summary', 'get_change_stamp',
+    'iter_movements_by_product', 'get_movements_by_product', 'get_movement_statistics',
+    'get_low_stock_products', 'get_last_movement_id',
+    'update_product_quantity', 'update_product_price', 'update_product_details',
+    'delete_product',
+)
+
+for _nombre in FUNCIONES:
+    globals()[_nombre] = _envolver(getattr(database, _nombre))
+
+__all__ = ['DatabaseExecutor', 'configure', 'configured', 'get_executor', 'shutdown', *FUNCIONES]
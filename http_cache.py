@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request, session
+
+from database import get_change_stamp
+
+
+class FragmentCache:
+    """Caché LRU de páginas ya renderizadas, indexada por ruta y versiones.
+
+    Como la clave incluye las versiones de los contadores de cambios, una
+    entrada nunca queda desactualizada: cuando los datos cambian la clave
+    cambia y la entrada vieja termina saliendo por LRU.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, clave):
+        with self._lock:
+            html = self._datos.get(clave)
+            if html is None:
+                self._stats['misses'] += 1
+                return None
+            self._datos.move_to_end(clave)
+            self._stats['hits'] += 1
+            return html
+
+    def put(self, clave, html):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = html
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tamano'] = len(self._datos)
+        return stats
+
+
+fragment_cache = FragmentCache()
+
+
+def conditional_get(get_db, claves, fragmentos=False):
+    """Decorador para rutas de solo lectura con ETag y Last-Modified.
+
+    claves es la lista de contadores de cambios de los que depende la página
+    (o una función que la calcula a partir de los argumentos de la ruta). Si
+    el cliente ya tiene la versión actual se responde 304 sin llamar a la
+    vista. Con fragmentos=True el HTML generado se guarda en fragment_cache y
+    se reutiliza para otros clientes mientras las versiones no cambien.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            # Con mensajes flash pendientes la página es única: no cachear
+            if session.get('_flashes'):
+                return vista(*args, **kwargs)
+
+            lista = claves(**kwargs) if callable(claves) else claves
+            versiones, actualizado = get_change_stamp(get_db(), *lista)
+            etag = '-'.join(str(version) for version in versiones)
+
+            if request.if_none_match:
+                vigente = request.if_none_match.contains_weak(etag)
+            else:
+                vigente = (actualizado is not None and request.if_modified_since is not None
+                           and actualizado <= request.if_modified_since)
+            if vigente:
+                respuesta = Response(status=304)
+            else:
+                clave = (request.endpoint, request.full_path, versiones)
+                html = fragment_cache.get(clave) if fragmentos else None
+                if html is not None:
+                    respuesta = make_response(html)
+                else:
+                    respuesta = make_response(vista(*args, **kwargs))
+                    # Errores y redirecciones no se cachean
+                    if respuesta.status_code != 200 or session.get('_flashes'):
+                        return respuesta
+                    if fragmentos:
+                        fragment_cache.put(clave, respuesta.get_data(as_text=True))
+
+            # Débil: la página incluye la hora de generación, que no cuenta como cambio
+            respuesta.set_etag(etag, weak=True)
+            if actualizado is not None:
+                respuesta.last_modified = actualizado
+            respuesta.headers['Cache-Control'] = 'no-cache'
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,255 @@
+"""Importación masiva de productos desde CSV o XLSX.
+
+El archivo se lee fila a fila (csv.reader, u openpyxl en modo read_only para
+XLSX), así que la memoria usada no depende de su tamaño. Los nombres de
+categoría y proveedor se resuelven con mapas en memoria cargados una vez, y
+las filas válidas se escriben por lotes con database.import_products_batch:
+un upsert por numero_serie y los movimientos iniciales en una transacción
+por lote. Las filas con errores se copian a un CSV aparte con el número de
+fila y el motivo. Como es un upsert, repetir una importación cortada a la
+mitad es seguro.
+
+    resumen = importar_productos(conn, 'catalogo.csv', 'catalogo_errores.csv', progreso=informar)
+
+Columnas reconocidas (sin importar mayúsculas ni tildes): numero_serie,
+nombre, precio (obligatorias), descripcion, cantidad, categoria, proveedor.
+"""
+import csv
+import os
+import threading
+import time
+import unicodedata
+
+from database import (
+    create_import_job, get_name_ids, import_products_batch, insert_categoria, insert_proveedor,
+    update_import_job
+)
+from pool import get_pool
+
+COLUMNAS = ('numero_serie', 'nombre', 'descripcion', 'cantidad', 'precio', 'categoria', 'proveedor')
+OBLIGATORIAS = ('numero_serie', 'nombre', 'precio')
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+def _columna(encabezado):
+    """'Número de serie' -> 'numero_de_serie'; 'Categoría' -> 'categoria'"""
+    texto = unicodedata.normalize('NFKD', str(encabezado or '')).encode('ascii', 'ignore').decode()
+    columna = '_'.join(texto.strip().lower().split())
+    return 'numero_serie' if columna == 'numero_de_serie' else columna
+
+
+def _leer_csv(ruta):
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        try:
+            dialecto = csv.Sniffer().sniff(f.read(4096), delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        f.seek(0)
+        lector = csv.reader(f, dialecto)
+        encabezado = [_columna(c) for c in next(lector, [])]
+        yield encabezado
+        for numero, valores in enumerate(lector, start=2):
+            yield numero, valores
+
+
+def _leer_xlsx(ruta):
+    # openpyxl solo se necesita para importar XLSX
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        yield [_columna(c) for c in next(filas, ())]
+        for numero, valores in enumerate(filas, start=2):
+            yield numero, valores
+    finally:
+        libro.close()
+
+
+def leer_filas(ruta):
+    """Encabezado y luego (número de fila, dict columna -> valor), sin cargar el archivo completo"""
+    filas = _leer_xlsx(ruta) if ruta.lower().endswith(('.xlsx', '.xlsm')) else _leer_csv(ruta)
+    encabezado = next(filas)
+    faltantes = [columna for columna in OBLIGATORIAS if columna not in encabezado]
+    if faltantes:
+        raise FilaInvalida(f"Faltan columnas: {', '.join(faltantes)}")
+    yield encabezado
+    for numero, valores in filas:
+        if any(valor not in (None, '') and str(valor).strip() for valor in valores):
+            yield numero, dict(zip(encabezado, valores))
+
+
+def _texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # números de serie leídos como número en XLSX
+    return str(valor).strip() or None
+
+
+def _numero(valor, columna, tipo):
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    if ',' in texto and '.' not in texto:
+        texto = texto.replace(',', '.')
+    try:
+        numero = float(texto)
+    except ValueError:
+        raise FilaInvalida(f'{columna} no es un número: {texto!r}') from None
+    if numero < 0:
+        raise FilaInvalida(f'{columna} no puede ser negativo')
+    if tipo is int:
+        if not numero.is_integer():
+            raise FilaInvalida(f'{columna} debe ser un número entero')
+        return int(numero)
+    return numero
+
+
+class _Nombres:
+    """Resolución nombre -> id de categorías o proveedores (crea los que faltan si se pide)"""
+
+    def __init__(self, conn, tabla, crear):
+        self.conn = conn
+        self.tabla = tabla
+        self.crear = crear
+        self.ids = get_name_ids(conn, tabla)
+
+    def resolver(self, nombre):
+        nombre = _texto(nombre)
+        if nombre is None:
+            return None
+        clave = nombre.casefold()
+        id_ = self.ids.get(clave)
+        if id_ is None:
+            if not self.crear:
+                raise FilaInvalida(f'{self.tabla[:-1]} desconocido(a): {nombre!r}')
+            insertar = insert_categoria if self.tabla == 'categorias' else insert_proveedor
+            id_ = insertar(self.conn, nombre)
+            if id_ is None:
+                raise FilaInvalida(f'no se pudo crear {self.tabla[:-1]} {nombre!r}')
+            self.ids[clave] = id_
+        return id_
+
+
+def importar_productos(conn, ruta, archivo_errores=None, tamano_lote=5000, usuario='importacion',
+                       crear_faltantes=True, progreso=None):
+    """Importar los productos de un CSV o XLSX.
+
+    progreso, si se indica, se llama después de cada lote con el resumen
+    parcial. Devuelve el resumen: filas leídas, insertados, actualizados,
+    sin_cambios, errores, segundos y archivo_errores (None si no hubo), más
+    'error' con el motivo si la importación se detuvo antes de terminar
+    (lo ya escrito queda guardado).
+    """
+    inicio = time.perf_counter()
+    resumen = {'filas': 0, 'insertados': 0, 'actualizados': 0, 'sin_cambios': 0, 'errores': 0,
+               'segundos': 0.0, 'archivo_errores': None, 'error': None}
+    salida_errores = None
+    escritor = None
+    lote = []
+    series = set()
+
+    def anotar_error(numero, valores, motivo):
+        nonlocal salida_errores, escritor
+        resumen['errores'] += 1
+        if archivo_errores is None:
+            return
+        if escritor is None:
+            salida_errores = open(archivo_errores, 'w', newline='', encoding='utf-8')
+            escritor = csv.DictWriter(salida_errores, ['fila', 'error'] + list(encabezado),
+                                      restval='', extrasaction='ignore')
+            escritor.writeheader()
+            resumen['archivo_errores'] = archivo_errores
+        escritor.writerow({**valores, 'fila': numero, 'error': motivo})
+
+    def escribir():
+        totales = import_products_batch(conn, lote, usuario)
+        if totales is None:
+            return False
+        for campo, valor in zip(('insertados', 'actualizados', 'sin_cambios'), totales):
+            resumen[campo] += valor
+        lote.clear()
+        series.clear()
+        resumen['segundos'] = time.perf_counter() - inicio
+        if progreso:
+            progreso(resumen)
+        return True
+
+    try:
+        filas = leer_filas(ruta)
+        encabezado = next(filas)
+        categorias = _Nombres(conn, 'categorias', crear_faltantes)
+        proveedores = _Nombres(conn, 'proveedores', crear_faltantes)
+
+        for numero, valores in filas:
+            resumen['filas'] += 1
+            try:
+                numero_serie = _texto(valores.get('numero_serie'))
+                nombre = _texto(valores.get('nombre'))
+                precio = _numero(valores.get('precio'), 'precio', float)
+                if numero_serie is None or nombre is None or precio is None:
+                    raise FilaInvalida('numero_serie, nombre y precio son obligatorios')
+                fila = (
+                    numero_serie, nombre, _texto(valores.get('descripcion')),
+                    _numero(valores.get('cantidad'), 'cantidad', int), precio,
+                    categorias.resolver(valores.get('categoria')),
+                    proveedores.resolver(valores.get('proveedor')),
+                )
+            except FilaInvalida as e:
+                anotar_error(numero, valores, str(e))
+                continue
+
+            # Un número de serie repetido en el archivo se aplica en el lote siguiente
+            if numero_serie in series or len(lote) >= tamano_lote:
+                if not escribir():
+                    resumen['error'] = f'No se pudo escribir el lote que termina antes de la fila {numero}'
+                    return resumen
+            lote.append(fila)
+            series.add(numero_serie)
+
+        if lote and not escribir():
+            resumen['error'] = 'No se pudo escribir el último lote'
+    except (OSError, csv.Error, FilaInvalida, ImportError) as e:
+        resumen['error'] = str(e)
+    finally:
+        if salida_errores is not None:
+            salida_errores.close()
+        resumen['segundos'] = time.perf_counter() - inicio
+    return resumen
+
+
+def iniciar(database, ruta, archivo_errores=None, opciones_pool=None, **opciones):
+    """Importar en un hilo aparte; el avance queda en la tabla importaciones.
+
+    opciones_pool son los argumentos de pool.get_pool; el resto de las
+    opciones pasan a importar_productos. Devuelve el ID de la importación
+    (get_import_job) o None.
+    """
+    pool = get_pool(database, **(opciones_pool or {}))
+    conn = pool.acquire()
+    try:
+        job_id = create_import_job(conn, os.path.basename(ruta))
+    finally:
+        pool.release(conn)
+    if job_id is None:
+        return None
+
+    def trabajar():
+        conn = pool.acquire()
+        try:
+            def informar(resumen):
+                update_import_job(conn, job_id, **resumen)
+
+            resumen = importar_productos(conn, ruta, archivo_errores, progreso=informar, **opciones)
+            update_import_job(conn, job_id, estado='error' if resumen['error'] else 'terminada', **resumen)
+        except Exception as e:
+            update_import_job(conn, job_id, estado='error', error=str(e) or e.__class__.__name__)
+        finally:
+            pool.release(conn)
+
+    threading.Thread(target=trabajar, name=f'importacion-{job_id}', daemon=True).start()
+    return job_id
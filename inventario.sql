@@ -1,12 +1,34 @@
 -- Active: 1746059712145@@127.0.0.1@3306@inventario_db
+-- Esquema MySQL para db.py / repositorio.MySQLRepository: mismas columnas
+-- e índices que usan sus consultas en database.create_schema
 USE inventario_db;
+CREATE TABLE categorias (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(50) NOT NULL UNIQUE,
+    descripcion TEXT
+);
+
+CREATE TABLE proveedores (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL,
+    contacto VARCHAR(100),
+    telefono VARCHAR(20),
+    email VARCHAR(100),
+    direccion TEXT
+);
+
 CREATE TABLE productos (
     id INT AUTO_INCREMENT PRIMARY KEY,
     numero_serie VARCHAR(50) UNIQUE NOT NULL,
     nombre VARCHAR(100) NOT NULL,
+    descripcion TEXT,
     cantidad INT NOT NULL,
     precio DECIMAL(10,2) NOT NULL,
-    fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP
+    categoria_id INT,
+    proveedor_id INT,
+    fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (categoria_id) REFERENCES categorias(id) ON DELETE SET NULL,
+    FOREIGN KEY (proveedor_id) REFERENCES proveedores(id) ON DELETE SET NULL
 );
 
 CREATE TABLE movimientos (
@@ -20,20 +42,6 @@ CREATE TABLE movimientos (
     precio DECIMAL(10,2) NOT NULL,
     usuario VARCHAR(50),
     descripcion TEXT,
-    FOREIGN KEY (producto_id) REFERENCES productos(id)
-);
-
-CREATE TABLE categorias (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    nombre VARCHAR(50) NOT NULL,
-    descripcion TEXT
-);
-
-CREATE TABLE proveedores (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    nombre VARCHAR(100) NOT NULL,
-    contacto VARCHAR(100),
-    telefono VARCHAR(20),
-    email VARCHAR(100),
-    direccion TEXT
+    FOREIGN KEY (producto_id) REFERENCES productos(id) ON DELETE CASCADE,
+    INDEX idx_movimientos_producto_fecha (producto_id, fecha DESC, tipo)
 );
\ No newline at end of file
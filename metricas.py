@@ -0,0 +1,230 @@
+"""Instrumentación de las consultas a SQLite.
+
+Las conexiones del pool (pool.PooledConnection) devuelven cursores
+CursorInstrumentado cuando el registro está activo. Cada sentencia se mide
+desde execute() hasta que se leyó su última fila con fetch* (o se
+cerró/descartó el cursor), y se acumula en un histograma por forma de sentencia y ruta de
+origen junto con las filas devueltas y los errores. Las sentencias que
+superan el umbral se escriben en el registro de consultas lentas (una línea
+JSON con parámetros y EXPLAIN QUERY PLAN).
+
+    registro.configurar(umbral_lento=0.1, archivo_lentas='consultas_lentas.log')
+    registro.prometheus()   # texto para /metrics
+"""
+import contextvars
+import json
+from bisect import bisect_left
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Ruta (endpoint de Flask) que originó las consultas del contexto actual
+ruta_actual = contextvars.ContextVar('ruta_actual', default='-')
+
+# Límites superiores de los buckets del histograma, en segundos
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_perf_counter = time.perf_counter
+
+# Sentencias con plan de consulta (PRAGMA, BEGIN o COMMIT no lo tienen)
+_CON_PLAN = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+
+def normalizar(sql):
+    """Forma de una sentencia: espacios colapsados (los parámetros van aparte)"""
+    return ' '.join(sql.split())
+
+
+class RegistroConsultas:
+    """Histogramas de latencia, filas y errores por (sentencia, ruta)"""
+
+    def __init__(self, umbral_lento=0.1, archivo_lentas=None):
+        self.activo = True
+        self.umbral_lento = umbral_lento
+        self.archivo_lentas = archivo_lentas
+        self._series = {}
+        self._formas = {}
+        self._lock = threading.Lock()
+
+    def configurar(self, activo=True, umbral_lento=0.1, archivo_lentas=None):
+        self.activo = activo
+        self.umbral_lento = umbral_lento
+        self.archivo_lentas = archivo_lentas
+
+    def forma(self, sql):
+        # El texto de cada sentencia se repite: normalizar una sola vez
+        forma = self._formas.get(sql)
+        if forma is None:
+            forma = normalizar(sql)
+            if len(self._formas) < 10000:
+                self._formas[sql] = forma
+        return forma
+
+    def observar(self, sql, segundos, filas, error=False):
+        clave = (self.forma(sql), ruta_actual.get())
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                # [buckets..., +Inf, suma, filas, errores]
+                serie = self._series[clave] = [0] * (len(BUCKETS) + 4)
+            serie[bisect_left(BUCKETS, segundos)] += 1
+            serie[-3] += segundos
+            serie[-2] += filas
+            serie[-1] += error
+
+    def consulta_lenta(self, conn, sql, params, segundos, filas):
+        """Escribir una consulta lenta con su plan en el registro"""
+        if not self.archivo_lentas:
+            return
+        plan = []
+        if sql.lstrip()[:7].upper().startswith(_CON_PLAN):
+            try:
+                # Cursor sin instrumentar: el EXPLAIN no se mide a sí mismo
+                plan = [fila[3] for fila in sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            except sqlite3.Error as e:
+                plan = [f'(sin plan: {e})']
+        linea = json.dumps({
+            'fecha': datetime.now().isoformat(timespec='milliseconds'),
+            'ruta': ruta_actual.get(),
+            'ms': round(segundos * 1000, 3),
+            'filas': filas,
+            'sql': normalizar(sql),
+            'parametros': params if isinstance(params, (list, tuple, dict)) else repr(params),
+            'plan': plan,
+        }, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.archivo_lentas, 'a', encoding='utf-8') as f:
+                f.write(linea + '\n')
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {clave: list(serie) for clave, serie in self._series.items()}
+
+    def prometheus(self):
+        """Métricas en el formato de texto de Prometheus"""
+        lineas = [
+            '# HELP inventario_consulta_segundos Latencia de las sentencias SQLite',
+            '# TYPE inventario_consulta_segundos histogram',
+        ]
+        filas = ['# HELP inventario_consulta_filas_total Filas devueltas o modificadas',
+                 '# TYPE inventario_consulta_filas_total counter']
+        errores = ['# HELP inventario_consulta_errores_total Sentencias que terminaron con error',
+                   '# TYPE inventario_consulta_errores_total counter']
+        for (sentencia, ruta), serie in sorted(self.snapshot().items()):
+            etiquetas = f'sentencia="{_escapar(sentencia)}",ruta="{_escapar(ruta)}"'
+            acumulado = 0
+            for limite, cantidad in zip(BUCKETS + ('+Inf',), serie):
+                acumulado += cantidad
+                lineas.append(f'inventario_consulta_segundos_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f'inventario_consulta_segundos_sum{{{etiquetas}}} {serie[-3]:.6f}')
+            lineas.append(f'inventario_consulta_segundos_count{{{etiquetas}}} {acumulado}')
+            filas.append(f'inventario_consulta_filas_total{{{etiquetas}}} {serie[-2]}')
+            errores.append(f'inventario_consulta_errores_total{{{etiquetas}}} {serie[-1]}')
+        return '\n'.join(lineas + filas + errores) + '\n'
+
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registro = RegistroConsultas()
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mide cada sentencia hasta leer su última fila.
+
+    Solo se miden las lecturas con fetchone/fetchmany/fetchall: medir cada
+    fila al iterar el cursor directamente costaría más que la propia lectura,
+    así que database.py lee los recorridos largos por bloques con fetchmany.
+    """
+
+    _sql = None
+
+    def _terminar(self, error=False):
+        sql = self._sql
+        if sql is None:
+            return
+        self._sql = None
+        filas = self._filas
+        if self.description is None and self.rowcount > 0:
+            filas = self.rowcount
+        registro.observar(sql, self._segundos, filas, error)
+        if self._segundos >= registro.umbral_lento and not error:
+            registro.consulta_lenta(self.connection, sql, self._params, self._segundos, filas)
+
+    def execute(self, sql, params=()):
+        if self._sql is not None:
+            self._terminar()
+        self._sql = sql
+        self._params = params
+        self._filas = 0
+        inicio = _perf_counter()
+        try:
+            super().execute(sql, params)
+        except Exception:
+            self._segundos = _perf_counter() - inicio
+            self._terminar(error=True)
+            raise
+        self._segundos = _perf_counter() - inicio
+        if self.description is None:
+            # Sin filas que leer: la sentencia ya terminó
+            self._terminar()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        if self._sql is not None:
+            self._terminar()
+        inicio = _perf_counter()
+        try:
+            super().executemany(sql, seq_of_params)
+        except Exception:
+            registro.observar(sql, _perf_counter() - inicio, 0, True)
+            raise
+        registro.observar(sql, _perf_counter() - inicio, max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        inicio = _perf_counter()
+        fila = super().fetchone()
+        if self._sql is not None:
+            self._segundos += _perf_counter() - inicio
+            if fila is None:
+                self._terminar()
+            else:
+                self._filas += 1
+        return fila
+
+    def fetchmany(self, size=None):
+        inicio = _perf_counter()
+        filas = super().fetchmany(self.arraysize if size is None else size)
+        if self._sql is not None:
+            self._segundos += _perf_counter() - inicio
+            self._filas += len(filas)
+            if not filas:
+                self._terminar()
+        return filas
+
+    def fetchall(self):
+        inicio = _perf_counter()
+        filas = super().fetchall()
+        if self._sql is not None:
+            self._segundos += _perf_counter() - inicio
+            self._filas += len(filas)
+            self._terminar()
+        return filas
+
+    def close(self):
+        self._terminar()
+        super().close()
+
+    def __del__(self):
+        # Cursores abandonados a mitad de lectura (p. ej. un generador cortado)
+        try:
+            self._terminar()
+        except Exception:
+            pass
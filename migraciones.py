@@ -0,0 +1,669 @@
+"""Migraciones versionadas del esquema.
+
+Cada migración tiene un número de versión, pasos de DDL que se aplican en una
+sola transacción junto con su registro en schema_migrations, y opcionalmente
+un backfill de datos que recorre la tabla por rangos de id en lotes pequeños,
+cada uno en su propia transacción, para no bloquear a los escritores de la
+tienda. El avance del backfill se guarda después de cada lote, así que una
+migración interrumpida continúa donde quedó.
+
+    migrar(conn)                           # aplica todo lo pendiente
+    migrar(conn, con_backfills=False)      # solo DDL (arranque de la app)
+    estado(conn)                           # versiones registradas
+
+Al terminar, PRAGMA user_version queda en la versión más alta con el DDL
+aplicado (aunque su backfill siga pendiente).
+"""
+import time
+from sqlite3 import Error
+
+# Estado de una migración registrada
+BACKFILL = 'backfill'
+APLICADA = 'aplicada'
+
+
+class Backfill:
+    """Actualización de datos por rangos de id.
+
+    `sql` es un UPDATE (o INSERT ... SELECT) con dos marcadores para el rango (id > ? AND id <= ?);
+    `despues_lote`, si se indica, se ejecuta con el mismo rango dentro de la
+    transacción de cada lote (por ejemplo para subir contadores de cambios).
+    """
+
+    def __init__(self, tabla, sql, despues_lote=None):
+        self.tabla = tabla
+        self.sql = sql
+        self.despues_lote = despues_lote
+
+
+class Migracion:
+    def __init__(self, version, nombre, pasos=(), backfill=None):
+        self.version = version
+        self.nombre = nombre
+        self.pasos = pasos  # sentencias SQL o funciones que reciben la conexión
+        self.backfill = backfill
+
+
+# Esquema base (versión 1), congelado: las bases creadas antes de las
+# migraciones con create_tables ya tienen parte de estas tablas, de ahí los
+# IF NOT EXISTS. Los cambios posteriores van en migraciones nuevas
+_ESQUEMA_BASE = [
+    '''
+    CREATE TABLE IF NOT EXISTS categorias (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL UNIQUE,
+        descripcion TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS proveedores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        contacto TEXT,
+        telefono TEXT,
+        email TEXT UNIQUE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS productos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_serie TEXT UNIQUE,
+        nombre TEXT NOT NULL,
+        descripcion TEXT,
+        cantidad INTEGER DEFAULT 0,
+        precio REAL NOT NULL,
+        categoria_id INTEGER,
+        proveedor_id INTEGER,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (categoria_id) REFERENCES categorias (id) ON DELETE SET NULL,
+        FOREIGN KEY (proveedor_id) REFERENCES proveedores (id) ON DELETE SET NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS movimientos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        producto_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL,  -- 'entrada', 'salida' o 'ajuste'
+        cantidad INTEGER NOT NULL,
+        stock_anterior INTEGER NOT NULL,
+        stock_posterior INTEGER NOT NULL,
+        precio REAL NOT NULL,
+        fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        usuario TEXT,
+        descripcion TEXT,
+        FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+    )
+    ''',
+    # Trabajos de reportes PDF (cola en segundo plano)
+    '''
+    CREATE TABLE IF NOT EXISTS reportes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        producto_id INTEGER NOT NULL,
+        ultimo_movimiento_id INTEGER NOT NULL,
+        estado TEXT NOT NULL DEFAULT 'pendiente',  -- 'pendiente', 'listo' o 'error'
+        archivo TEXT,
+        error TEXT,
+        creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        terminado TIMESTAMP,
+        UNIQUE (producto_id, ultimo_movimiento_id),
+        FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+    )
+    ''',
+
+    # Historial de un producto filtrado por fecha/tipo y ordenado por fecha
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_producto_fecha ON movimientos (producto_id, fecha DESC, tipo)",
+    # Filtro por categoría paginado por id; reemplaza al índice cubriente
+    # (categoria_id, cantidad, precio) de versiones anteriores
+    "DROP INDEX IF EXISTS idx_productos_categoria",
+    "CREATE INDEX IF NOT EXISTS idx_productos_categoria_id ON productos (categoria_id)",
+    # Productos con stock bajo y listado ordenado por precio
+    "CREATE INDEX IF NOT EXISTS idx_productos_cantidad ON productos (cantidad)",
+    "CREATE INDEX IF NOT EXISTS idx_productos_precio ON productos (precio)",
+
+    # Resumen por categoría mantenido por triggers (categoria_id 0 agrupa los
+    # productos sin categoría)
+    '''
+    CREATE TABLE IF NOT EXISTS resumen_categorias (
+        categoria_id INTEGER PRIMARY KEY,  -- 0 = sin categoría
+        valor_total REAL NOT NULL DEFAULT 0,
+        unidades INTEGER NOT NULL DEFAULT 0,
+        total_productos INTEGER NOT NULL DEFAULT 0,
+        productos_sin_stock INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_resumen_productos_insert
+    AFTER INSERT ON productos
+    BEGIN
+        INSERT INTO resumen_categorias (categoria_id, valor_total, unidades, total_productos, productos_sin_stock)
+        VALUES (COALESCE(NEW.categoria_id, 0), COALESCE(NEW.cantidad, 0) * NEW.precio,
+                COALESCE(NEW.cantidad, 0), 1, COALESCE(NEW.cantidad, 0) <= 0)
+        ON CONFLICT (categoria_id) DO UPDATE SET
+            valor_total = valor_total + excluded.valor_total,
+            unidades = unidades + excluded.unidades,
+            total_productos = total_productos + 1,
+            productos_sin_stock = productos_sin_stock + excluded.productos_sin_stock;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_resumen_productos_delete
+    AFTER DELETE ON productos
+    BEGIN
+        UPDATE resumen_categorias SET
+            valor_total = valor_total - COALESCE(OLD.cantidad, 0) * OLD.precio,
+            unidades = unidades - COALESCE(OLD.cantidad, 0),
+            total_productos = total_productos - 1,
+            productos_sin_stock = productos_sin_stock - (COALESCE(OLD.cantidad, 0) <= 0)
+        WHERE categoria_id = COALESCE(OLD.categoria_id, 0);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_resumen_productos_update
+    AFTER UPDATE OF cantidad, precio, categoria_id ON productos
+    BEGIN
+        UPDATE resumen_categorias SET
+            valor_total = valor_total - COALESCE(OLD.cantidad, 0) * OLD.precio,
+            unidades = unidades - COALESCE(OLD.cantidad, 0),
+            total_productos = total_productos - 1,
+            productos_sin_stock = productos_sin_stock - (COALESCE(OLD.cantidad, 0) <= 0)
+        WHERE categoria_id = COALESCE(OLD.categoria_id, 0);
+
+        INSERT INTO resumen_categorias (categoria_id, valor_total, unidades, total_productos, productos_sin_stock)
+        VALUES (COALESCE(NEW.categoria_id, 0), COALESCE(NEW.cantidad, 0) * NEW.precio,
+                COALESCE(NEW.cantidad, 0), 1, COALESCE(NEW.cantidad, 0) <= 0)
+        ON CONFLICT (categoria_id) DO UPDATE SET
+            valor_total = valor_total + excluded.valor_total,
+            unidades = unidades + excluded.unidades,
+            total_productos = total_productos + 1,
+            productos_sin_stock = productos_sin_stock + excluded.productos_sin_stock;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_resumen_categorias_delete
+    AFTER DELETE ON categorias
+    BEGIN
+        DELETE FROM resumen_categorias WHERE categoria_id = OLD.id;
+    END
+    ''',
+    # Bases con productos anteriores al resumen: poblarlo en la misma transacción
+    "DELETE FROM resumen_categorias",
+    '''
+    INSERT INTO resumen_categorias (categoria_id, valor_total, unidades, total_productos, productos_sin_stock)
+    SELECT COALESCE(categoria_id, 0), SUM(COALESCE(cantidad, 0) * precio), SUM(COALESCE(cantidad, 0)),
+           COUNT(*), SUM(COALESCE(cantidad, 0) <= 0)
+    FROM productos
+    GROUP BY COALESCE(categoria_id, 0)
+    ''',
+
+    # Contadores de cambios de los ETag (database.get_change_stamp): uno por
+    # tabla y uno por producto ('producto:<id>')
+    '''
+    CREATE TABLE IF NOT EXISTS contadores_cambios (
+        clave TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_productos_insert
+    AFTER INSERT ON productos
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('productos', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_productos_update
+    AFTER UPDATE ON productos
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('productos', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_productos_delete
+    AFTER DELETE ON productos
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('productos', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_categorias_insert
+    AFTER INSERT ON categorias
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('categorias', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_categorias_update
+    AFTER UPDATE ON categorias
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('categorias', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_categorias_delete
+    AFTER DELETE ON categorias
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('categorias', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_proveedores_insert
+    AFTER INSERT ON proveedores
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('proveedores', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_proveedores_update
+    AFTER UPDATE ON proveedores
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('proveedores', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_proveedores_delete
+    AFTER DELETE ON proveedores
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('proveedores', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    # Todo movimiento nuevo actualiza el stock del producto en la misma
+    # transacción, así que este trigger cubre también los movimientos
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_producto_update
+    AFTER UPDATE ON productos
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('producto:' || NEW.id, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    # El contador sobrevive al borrado para que un id reutilizado no repita versión
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_producto_delete
+    AFTER DELETE ON productos
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('producto:' || OLD.id, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+    # Movimientos borrados sin tocar el producto
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_contador_movimientos_delete
+    AFTER DELETE ON movimientos
+    WHEN EXISTS (SELECT 1 FROM productos WHERE id = OLD.producto_id)
+    BEGIN
+        INSERT INTO contadores_cambios (clave, version, actualizado)
+        VALUES ('producto:' || OLD.producto_id, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (clave) DO UPDATE SET
+            version = version + 1,
+            actualizado = excluded.actualizado;
+    END
+    ''',
+]
+
+
+MIGRACIONES = [
+    Migracion(1, 'esquema_base', _ESQUEMA_BASE),
+
+    # Los ajustes manuales de stock se registraban como entrada/salida
+    Migracion(2, 'movimiento_ajuste', backfill=Backfill(
+        'movimientos',
+        '''
+        UPDATE movimientos SET tipo = 'ajuste'
+        WHERE id > ? AND id <= ?
+          AND usuario = 'sistema'
+          AND descripcion LIKE 'Actualización manual:%'
+          AND tipo <> 'ajuste'
+        ''',
+        despues_lote='''
+        UPDATE contadores_cambios
+        SET version = version + 1, actualizado = CURRENT_TIMESTAMP
+        WHERE clave IN (
+            SELECT DISTINCT 'producto:' || producto_id FROM movimientos
+            WHERE id > ? AND id <= ? AND tipo = 'ajuste'
+        )
+        '''
+    )),
+
+    Migracion(3, 'proveedores_direccion', [
+        "ALTER TABLE proveedores ADD COLUMN direccion TEXT",
+    ]),
+
+    # Búsqueda de texto (search_products). La tabla FTS5 guarda su propia
+    # copia del texto: con contenido externo un UPDATE/DELETE de un producto
+    # que el backfill todavía no indexó corrompería el índice, y así el
+    # backfill puede saltar las filas que los triggers ya indexaron
+    Migracion(4, 'productos_fts', [
+        '''
+        CREATE VIRTUAL TABLE productos_fts USING fts5(
+            nombre, descripcion, numero_serie,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER trg_productos_fts_insert AFTER INSERT ON productos
+        BEGIN
+            INSERT INTO productos_fts (rowid, nombre, descripcion, numero_serie)
+            VALUES (NEW.id, NEW.nombre, NEW.descripcion, NEW.numero_serie);
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_productos_fts_delete AFTER DELETE ON productos
+        BEGIN
+            DELETE FROM productos_fts WHERE rowid = OLD.id;
+        END
+        ''',
+        # Los cambios de stock y precio no tocan el índice
+        '''
+        CREATE TRIGGER trg_productos_fts_update
+        AFTER UPDATE OF nombre, descripcion, numero_serie ON productos
+        BEGIN
+            DELETE FROM productos_fts WHERE rowid = OLD.id;
+            INSERT INTO productos_fts (rowid, nombre, descripcion, numero_serie)
+            VALUES (NEW.id, NEW.nombre, NEW.descripcion, NEW.numero_serie);
+        END
+        ''',
+    ], backfill=Backfill(
+        'productos',
+        '''
+        INSERT INTO productos_fts (rowid, nombre, descripcion, numero_serie)
+        SELECT p.id, p.nombre, p.descripcion, p.numero_serie
+        FROM productos p
+        WHERE p.id > ? AND p.id <= ?
+          AND NOT EXISTS (SELECT 1 FROM productos_fts f WHERE f.rowid = p.id)
+        '''
+    )),
+
+    # Stock por producto en cortes periódicos (compact_stock_snapshots) para
+    # consultar el stock en una fecha sin recorrer todo el historial. El
+    # índice por fecha acota la lectura de los movimientos posteriores a un
+    # corte; crearlo bloquea las escrituras mientras recorre movimientos
+    Migracion(5, 'stock_snapshots', [
+        '''
+        CREATE TABLE stock_snapshots (
+            fecha TEXT NOT NULL,  -- corte: stock con los movimientos anteriores a esta fecha
+            producto_id INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            precio REAL NOT NULL,  -- precio del último movimiento antes del corte
+            PRIMARY KEY (fecha, producto_id),
+            FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        ''',
+        # Borrado en cascada de un producto sin recorrer todos los cortes
+        "CREATE INDEX idx_stock_snapshots_producto ON stock_snapshots (producto_id)",
+        '''
+        CREATE TABLE stock_snapshot_cortes (
+            fecha TEXT PRIMARY KEY,
+            completo INTEGER NOT NULL DEFAULT 0,
+            progreso INTEGER NOT NULL DEFAULT 0,  -- último producto_id copiado del corte anterior
+            productos INTEGER NOT NULL DEFAULT 0,
+            duracion REAL NOT NULL DEFAULT 0,
+            creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos (fecha)",
+    ]),
+
+    # Movimientos viejos en archivos SQLite por año (archive_movements) y
+    # productos eliminados cuyo historial se borra por lotes en segundo
+    # plano (purge_deleted_products)
+    Migracion(6, 'archivo_movimientos', [
+        '''
+        CREATE TABLE archivos_movimientos (
+            periodo TEXT PRIMARY KEY,  -- año de los movimientos ('2023')
+            archivo TEXT NOT NULL,     -- ruta relativa al directorio de la base
+            desde TEXT,                -- fecha del movimiento más viejo del archivo
+            hasta TEXT,                -- fecha del más nuevo
+            filas INTEGER NOT NULL DEFAULT 0,
+            actualizado TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE productos_eliminados (
+            producto_id INTEGER PRIMARY KEY,
+            solicitado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+
+    # Importaciones masivas de productos (importacion.py) y su avance
+    Migracion(7, 'importaciones', [
+        '''
+        CREATE TABLE importaciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            archivo TEXT NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'en_curso',  -- 'en_curso', 'terminada' o 'error'
+            filas INTEGER NOT NULL DEFAULT 0,
+            insertados INTEGER NOT NULL DEFAULT 0,
+            actualizados INTEGER NOT NULL DEFAULT 0,
+            sin_cambios INTEGER NOT NULL DEFAULT 0,
+            errores INTEGER NOT NULL DEFAULT 0,
+            archivo_errores TEXT,
+            error TEXT,
+            segundos REAL NOT NULL DEFAULT 0,
+            creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            terminado TIMESTAMP
+        )
+        ''',
+    ]),
+
+    # update_product_details y el upsert de importaciones nombran todas sus
+    # columnas en el SET (con un texto fijo por sentencia, ver consultas.py):
+    # UPDATE OF dispara aunque el valor no cambie, así que los triggers
+    # comparan antes de reindexar o mover el resumen de categoría
+    Migracion(8, 'triggers_solo_con_cambios', [
+        "DROP TRIGGER IF EXISTS trg_productos_fts_update",
+        '''
+        CREATE TRIGGER trg_productos_fts_update
+        AFTER UPDATE OF nombre, descripcion, numero_serie ON productos
+        WHEN OLD.nombre IS NOT NEW.nombre OR OLD.descripcion IS NOT NEW.descripcion
+          OR OLD.numero_serie IS NOT NEW.numero_serie
+        BEGIN
+            DELETE FROM productos_fts WHERE rowid = OLD.id;
+            INSERT INTO productos_fts (rowid, nombre, descripcion, numero_serie)
+            VALUES (NEW.id, NEW.nombre, NEW.descripcion, NEW.numero_serie);
+        END
+        ''',
+        "DROP TRIGGER IF EXISTS trg_resumen_productos_update",
+        '''
+        CREATE TRIGGER trg_resumen_productos_update
+        AFTER UPDATE OF cantidad, precio, categoria_id ON productos
+        WHEN OLD.cantidad IS NOT NEW.cantidad OR OLD.precio IS NOT NEW.precio
+          OR OLD.categoria_id IS NOT NEW.categoria_id
+        BEGIN
+            UPDATE resumen_categorias SET
+                valor_total = valor_total - COALESCE(OLD.cantidad, 0) * OLD.precio,
+                unidades = unidades - COALESCE(OLD.cantidad, 0),
+                total_productos = total_productos - 1,
+                productos_sin_stock = productos_sin_stock - (COALESCE(OLD.cantidad, 0) <= 0)
+            WHERE categoria_id = COALESCE(OLD.categoria_id, 0);
+
+            INSERT INTO resumen_categorias (categoria_id, valor_total, unidades, total_productos, productos_sin_stock)
+            VALUES (COALESCE(NEW.categoria_id, 0), COALESCE(NEW.cantidad, 0) * NEW.precio,
+                    COALESCE(NEW.cantidad, 0), 1, COALESCE(NEW.cantidad, 0) <= 0)
+            ON CONFLICT (categoria_id) DO UPDATE SET
+                valor_total = valor_total + excluded.valor_total,
+                unidades = unidades + excluded.unidades,
+                total_productos = total_productos + 1,
+                productos_sin_stock = productos_sin_stock + excluded.productos_sin_stock;
+        END
+        ''',
+    ]),
+]
+
+# PRAGMA user_version de una base con todo el DDL aplicado: permite saltar
+# la verificación del esquema en el arranque con una sola lectura
+VERSION_ESQUEMA = max(m.version for m in MIGRACIONES)
+
+
+def create_migrations_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        estado TEXT NOT NULL,  -- 'backfill' o 'aplicada'
+        progreso INTEGER NOT NULL DEFAULT 0,  -- último id procesado por el backfill
+        filas INTEGER NOT NULL DEFAULT 0,
+        aplicada TIMESTAMP,
+        duracion REAL NOT NULL DEFAULT 0
+    )
+    ''')
+    conn.commit()
+
+
+def estado(conn):
+    """Migraciones registradas: {version: (nombre, estado, progreso, filas, aplicada, duracion)}"""
+    create_migrations_table(conn)
+    cur = conn.execute('''
+        SELECT version, nombre, estado, progreso, filas, aplicada, duracion
+        FROM schema_migrations ORDER BY version
+    ''')
+    return {fila[0]: fila[1:] for fila in cur.fetchall()}
+
+
+def pendientes(conn, migraciones=MIGRACIONES):
+    """Migraciones sin registrar o con el backfill sin terminar"""
+    registradas = estado(conn)
+    return [m for m in migraciones
+            if m.version not in registradas or registradas[m.version][1] != APLICADA]
+
+
+def _aplicar_ddl(conn, migracion):
+    """Pasos de DDL y registro de la migración en una sola transacción"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for paso in migracion.pasos:
+            if callable(paso):
+                paso(conn)
+            else:
+                conn.execute(paso)
+        conn.execute('''
+            INSERT INTO schema_migrations (version, nombre, estado)
+            VALUES (?, ?, ?)
+        ''', (migracion.version, migracion.nombre, BACKFILL if migracion.backfill else APLICADA))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _correr_backfill(conn, migracion, tamano_lote, progreso):
+    """Recorrer la tabla por rangos de id; devuelve las filas modificadas en esta corrida"""
+    backfill = migracion.backfill
+    desde = conn.execute(
+        "SELECT progreso FROM schema_migrations WHERE version = ?", (migracion.version,)
+    ).fetchone()[0]
+    # Las filas insertadas después ya nacen con el esquema nuevo
+    total = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {backfill.tabla}").fetchone()[0]
+    filas = 0
+    inicio = time.perf_counter()
+
+    while desde < total:
+        hasta = min(desde + tamano_lote, total)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            modificadas = conn.execute(backfill.sql, (desde, hasta)).rowcount
+            if backfill.despues_lote:
+                conn.execute(backfill.despues_lote, (desde, hasta))
+            conn.execute('''
+                UPDATE schema_migrations SET progreso = ?, filas = filas + ?
+                WHERE version = ?
+            ''', (hasta, modificadas, migracion.version))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        filas += modificadas
+        desde = hasta
+        if progreso:
+            progreso(migracion, desde, total, filas, time.perf_counter() - inicio)
+
+    conn.execute('''
+        UPDATE schema_migrations SET estado = ?, aplicada = CURRENT_TIMESTAMP
+        WHERE version = ?
+    ''', (APLICADA, migracion.version))
+    conn.commit()
+    return filas
+
+
+def migrar(conn, con_backfills=True, tamano_lote=5000, progreso=None, migraciones=MIGRACIONES):
+    """Aplicar las migraciones pendientes en orden de versión.
+
+    Con con_backfills=False solo se aplica el DDL y los backfills quedan en
+    estado 'backfill' para correrlos después (flask migrar). `progreso` recibe
+    (migracion, id_actual, id_final, filas, segundos) después de cada lote.
+    Devuelve una lista de (version, nombre, filas, segundos) de lo aplicado,
+    o None si una migración falla.
+    """
+    resultados = []
+    registradas = estado(conn)
+    for migracion in sorted(migraciones, key=lambda m: m.version):
+        registrada = registradas.get(migracion.version)
+        if registrada and registrada[1] == APLICADA:
+            continue
+        inicio = time.perf_counter()
+        filas = 0
+        try:
+            if registrada is None:
+                _aplicar_ddl(conn, migracion)
+            if migracion.backfill and con_backfills:
+                filas = _correr_backfill(conn, migracion, tamano_lote, progreso)
+            elif migracion.backfill:
+                continue
+        except Error as e:
+            print(f"Error en la migración {migracion.version} ({migracion.nombre}): {e}")
+            return None
+        duracion = time.perf_counter() - inicio
+        conn.execute(
+            "UPDATE schema_migrations SET duracion = duracion + ?, aplicada = COALESCE(aplicada, CURRENT_TIMESTAMP) WHERE version = ?",
+            (duracion, migracion.version)
+        )
+        conn.commit()
+        resultados.append((migracion.version, migracion.nombre, filas, duracion))
+
+    version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+    return resultados
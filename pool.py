@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+from collections import deque
+
+from metricas import CursorInstrumentado, registro
+
+# Valores por defecto de las PRAGMA aplicadas a cada conexión del pool
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 1,
+    'busy_timeout': 5000,        # milisegundos
+    'cache_size': -20000,        # negativo = KiB (~20 MB por conexión)
+    'mmap_size': 268435456,      # 256 MB
+}
+
+# Sentencias preparadas que sqlite3 guarda por conexión (por texto exacto).
+# El valor de sqlite3 es 128; la aplicación usa del orden de un centenar de
+# textos distintos (consultas.py y bench.bench_sentencias), así que con 128
+# las rutas menos frecuentes desplazaban a las demás y se volvían a preparar
+DEFAULT_CACHED_STATEMENTS = 256
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexión SQLite administrada por el pool.
+
+    Con metricas.registro activo, sus cursores miden cada sentencia.
+    """
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = CursorInstrumentado if registro.activo else sqlite3.Cursor
+        return super().cursor(factory)
+
+    # Connection.execute de sqlite3 crea su cursor sin pasar por cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+
+class ConnectionPool:
+    """Pool de conexiones SQLite reutilizables entre peticiones.
+
+    Cada hilo recibe su propia conexión mientras la tiene prestada; al
+    liberarla vuelve a la cola de conexiones libres y queda abierta para
+    la siguiente petición, de modo que la conexión y las PRAGMA solo se
+    pagan una vez por conexión.
+    """
+
+    def __init__(self, database, max_idle=8, pragmas=None, cached_statements=DEFAULT_CACHED_STATEMENTS):
+        self.database = database
+        self.max_idle = max_idle
+        self.cached_statements = cached_statements
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self._idle = deque()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'released': 0, 'discarded': 0}
+
+    def _connect(self):
+        """Abrir y configurar una conexión nueva"""
+        conn = sqlite3.connect(
+            self.database,
+            check_same_thread=False,
+            factory=PooledConnection,
+            cached_statements=self.cached_statements
+        )
+        for nombre, valor in self.pragmas.items():
+            conn.execute(f"PRAGMA {nombre} = {valor}")
+        return conn
+
+    def acquire(self):
+        """Obtener la conexión del hilo actual (reutilizando una libre si existe)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        with self._lock:
+            if self._idle:
+                conn = self._idle.pop()
+                self._stats['hits'] += 1
+            else:
+                self._stats['misses'] += 1
+
+        if conn is None:
+            conn = self._connect()
+
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn=None):
+        """Devolver la conexión del hilo actual al pool"""
+        if conn is None:
+            conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        if getattr(self._local, 'conn', None) is conn:
+            self._local.conn = None
+
+        # No devolver transacciones abiertas a otra petición
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                self._stats['released'] += 1
+                return
+            self._stats['discarded'] += 1
+        conn.close()
+
+    def close_all(self):
+        """Cerrar todas las conexiones libres"""
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+    def stats(self):
+        """Estadísticas de aciertos y fallos del pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        total = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database, **kwargs):
+    """Obtener (o crear) el pool asociado a un archivo de base de datos"""
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = ConnectionPool(database, **kwargs)
+            _pools[database] = pool
+        return pool
@@ -0,0 +1,84 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from database import finish_report_job, get_or_create_report_job
+from pool import get_pool
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers=2):
+    """Obtener el pool de procesos que convierte HTML a PDF"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=max_workers)
+        return _executor
+
+
+def report_path(directorio, producto_id, ultimo_movimiento_id):
+    """Ruta del PDF cacheado para un producto en un estado dado de su historial"""
+    return os.path.join(directorio, f'movimientos_{producto_id}_{ultimo_movimiento_id}.pdf')
+
+
+def _renderizar_pdf(html, destino):
+    """Convertir HTML a PDF (se ejecuta en un proceso del pool)"""
+    import pdfkit
+
+    temporal = f'{destino}.tmp'
+    pdfkit.from_string(html, temporal)
+    # Renombrado atómico: nunca se sirve un PDF a medio escribir
+    os.replace(temporal, destino)
+    return destino
+
+
+def request_report(conn, database, directorio, producto_id, ultimo_movimiento_id, render_html, max_workers=2,
+                   opciones_pool=None):
+    """Encolar (o reutilizar) el reporte PDF de un producto.
+
+    render_html es una función sin argumentos que devuelve el HTML del
+    reporte; solo se llama cuando realmente hay que generar el PDF, así que
+    dos pedidos del mismo producto sin movimientos nuevos no vuelven a
+    consultar ni a renderizar nada. Si el renderizado o el envío al pool
+    fallan, el trabajo queda con error (el próximo pedido lo reintenta) y la
+    excepción sigue hacia quien llamó. opciones_pool son los argumentos de
+    pool.get_pool con los que se registra el resultado.
+    """
+    reporte, encolar = get_or_create_report_job(conn, producto_id, ultimo_movimiento_id)
+    if reporte is None:
+        return None
+
+    # El PDF cacheado pudo haberse borrado del disco: regenerarlo
+    if reporte['estado'] == 'listo' and not os.path.exists(reporte['archivo'] or ''):
+        finish_report_job(conn, reporte['id'], error='Archivo no encontrado')
+        reporte, encolar = get_or_create_report_job(conn, producto_id, ultimo_movimiento_id)
+
+    if encolar:
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            destino = report_path(directorio, producto_id, ultimo_movimiento_id)
+            future = get_executor(max_workers).submit(_renderizar_pdf, render_html(), destino)
+        except Exception as e:
+            # Sin esto el trabajo quedaría 'pendiente' hasta vencer
+            finish_report_job(conn, reporte['id'], error=str(e) or e.__class__.__name__)
+            raise
+        future.add_done_callback(
+            lambda f, job_id=reporte['id']: _terminar(database, job_id, f, opciones_pool)
+        )
+    return reporte
+
+
+def _terminar(database, job_id, future, opciones_pool=None):
+    """Registrar el resultado de un trabajo terminado en la tabla de reportes"""
+    pool = get_pool(database, **(opciones_pool or {}))
+    conn = pool.acquire()
+    try:
+        error = future.exception()
+        if error is not None:
+            finish_report_job(conn, job_id, error=str(error) or error.__class__.__name__)
+        else:
+            finish_report_job(conn, job_id, archivo=future.result())
+    finally:
+        pool.release(conn)
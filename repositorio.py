@@ -0,0 +1,228 @@
+import sqlite3
+import threading
+import weakref
+from functools import lru_cache
+
+import consultas
+import database
+from database import CAMPOS_PRODUCTO, Movimiento
+
+# Fecha mínima de un DATETIME de MySQL: el '' de consultas.FECHA_MINIMA no es
+# una fecha válida para el servidor
+FECHA_MINIMA_MYSQL = '1000-01-01 00:00:00'
+
+
+@lru_cache(maxsize=256)
+def traducir(sql, paramstyle):
+    """Adaptar una sentencia escrita con marcadores '?' al paramstyle del driver.
+
+    La traducción se cachea: cada forma de sentencia se convierte una sola
+    vez por proceso, sin importar cuántas conexiones o drivers la usen.
+    """
+    if paramstyle == 'qmark':
+        return sql
+    if paramstyle in ('format', 'pyformat'):
+        return sql.replace('%', '%%').replace('?', '%s')
+    raise ValueError(f'paramstyle no soportado: {paramstyle}')
+
+
+def _errores_driver():
+    """Excepciones de los drivers disponibles (mysql.connector es opcional)"""
+    errores = [sqlite3.Error]
+    try:
+        from mysql.connector import Error
+        errores.append(Error)
+    except ImportError:
+        pass
+    return tuple(errores)
+
+
+class SQLiteRepository:
+    """Repositorio sobre SQLite.
+
+    Delega en database.py, que ya mantiene el stock de forma atómica, los
+    resúmenes por trigger y las cachés; sqlite3 reutiliza las sentencias
+    preparadas con su caché por conexión.
+    """
+    nombre = 'sqlite'
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get_all_products(self, limit=None, after=None):
+        return database.get_all_products(self.conn, limit, after)
+
+    def get_product_by_id(self, product_id):
+        return database.get_product_by_id(self.conn, product_id)
+
+    def add_product(self, numero_serie, nombre, cantidad, precio, descripcion=None, categoria_id=None, proveedor_id=None):
+        return database.add_product(self.conn, numero_serie, nombre, cantidad, precio,
+                                    descripcion, categoria_id, proveedor_id)
+
+    def update_product_details(self, product_id, nombre=None, descripcion=None, precio=None, categoria_id=None, proveedor_id=None):
+        return database.update_product_details(self.conn, product_id, nombre, descripcion,
+                                               precio, categoria_id, proveedor_id)
+
+    def get_movements_by_product(self, product_id, fecha_inicio=None, fecha_fin=None, tipo=None):
+        return database.get_movements_by_product(self.conn, product_id, fecha_inicio, fecha_fin, tipo)
+
+
+class MySQLRepository:
+    """Repositorio sobre cualquier conexión DB-API con marcadores %s (mysql.connector).
+
+    Las sentencias se escriben una sola vez con '?' y se traducen con
+    traducir(). Si la conexión admite cursores preparados (prepared=True en
+    mysql.connector) se guarda un cursor por sentencia y conexión, así el
+    servidor prepara cada forma de sentencia una sola vez.
+    """
+    nombre = 'mysql'
+    paramstyle = 'format'
+
+    # Cursores preparados por conexión: {conexión: {sentencia: cursor}}
+    _cursores = weakref.WeakKeyDictionary()
+    _cursores_lock = threading.Lock()
+
+    def __init__(self, conn, preparadas=True):
+        self.conn = conn
+        self.preparadas = preparadas
+        self.Error = _errores_driver()
+
+    def _cursor(self, sql):
+        if not self.preparadas:
+            return self.conn.cursor()
+        with self._cursores_lock:
+            cursores = self._cursores.setdefault(self.conn, {})
+            cursor = cursores.get(sql)
+            if cursor is None:
+                cursor = self.conn.cursor(prepared=True)
+                cursores[sql] = cursor
+        return cursor
+
+    def _execute(self, sql, params=()):
+        sql = traducir(sql, self.paramstyle)
+        cursor = self._cursor(sql)
+        cursor.execute(sql, params)
+        return cursor
+
+    @classmethod
+    def close(cls, conn):
+        """Cerrar los cursores preparados de una conexión"""
+        with cls._cursores_lock:
+            for cursor in cls._cursores.pop(conn, {}).values():
+                cursor.close()
+
+    def get_all_products(self, limit=None, after=None):
+        # MySQL no acepta LIMIT -1: sin límite se usa otra forma de la sentencia
+        columnas = ', '.join(CAMPOS_PRODUCTO)
+        try:
+            if limit is None:
+                cursor = self._execute(
+                    f"SELECT {columnas} FROM productos WHERE id > ? ORDER BY id", (after or 0,))
+            else:
+                cursor = self._execute(
+                    f"SELECT {columnas} FROM productos WHERE id > ? ORDER BY id LIMIT ?", (after or 0, limit))
+            return [tuple(fila) for fila in cursor.fetchall()]
+        except self.Error as e:
+            print(f"Error al obtener productos: {e}")
+            return []
+
+    def get_product_by_id(self, product_id):
+        try:
+            cursor = self._execute("""
+                SELECT id, numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id,
+                       fecha_registro
+                FROM productos
+                WHERE id = ?
+            """, (product_id,))
+            fila = cursor.fetchone()
+            if fila is None:
+                return None
+            return dict(zip(CAMPOS_PRODUCTO, fila))
+        except self.Error as e:
+            print(f"Error al obtener producto: {e}")
+            return None
+
+    def add_product(self, numero_serie, nombre, cantidad, precio, descripcion=None, categoria_id=None, proveedor_id=None):
+        """Insertar un producto y su movimiento de entrada inicial en una transacción"""
+        try:
+            cursor = self._execute('''
+                INSERT INTO productos(numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id)
+                VALUES(?, ?, ?, ?, ?, ?, ?)
+            ''', (numero_serie, nombre, descripcion, cantidad, precio, categoria_id, proveedor_id))
+            producto_id = cursor.lastrowid
+            if cantidad > 0:
+                self._execute('''
+                    INSERT INTO movimientos(
+                        producto_id, tipo, cantidad, stock_anterior,
+                        stock_posterior, precio, descripcion
+                    ) VALUES(?, 'entrada', ?, 0, ?, ?, ?)
+                ''', (producto_id, cantidad, cantidad, precio, 'Registro inicial del producto'))
+            self.conn.commit()
+            return producto_id
+        except self.Error as e:
+            self.conn.rollback()
+            print(f"Error al insertar producto: {e}")
+            return None
+
+    def update_product_details(self, product_id, nombre=None, descripcion=None, precio=None, categoria_id=None, proveedor_id=None):
+        """Actualizar solo los campos indicados (misma semántica que database.py)"""
+        valores = (nombre or None, descripcion or None, precio or None, categoria_id or None, proveedor_id or None)
+        if not any(valor is not None for valor in valores):
+            return False
+        try:
+            # Una sola forma de sentencia: None conserva el valor de la columna
+            self._execute("""
+                UPDATE productos SET
+                    nombre = COALESCE(?, nombre),
+                    descripcion = COALESCE(?, descripcion),
+                    precio = COALESCE(?, precio),
+                    categoria_id = COALESCE(?, categoria_id),
+                    proveedor_id = COALESCE(?, proveedor_id)
+                WHERE id = ?
+            """, valores + (product_id,))
+            self.conn.commit()
+            return True
+        except self.Error as e:
+            self.conn.rollback()
+            print(f"Error al actualizar producto: {e}")
+            return False
+
+    def get_movements_by_product(self, product_id, fecha_inicio=None, fecha_fin=None, tipo=None):
+        # Los filtros ausentes usan centinelas (como consultas.filtro_movimientos),
+        # así el texto de la sentencia no cambia y el cursor preparado se reutiliza
+        tipo = tipo or None
+        params = (
+            product_id,
+            consultas.texto_fecha(fecha_inicio) or FECHA_MINIMA_MYSQL,
+            consultas.texto_fecha(fecha_fin) or consultas.FECHA_MAXIMA,
+            tipo, tipo,
+        )
+        try:
+            cursor = self._execute("""
+                SELECT m.id, m.fecha, m.tipo, m.cantidad, m.stock_anterior, m.stock_posterior,
+                       p.precio, m.usuario, m.descripcion
+                FROM movimientos m
+                JOIN productos p ON m.producto_id = p.id
+                WHERE m.producto_id = ?
+                  AND m.fecha >= ? AND m.fecha <= ?
+                  AND (? IS NULL OR m.tipo = ?)
+                ORDER BY m.fecha DESC, m.id DESC
+            """, params)
+            return [Movimiento(*fila) for fila in cursor.fetchall()]
+        except self.Error as e:
+            print(f"Error al obtener movimientos: {e}")
+            return []
+
+
+REPOSITORIOS = {
+    'sqlite': SQLiteRepository,
+    'mysql': MySQLRepository,
+}
+
+
+def get_repository(backend, conn):
+    """Crear el repositorio del backend indicado sobre una conexión abierta"""
+    try:
+        return REPOSITORIOS[backend](conn)
+    except KeyError:
+        raise ValueError(f"Backend desconocido: {backend} (disponibles: {', '.join(REPOSITORIOS)})") from None
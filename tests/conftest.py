@@ -0,0 +1,54 @@
+"""Fixtures comunes: una base temporal con los datos de ejemplo por prueba."""
+import pytest
+
+from cache import category_catalog, product_cache
+from database import initialize_database
+from http_cache import fragment_cache
+from pool import ConnectionPool
+
+
+@pytest.fixture(autouse=True)
+def caches_limpias():
+    # Las cachés son globales del proceso: una prueba no debe ver datos de otra base
+    product_cache.invalidate()
+    category_catalog.invalidate()
+    fragment_cache._datos.clear()
+    yield
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    """Base con el esquema al día y los datos de insert_initial_data"""
+    ruta = str(tmp_path / 'inventario.db')
+    initialize_database(ruta)
+    return ruta
+
+
+@pytest.fixture
+def pool(ruta):
+    pool = ConnectionPool(ruta)
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def conn(pool):
+    conn = pool.acquire()
+    yield conn
+    pool.release(conn)
+
+
+@pytest.fixture
+def app(ruta):
+    """Aplicación Flask sobre la base temporal, sin el hilo de mantenimiento"""
+    from app import app
+
+    app.config.update(DATABASE=ruta, TESTING=True)
+    # Las plantillas están en la raíz del repositorio, junto a app.py
+    app.template_folder = app.root_path
+    return app
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
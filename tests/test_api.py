@@ -0,0 +1,76 @@
+"""API /api/v1: respuestas NDJSON y paginación con ?after= (el cursor de 'siguiente')."""
+import json
+
+import pytest
+
+from database import insert_movimientos_batch
+
+
+def _ndjson(respuesta):
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/x-ndjson'
+    return [json.loads(linea) for linea in respuesta.get_data(as_text=True).splitlines()]
+
+
+def _paginas(cliente, url, limit):
+    """Seguir 'siguiente' hasta la última página y devolver todas las filas"""
+    filas, after = [], None
+    while True:
+        consulta = {'limit': limit}
+        if after is not None:
+            consulta['after'] = after
+        respuesta = cliente.get(url, query_string=consulta)
+        assert respuesta.status_code == 200
+        pagina = respuesta.get_json()
+        assert len(pagina['datos']) <= limit
+        filas.extend(pagina['datos'])
+        after = pagina['siguiente']
+        if after is None:
+            return filas
+
+
+@pytest.fixture
+def movimientos(conn):
+    # Más movimientos que una página, varios en el mismo segundo: el id desempata
+    insert_movimientos_batch(conn, [{'producto_id': 1, 'tipo': 'entrada', 'cantidad': 1}] * 25)
+    return conn
+
+
+def test_productos_ndjson(cliente):
+    por_parametro = _ndjson(cliente.get('/api/v1/productos?formato=ndjson&campos=id,nombre'))
+    por_accept = _ndjson(cliente.get('/api/v1/productos?campos=id,nombre',
+                                     headers={'Accept': 'application/x-ndjson'}))
+    assert por_parametro == por_accept
+    assert por_parametro and all(set(fila) == {'id', 'nombre'} for fila in por_parametro)
+
+
+@pytest.mark.parametrize('limit', [1, 4, 500])
+def test_productos_paginas(cliente, limit):
+    todas = _ndjson(cliente.get('/api/v1/productos?formato=ndjson'))
+    assert _paginas(cliente, '/api/v1/productos', limit) == todas
+
+
+def test_ndjson_con_limite_y_after(cliente):
+    todas = _ndjson(cliente.get('/api/v1/productos?formato=ndjson&campos=id'))
+    parte = _ndjson(cliente.get(f"/api/v1/productos?formato=ndjson&campos=id&limit=3&after={todas[1]['id']}"))
+    assert parte == todas[2:5]
+
+
+@pytest.mark.parametrize('limit', [1, 7, 500])
+def test_movimientos_paginas(cliente, movimientos, limit):
+    todos = _ndjson(cliente.get('/api/v1/productos/1/movimientos?formato=ndjson'))
+    assert len(todos) >= 25
+    paginas = _paginas(cliente, '/api/v1/productos/1/movimientos', limit)
+    assert paginas == todos
+    assert len({m['id'] for m in paginas}) == len(paginas)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/v1/productos?limit=0',
+    '/api/v1/productos?limit=x',
+    '/api/v1/productos/1/movimientos?after=sin-cursor',
+])
+def test_parametros_invalidos(cliente, url):
+    respuesta = cliente.get(url)
+    assert respuesta.status_code == 400
+    assert 'error' in respuesta.get_json()
@@ -0,0 +1,150 @@
+"""Archivo de movimientos por año y borrado del historial de productos eliminados."""
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import (
+    archive_movements, compact_stock_snapshots, delete_product, get_movement_statistics,
+    iter_movements_by_product, purge_deleted_products
+)
+
+INICIO = datetime(2022, 1, 1)
+CORTE = datetime(2024, 6, 1)
+PRODUCTOS = (1, 2)
+
+
+@pytest.fixture
+def historial(conn):
+    """Movimientos de dos productos entre 2022 y 2024; el corte de stock queda en CORTE"""
+    conn.execute("DELETE FROM movimientos")
+    azar = random.Random(23)
+    fechas = sorted(INICIO + timedelta(seconds=azar.randrange(3 * 365 * 86400)) for _ in range(200))
+    stock = dict.fromkeys(PRODUCTOS, 0)
+    movimientos = []
+    for fecha in fechas:
+        producto_id = azar.choice(PRODUCTOS)
+        anterior = stock[producto_id]
+        cantidad = azar.randint(-min(anterior, 5), 8)
+        stock[producto_id] = anterior + cantidad
+        movimientos.append((producto_id, 'entrada' if cantidad >= 0 else 'salida', abs(cantidad),
+                            anterior, stock[producto_id], float(azar.randint(1, 100)),
+                            fecha.strftime('%Y-%m-%d %H:%M:%S')))
+    conn.executemany('''
+        INSERT INTO movimientos (producto_id, tipo, cantidad, stock_anterior, stock_posterior, precio, fecha)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', movimientos)
+    conn.commit()
+    assert compact_stock_snapshots(conn, hasta=CORTE, desde=CORTE)
+    return movimientos
+
+
+def _filas(conn, producto_id, **filtros):
+    return [(m.id, m.fecha, m.tipo, m.cantidad, m.stock_anterior, m.stock_posterior, m.precio)
+            for m in iter_movements_by_product(conn, producto_id, **filtros)]
+
+
+def _paginas(conn, producto_id, limit, **filtros):
+    """Recorrer el historial de a `limit` filas con after, como la API"""
+    filas, after = [], None
+    while True:
+        pagina = list(iter_movements_by_product(conn, producto_id, limit=limit, after=after, **filtros))
+        assert len(pagina) <= limit
+        if not pagina:
+            return filas
+        filas += [m.id for m in pagina]
+        after = (pagina[-1]['fecha'].strftime('%Y-%m-%d %H:%M:%S'), pagina[-1].id)
+
+
+FILTROS = [
+    {},
+    {'tipo': 'salida'},
+    {'fecha_inicio': datetime(2023, 3, 1), 'fecha_fin': datetime(2024, 9, 1)},
+    {'fecha_inicio': datetime(2022, 6, 1), 'fecha_fin': datetime(2022, 12, 31), 'tipo': 'entrada'},
+]
+
+
+@pytest.fixture
+def archivado(conn, historial, tmp_path):
+    """Lecturas de antes de archivar; después archiva todo lo anterior al corte"""
+    antes = {
+        (producto_id, i): (_filas(conn, producto_id, **filtros),
+                           get_movement_statistics(conn, producto_id, **filtros))
+        for producto_id in PRODUCTOS for i, filtros in enumerate(FILTROS)
+    }
+    movidos = archive_movements(conn, str(tmp_path / 'archivo'), retener_dias=0, hasta=datetime(2026, 1, 1))
+    assert [periodo for periodo, _ in movidos] == ['2022', '2023', '2024']
+    return antes, movidos
+
+
+def test_archiva_solo_lo_anterior_al_corte(conn, historial, archivado, tmp_path):
+    _, movidos = archivado
+    anteriores = sum(1 for m in historial if m[6] < CORTE.strftime('%Y-%m-%d %H:%M:%S'))
+    assert sum(filas for _, filas in movidos) == anteriores
+    restantes = conn.execute("SELECT COUNT(*), MIN(fecha) FROM movimientos").fetchone()
+    assert restantes[0] == len(historial) - anteriores
+    assert restantes[1] >= CORTE.strftime('%Y-%m-%d %H:%M:%S')
+    for periodo, filas in movidos:
+        assert os.path.exists(tmp_path / 'archivo' / f'movimientos_{periodo}.db')
+        assert conn.execute("SELECT filas FROM archivos_movimientos WHERE periodo = ?",
+                            (periodo,)).fetchone()[0] == filas
+
+
+@pytest.mark.parametrize('producto_id', PRODUCTOS)
+@pytest.mark.parametrize('i', range(len(FILTROS)))
+def test_lecturas_iguales_tras_archivar(conn, archivado, producto_id, i):
+    antes, _ = archivado
+    filas, estadisticas = antes[producto_id, i]
+    assert filas
+    assert _filas(conn, producto_id, **FILTROS[i]) == filas
+    # valor_total se suma por partes (base y cada archivo): solo cambia el redondeo
+    assert get_movement_statistics(conn, producto_id, **FILTROS[i]) == {
+        **estadisticas, 'valor_total': pytest.approx(estadisticas['valor_total'])}
+
+
+@pytest.mark.parametrize('limit', [1, 7, 50])
+def test_paginacion_cruza_archivo_y_base(conn, archivado, limit):
+    antes, _ = archivado
+    for producto_id in PRODUCTOS:
+        for i, filtros in enumerate(FILTROS):
+            assert _paginas(conn, producto_id, limit, **filtros) == [fila[0] for fila in antes[producto_id, i][0]]
+
+
+def test_rearchivar_no_mueve_nada(conn, archivado, tmp_path):
+    assert archive_movements(conn, str(tmp_path / 'archivo'), retener_dias=0, hasta=datetime(2026, 1, 1)) == []
+
+
+def test_purga_producto_eliminado(conn, archivado, ruta):
+    conn.execute("INSERT INTO reportes (producto_id, ultimo_movimiento_id, estado) VALUES (1, 0, 'listo')")
+    conn.commit()
+    conservados = _filas(conn, 2)
+
+    assert delete_product(conn, 1)
+    # Hasta la purga el historial sigue en la base, pero el producto ya no se lee
+    assert conn.execute("SELECT COUNT(*) FROM movimientos WHERE producto_id = 1").fetchone()[0]
+    assert _filas(conn, 1) == []
+
+    assert purge_deleted_products(conn, lote=7) == 1
+    for tabla in ('movimientos', 'stock_snapshots', 'reportes'):
+        assert conn.execute(f"SELECT COUNT(*) FROM {tabla} WHERE producto_id = 1").fetchone()[0] == 0, tabla
+    assert conn.execute("SELECT COUNT(*) FROM productos_eliminados").fetchone()[0] == 0
+
+    total_archivado = 0
+    for periodo, archivo in conn.execute("SELECT periodo, archivo FROM archivos_movimientos").fetchall():
+        lectura = sqlite3.connect(os.path.join(os.path.dirname(ruta), archivo))
+        try:
+            assert lectura.execute("SELECT COUNT(*) FROM movimientos WHERE producto_id = 1").fetchone()[0] == 0
+            en_archivo = lectura.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0]
+        finally:
+            lectura.close()
+        assert conn.execute("SELECT filas FROM archivos_movimientos WHERE periodo = ?",
+                            (periodo,)).fetchone()[0] == en_archivo
+        total_archivado += en_archivo
+    assert total_archivado
+    assert _filas(conn, 2) == conservados
+
+
+def test_purga_sin_pendientes(conn):
+    assert purge_deleted_products(conn) == 0
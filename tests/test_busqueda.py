@@ -0,0 +1,65 @@
+"""search_products: productos_fts y la búsqueda con LIKE mientras falta su backfill."""
+import pytest
+
+from database import MIGRACION_FTS, add_product, search_products, update_product_details
+from migraciones import BACKFILL, migrar
+
+
+def _series(conn, q, limit=20):
+    return [p['numero_serie'] for p in search_products(conn, q, limit)]
+
+
+def _backfill_pendiente(conn):
+    # Como una base migrada con productos antes de correr flask migrar
+    conn.execute("DELETE FROM productos_fts")
+    conn.execute("UPDATE schema_migrations SET estado = ?, progreso = 0 WHERE version = ?",
+                 (BACKFILL, MIGRACION_FTS))
+    conn.commit()
+
+
+CONSULTAS = [
+    ('lap', ['E001']),
+    ('lap del', ['E001']),
+    ('juego s', ['C002', 'H001']),    # la última letra suelta se ignora
+    ('piezas', ['J002', 'T002']),      # coincide en la descripción
+    ('E00', ['E001', 'E002']),         # prefijo del número de serie
+]
+
+
+@pytest.mark.parametrize('q,esperado', CONSULTAS)
+def test_con_fts(conn, q, esperado):
+    assert sorted(_series(conn, q)) == esperado
+
+
+@pytest.mark.parametrize('q,esperado', CONSULTAS)
+def test_con_like_mientras_falta_el_backfill(conn, q, esperado):
+    _backfill_pendiente(conn)
+    assert sorted(_series(conn, q)) == esperado
+
+
+def test_vuelve_a_fts_al_terminar_el_backfill(conn):
+    _backfill_pendiente(conn)
+    assert migrar(conn)
+    assert conn.execute("SELECT COUNT(*) FROM productos_fts").fetchone()[0] == \
+        conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
+    # Sin diacríticos solo coincide a través del índice (remove_diacritics)
+    assert _series(conn, 'lampara') == ['H002']
+
+
+def test_el_indice_sigue_las_escrituras(conn):
+    assert add_product(conn, 'NUEVO-1', 'Taladro percutor', 1, 50.0)
+    assert _series(conn, 'taladro') == ['NUEVO-1']
+    assert _series(conn, 'pelotas tenis') == ['D002']
+    assert update_product_details(conn, 12, nombre='Pelotas de pádel')
+    assert _series(conn, 'pelotas padel') == ['D002']
+    assert _series(conn, 'pelotas tenis') == []
+
+
+def test_numero_de_serie_en_minusculas(conn):
+    assert sorted(_series(conn, 'e00')) == ['E001', 'E002']
+
+
+def test_limite(conn):
+    assert len(_series(conn, 'set', limit=2)) == 2
+    assert search_products(conn, '') == []
+    assert search_products(conn, '  !! ') == []
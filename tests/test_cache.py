@@ -0,0 +1,61 @@
+"""Cachés de cache.py: las escrituras nunca dejan ver un producto o un conteo viejo."""
+from cache import category_catalog, product_cache
+from database import (
+    add_product, apply_stock_delta, delete_product, get_all_categories, get_product_by_id,
+    update_product_details, update_product_price
+)
+
+
+def _conteo(conn, categoria_id):
+    return next(cat[3] for cat in get_all_categories(conn) if cat[0] == categoria_id)
+
+
+def test_escrituras_de_la_misma_conexion_invalidan_el_producto(conn):
+    original = get_product_by_id(conn, 1)
+    assert get_product_by_id(conn, 1) == original
+    assert product_cache.stats()['hits'] >= 1
+
+    apply_stock_delta(conn, 1, 3, 'entrada')
+    assert get_product_by_id(conn, 1)['cantidad'] == original['cantidad'] + 3
+    update_product_price(conn, 1, 123.45)
+    assert get_product_by_id(conn, 1)['precio'] == 123.45
+    update_product_details(conn, 1, nombre='Renombrado')
+    assert get_product_by_id(conn, 1)['nombre'] == 'Renombrado'
+    delete_product(conn, 1)
+    assert get_product_by_id(conn, 1) is None
+
+
+def test_escritura_de_otra_conexion_recarga_solo_ese_producto(pool, conn):
+    get_product_by_id(conn, 1)
+    get_product_by_id(conn, 2)
+    otra = pool._connect()
+    otra.execute("UPDATE productos SET cantidad = 777 WHERE id = 1")
+    otra.commit()
+
+    antes = product_cache.stats()
+    assert get_product_by_id(conn, 1)['cantidad'] == 777
+    assert get_product_by_id(conn, 2)['cantidad'] != 777
+    despues = product_cache.stats()
+    # El producto 2 no cambió: se revalida con su contador sin volver a cargarse
+    assert despues['misses'] - antes['misses'] == 1
+    assert despues['revalidaciones'] - antes['revalidaciones'] == 1
+
+    otra.execute("DELETE FROM productos WHERE id = 2")
+    otra.commit()
+    assert get_product_by_id(conn, 2) is None
+    otra.close()
+
+
+def test_catalogo_de_categorias_sigue_las_escrituras(pool, conn):
+    antes = _conteo(conn, 2)
+    assert add_product(conn, 'CACHE-1', 'Nuevo', 1, 1.0, categoria_id=2)
+    assert _conteo(conn, 2) == antes + 1
+    assert update_product_details(conn, 1, categoria_id=2)
+    assert _conteo(conn, 2) == antes + 2
+
+    otra = pool._connect()
+    otra.execute("INSERT INTO productos (numero_serie, nombre, precio, categoria_id) VALUES ('CACHE-2', 'X', 1.0, 2)")
+    otra.commit()
+    otra.close()
+    assert _conteo(conn, 2) == antes + 3
+    assert category_catalog.stats()['recargas'] >= 2
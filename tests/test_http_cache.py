@@ -0,0 +1,45 @@
+"""GET condicional (http_cache.conditional_get): 304 con el ETag vigente y ETag nuevo tras escribir."""
+from database import apply_stock_delta, insert_categoria
+
+
+def test_etag_vigente_responde_304(cliente):
+    primera = cliente.get('/productos_por_precio/asc')
+    assert primera.status_code == 200
+    etag = primera.headers['ETag']
+    assert etag.startswith('W/')
+    assert primera.headers['Cache-Control'] == 'no-cache'
+
+    segunda = cliente.get('/productos_por_precio/asc', headers={'If-None-Match': etag})
+    assert segunda.status_code == 304
+    assert segunda.get_data() == b''
+    assert segunda.headers['ETag'] == etag
+
+
+def test_escritura_cambia_el_etag(cliente, conn):
+    etag = cliente.get('/productos_por_precio/asc').headers['ETag']
+    assert apply_stock_delta(conn, 1, 1, 'entrada') is not None
+
+    respuesta = cliente.get('/productos_por_precio/asc', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+
+
+def test_solo_cuentan_los_contadores_de_la_ruta(cliente, conn):
+    # /productos_por_precio depende solo de 'productos'
+    etag = cliente.get('/productos_por_precio/asc').headers['ETag']
+    insert_categoria(conn, 'Nueva categoría')
+    assert cliente.get('/productos_por_precio/asc', headers={'If-None-Match': etag}).status_code == 304
+
+    # /productos_por_categoria también depende de 'categorias'
+    etag = cliente.get('/productos_por_categoria').headers['ETag']
+    insert_categoria(conn, 'Otra categoría')
+    respuesta = cliente.get('/productos_por_categoria', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert 'Otra categoría' in respuesta.get_data(as_text=True)
+
+
+def test_if_modified_since(cliente):
+    primera = cliente.get('/productos_detallados')
+    assert primera.status_code == 200
+    ultima = primera.headers['Last-Modified']
+    assert cliente.get('/productos_detallados', headers={'If-Modified-Since': ultima}).status_code == 304
@@ -0,0 +1,145 @@
+"""Importación de productos: conteos del upsert y archivo de errores."""
+import csv
+import time
+
+import pytest
+
+import importacion
+from database import get_import_job, import_products_batch
+
+ENCABEZADO = 'Número de serie;Nombre;Precio;Cantidad;Categoría;Proveedor;Descripción'
+FILAS = [
+    'E001;Laptop Dell XPS;1299.99;8;Electrónicos;TechMax;Laptop de alta gama',  # 2: sin cambios
+    'H001;Juego de sábanas;89,99;25;hogar;HomeGoods;Algodón egipcio',  # 3: nuevo precio
+    'N-1;Producto nuevo;10;5;Categoría nueva;;',  # 4: nuevo, con categoría a crear
+    ';;;;;;',  # 5: vacía, se ignora
+    'N-2;Sin precio;;3;;;',  # 6: error
+    'N-3;Stock negativo;10;-2;;;',  # 7: error
+    'N-4;Stock con decimales;10;1.5;;;',  # 8: error
+    'E001;Laptop Dell XPS;1299.99;10;;;',  # 9: repetido, va en el lote siguiente
+]
+
+
+def _escribir(ruta, filas):
+    ruta.write_text('\n'.join([ENCABEZADO] + filas) + '\n', encoding='utf-8')
+    return str(ruta)
+
+
+def _movimientos(conn, producto_id):
+    return conn.execute('''
+        SELECT tipo, cantidad, stock_anterior, stock_posterior, usuario
+        FROM movimientos WHERE producto_id = ? ORDER BY id
+    ''', (producto_id,)).fetchall()
+
+
+def test_import_products_batch_cuenta_y_registra_stock(conn):
+    previos_e001 = _movimientos(conn, 1)
+    totales = import_products_batch(conn, [
+        ('E001', 'Laptop Dell XPS', None, None, 1299.99, None, None),  # igual al existente
+        ('E002', 'Monitor LG 27"', None, 20, 349.99, None, None),  # stock 14 -> 20
+        ('H001', 'Sábanas', None, None, 99.99, None, None),  # solo el nombre
+        ('IMP-1', 'Importado', 'Nuevo', 3, 5.0, 2, None),
+        ('IMP-2', 'Sin stock', None, None, 1.0, None, None),
+    ], 'prueba')
+    assert totales == (2, 2, 1)
+
+    assert _movimientos(conn, 1) == previos_e001
+    assert _movimientos(conn, 2)[-1] == ('ajuste', 6, 14, 20, 'prueba')
+    # None conserva los valores del producto existente
+    assert conn.execute("SELECT nombre, descripcion, cantidad, categoria_id FROM productos WHERE id = 3").fetchone() == (
+        'Sábanas', 'Algodón egipcio', 25, 2)
+
+    nuevos = dict(conn.execute(
+        "SELECT numero_serie, id FROM productos WHERE numero_serie IN ('IMP-1', 'IMP-2')").fetchall())
+    assert _movimientos(conn, nuevos['IMP-1']) == [('entrada', 3, 0, 3, 'prueba')]
+    assert _movimientos(conn, nuevos['IMP-2']) == []
+    assert conn.execute("SELECT cantidad FROM productos WHERE id = ?", (nuevos['IMP-2'],)).fetchone()[0] == 0
+
+    # Repetir el mismo lote no cambia nada
+    assert import_products_batch(conn, [('IMP-1', 'Importado', 'Nuevo', 3, 5.0, 2, None)], 'prueba') == (0, 0, 1)
+
+
+def test_importar_productos_resumen_y_errores(conn, tmp_path):
+    ruta = _escribir(tmp_path / 'catalogo.csv', FILAS)
+    errores = str(tmp_path / 'errores.csv')
+    avances = []
+
+    resumen = importacion.importar_productos(conn, ruta, errores, progreso=lambda r: avances.append(dict(r)))
+
+    assert resumen['error'] is None
+    assert {campo: resumen[campo] for campo in ('filas', 'insertados', 'actualizados', 'sin_cambios', 'errores')} == {
+        'filas': 7, 'insertados': 1, 'actualizados': 2, 'sin_cambios': 1, 'errores': 3}
+    assert resumen['archivo_errores'] == errores
+    # Un lote hasta el E001 repetido y otro con el resto
+    assert [a['insertados'] + a['actualizados'] + a['sin_cambios'] for a in avances] == [3, 4]
+
+    assert conn.execute("SELECT precio FROM productos WHERE numero_serie = 'H001'").fetchone()[0] == 89.99
+    assert conn.execute("SELECT cantidad FROM productos WHERE numero_serie = 'E001'").fetchone()[0] == 10
+    nuevo = conn.execute('''
+        SELECT c.nombre, p.cantidad FROM productos p JOIN categorias c ON c.id = p.categoria_id
+        WHERE p.numero_serie = 'N-1'
+    ''').fetchone()
+    assert nuevo == ('Categoría nueva', 5)
+
+    with open(errores, newline='', encoding='utf-8') as f:
+        lector = csv.DictReader(f)
+        assert lector.fieldnames == ['fila', 'error', 'numero_serie', 'nombre', 'precio', 'cantidad',
+                                     'categoria', 'proveedor', 'descripcion']
+        filas = list(lector)
+    assert [(f['fila'], f['numero_serie']) for f in filas] == [('6', 'N-2'), ('7', 'N-3'), ('8', 'N-4')]
+    assert 'obligatorios' in filas[0]['error']
+    assert 'negativo' in filas[1]['error']
+    assert 'entero' in filas[2]['error']
+    # La fila se copia tal como venía, para corregirla y volver a importarla
+    assert filas[1]['cantidad'] == '-2' and filas[1]['nombre'] == 'Stock negativo'
+
+
+def test_reimportar(conn, tmp_path):
+    ruta = _escribir(tmp_path / 'catalogo.csv', FILAS)
+    importacion.importar_productos(conn, ruta)
+    movimientos = conn.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0]
+
+    # Solo cambia el E001 repetido: vuelve a 8 en el primer lote y a 10 en el segundo
+    resumen = importacion.importar_productos(conn, ruta, str(tmp_path / 'errores.csv'))
+    assert (resumen['insertados'], resumen['actualizados'], resumen['sin_cambios'], resumen['errores']) == (0, 2, 2, 3)
+    assert conn.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0] == movimientos + 2
+    assert conn.execute("SELECT cantidad FROM productos WHERE numero_serie = 'E001'").fetchone()[0] == 10
+
+
+def test_sin_errores_no_crea_archivo(conn, tmp_path):
+    ruta = _escribir(tmp_path / 'catalogo.csv', FILAS[:3])
+    errores = tmp_path / 'errores.csv'
+    resumen = importacion.importar_productos(conn, ruta, str(errores), tamano_lote=1)
+    assert (resumen['errores'], resumen['archivo_errores']) == (0, None)
+    assert not errores.exists()
+
+
+def test_no_crea_categorias_si_no_se_pide(conn, tmp_path):
+    ruta = _escribir(tmp_path / 'catalogo.csv', FILAS[:3])
+    errores = str(tmp_path / 'errores.csv')
+    resumen = importacion.importar_productos(conn, ruta, errores, crear_faltantes=False)
+    assert (resumen['insertados'], resumen['errores']) == (0, 1)
+    assert conn.execute("SELECT COUNT(*) FROM categorias WHERE nombre = 'Categoría nueva'").fetchone()[0] == 0
+    with open(errores, newline='', encoding='utf-8') as f:
+        assert [fila['fila'] for fila in csv.DictReader(f)] == ['4']
+
+
+def test_faltan_columnas(conn, tmp_path):
+    ruta = tmp_path / 'catalogo.csv'
+    ruta.write_text('nombre;cantidad\nX;1\n', encoding='utf-8')
+    resumen = importacion.importar_productos(conn, str(ruta))
+    assert resumen['error'] == 'Faltan columnas: numero_serie, precio'
+    assert resumen['filas'] == 0
+
+
+def test_iniciar_deja_el_resumen_en_la_tabla(conn, ruta, tmp_path):
+    archivo = _escribir(tmp_path / 'catalogo.csv', FILAS)
+    job_id = importacion.iniciar(ruta, archivo, str(tmp_path / 'errores.csv'))
+    assert job_id
+
+    limite = time.monotonic() + 10
+    while (trabajo := get_import_job(conn, job_id))['estado'] not in ('terminada', 'error'):
+        assert time.monotonic() < limite
+        time.sleep(0.05)
+    assert trabajo['estado'] == 'terminada'
+    assert (trabajo['insertados'], trabajo['actualizados'], trabajo['sin_cambios'], trabajo['errores']) == (1, 2, 1, 3)
@@ -0,0 +1,80 @@
+"""Migraciones: una base anterior al versionado llega a la versión actual sin perder datos."""
+import sqlite3
+
+import pytest
+
+import migraciones
+from database import check_category_summary, ensure_schema, search_products
+from migraciones import APLICADA, BACKFILL, MIGRACIONES, VERSION_ESQUEMA, Migracion, estado, migrar
+
+
+@pytest.fixture
+def vieja(tmp_path):
+    """Base creada con el create_tables de antes de las migraciones (user_version 0)"""
+    ruta = str(tmp_path / 'vieja.db')
+    conn = sqlite3.connect(ruta)
+    for paso in migraciones._ESQUEMA_BASE:
+        conn.execute(paso)
+    conn.execute("INSERT INTO categorias (nombre) VALUES ('Herramientas')")
+    conn.executemany(
+        "INSERT INTO productos (numero_serie, nombre, cantidad, precio, categoria_id) VALUES (?, ?, ?, ?, 1)",
+        [('V-1', 'Martillo galponero', 5, 10.0), ('V-2', 'Serrucho', 0, 25.0)]
+    )
+    conn.executemany('''
+        INSERT INTO movimientos (producto_id, tipo, cantidad, stock_anterior, stock_posterior, precio, descripcion, usuario)
+        VALUES (1, ?, ?, ?, ?, 10.0, ?, ?)
+    ''', [('entrada', 5, 0, 5, 'Compra', 'caja'),
+          ('salida', 2, 5, 3, 'Actualización manual: salida de 2 unidades', 'sistema')])
+    conn.commit()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+    return ruta
+
+
+def _abrir(ruta):
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA foreign_keys = 1")
+    return conn
+
+
+def test_ensure_schema_aplica_el_ddl_y_deja_los_backfills(vieja):
+    assert ensure_schema(vieja)
+    conn = _abrir(vieja)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == VERSION_ESQUEMA
+    registradas = estado(conn)
+    assert sorted(registradas) == [m.version for m in MIGRACIONES]
+    # Con productos, los backfills quedan para flask migrar
+    pendientes = {version for version, fila in registradas.items() if fila[1] == BACKFILL}
+    assert pendientes == {m.version for m in MIGRACIONES if m.backfill}
+    assert conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0] == 2
+    conn.close()
+
+
+def test_migrar_completa_los_backfills(vieja):
+    assert ensure_schema(vieja)
+    conn = _abrir(vieja)
+    assert migrar(conn)
+    assert all(fila[1] == APLICADA for fila in estado(conn).values())
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == VERSION_ESQUEMA
+
+    tipos = conn.execute("SELECT tipo FROM movimientos ORDER BY id").fetchall()
+    assert tipos == [('entrada',), ('ajuste',)]
+    assert [p['numero_serie'] for p in search_products(conn, 'galponero')] == ['V-1']
+    assert check_category_summary(conn) == []
+    # Nada más pendiente: una segunda corrida no aplica nada
+    assert migrar(conn) == []
+    conn.close()
+
+
+def test_falla_sin_avanzar_la_version(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'rota.db'))
+    rota = [MIGRACIONES[0], Migracion(2, 'rota', ["CREATE TABLE incompleta ("])]
+    assert migrar(conn, migraciones=rota) is None
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    assert sorted(estado(conn)) == [1]
+
+    # La corrida siguiente retoma desde la migración que falló
+    assert migrar(conn)
+    assert sorted(estado(conn)) == [m.version for m in MIGRACIONES]
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == VERSION_ESQUEMA
+    conn.close()
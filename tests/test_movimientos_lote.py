@@ -0,0 +1,66 @@
+"""insert_movimientos_batch: el lote se aplica completo o no se aplica."""
+from database import insert_movimientos_batch
+
+
+def _stock(conn, *ids):
+    return [conn.execute("SELECT cantidad FROM productos WHERE id = ?", (i,)).fetchone()[0] for i in ids]
+
+
+def _preparar(conn, stocks):
+    for producto_id, cantidad in stocks.items():
+        conn.execute("UPDATE productos SET cantidad = ? WHERE id = ?", (cantidad, producto_id))
+    conn.execute("DELETE FROM movimientos")
+    conn.commit()
+
+
+def _total_movimientos(conn):
+    return conn.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0]
+
+
+def test_aplica_las_lineas_en_orden(conn):
+    _preparar(conn, {1: 5, 2: 0})
+    lote = [
+        {'producto_id': 1, 'tipo': 'salida', 'cantidad': 5},
+        {'producto_id': 2, 'tipo': 'entrada', 'cantidad': 3},
+        {'producto_id': 1, 'tipo': 'entrada', 'cantidad': 2},
+        {'producto_id': 2, 'tipo': 'salida', 'cantidad': 3},
+    ]
+    assert insert_movimientos_batch(conn, lote) == 4
+    assert _stock(conn, 1, 2) == [2, 0]
+    cadena = conn.execute(
+        "SELECT producto_id, stock_anterior, stock_posterior FROM movimientos ORDER BY id"
+    ).fetchall()
+    assert cadena == [(1, 5, 0), (2, 0, 3), (1, 0, 2), (2, 3, 0)]
+
+
+def test_rechaza_el_lote_si_una_linea_deja_stock_negativo(conn):
+    _preparar(conn, {1: 5, 2: 1})
+    lote = [
+        {'producto_id': 1, 'tipo': 'salida', 'cantidad': 4},
+        {'producto_id': 2, 'tipo': 'entrada', 'cantidad': 10},
+        # Con el stock que dejó la primera línea ya no alcanza
+        {'producto_id': 1, 'tipo': 'salida', 'cantidad': 2},
+    ]
+    assert insert_movimientos_batch(conn, lote) is None
+    assert not conn.in_transaction
+    assert _stock(conn, 1, 2) == [5, 1]
+    assert _total_movimientos(conn) == 0
+
+
+def test_rechaza_el_lote_con_un_producto_inexistente(conn):
+    _preparar(conn, {1: 5})
+    lote = [
+        {'producto_id': 1, 'tipo': 'salida', 'cantidad': 1},
+        {'producto_id': 9999, 'tipo': 'entrada', 'cantidad': 1},
+    ]
+    assert insert_movimientos_batch(conn, lote) is None
+    assert _stock(conn, 1) == [5]
+    assert _total_movimientos(conn) == 0
+
+
+def test_rechaza_un_lote_invalido_sin_abrir_transaccion(conn):
+    _preparar(conn, {1: 5})
+    assert insert_movimientos_batch(conn, []) is None
+    assert insert_movimientos_batch(conn, [{'producto_id': 1, 'tipo': 'venta', 'cantidad': 0}]) is None
+    assert not conn.in_transaction
+    assert _total_movimientos(conn) == 0
@@ -0,0 +1,68 @@
+"""Paginación por keyset: recorrer todas las páginas da cada fila una sola vez y en orden."""
+import pytest
+
+from database import (
+    get_all_products, get_products_by_category, get_products_ordered_by_price,
+    get_products_with_details, iter_products
+)
+
+
+def _recorrer(leer, clave, tamano):
+    """Concatenar páginas de `tamano` filas hasta una incompleta; clave arma el cursor after"""
+    filas, after = [], None
+    while True:
+        pagina = leer(tamano, after)
+        assert len(pagina) <= tamano
+        filas.extend(pagina)
+        if len(pagina) < tamano:
+            return filas
+        after = clave(pagina[-1])
+
+
+@pytest.fixture
+def empates(conn):
+    # Varios productos con el mismo precio: el id desempata el orden
+    conn.execute("UPDATE productos SET precio = 10.0 WHERE id % 3 = 0")
+    conn.commit()
+    return conn
+
+
+@pytest.mark.parametrize('tamano', [1, 2, 7, 1000])
+def test_por_id(conn, tamano):
+    todas = get_all_products(conn)
+    assert _recorrer(lambda n, after: get_all_products(conn, n, after), lambda f: f[0], tamano) == todas
+    assert [f[0] for f in todas] == sorted(f[0] for f in todas)
+
+    detalles = _recorrer(lambda n, after: get_products_with_details(conn, n, after), lambda f: f[0], tamano)
+    assert [f[0] for f in detalles] == [f[0] for f in todas]
+
+    columnas = _recorrer(lambda n, after: list(iter_products(conn, ('id', 'nombre'), n, after)),
+                         lambda f: f[0], tamano)
+    assert columnas == [(f[0], f[2]) for f in todas]
+
+
+@pytest.mark.parametrize('tamano', [1, 3])
+def test_por_categoria(conn, tamano):
+    todas = get_products_by_category(conn, 1)
+    assert todas
+    assert _recorrer(lambda n, after: get_products_by_category(conn, 1, n, after),
+                     lambda f: f[0], tamano) == todas
+    assert all(f[6] == 1 for f in todas)
+
+
+@pytest.mark.parametrize('orden', ['ASC', 'DESC'])
+@pytest.mark.parametrize('tamano', [1, 2, 5])
+def test_por_precio_con_empates(empates, orden, tamano):
+    todas = get_products_ordered_by_price(empates, orden)
+    paginas = _recorrer(lambda n, after: get_products_ordered_by_price(empates, orden, n, after),
+                        lambda f: (f[5], f[0]), tamano)
+    assert paginas == todas
+    claves = [(f[5], f[0]) for f in todas]
+    assert claves == sorted(claves, reverse=orden == 'DESC')
+
+
+def test_pagina_exacta_deja_la_siguiente_vacia(conn):
+    total = len(get_all_products(conn))
+    pagina = get_all_products(conn, total)
+    assert len(pagina) == total
+    assert get_all_products(conn, total, pagina[-1][0]) == []
@@ -0,0 +1,69 @@
+"""ConnectionPool: reutiliza conexiones y aplica las PRAGMA a cada una."""
+import threading
+
+from pool import DEFAULT_PRAGMAS, ConnectionPool
+
+
+def test_reutiliza_la_conexion_liberada(ruta):
+    pool = ConnectionPool(ruta, max_idle=2)
+    primera = pool.acquire()
+    # Dentro del mismo hilo se presta siempre la misma conexión
+    assert pool.acquire() is primera
+    pool.release(primera)
+    segunda = pool.acquire()
+    pool.release(segunda)
+
+    assert segunda is primera
+    stats = pool.stats()
+    assert (stats['misses'], stats['hits'], stats['released']) == (1, 1, 2)
+    pool.close_all()
+
+
+def test_descarta_las_que_exceden_max_idle(ruta):
+    pool = ConnectionPool(ruta, max_idle=1)
+    prestadas = []
+    barrera = threading.Barrier(3)
+
+    def tomar():
+        prestadas.append(pool.acquire())
+        barrera.wait()
+
+    hilos = [threading.Thread(target=tomar) for _ in range(3)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    for conn in prestadas:
+        pool.release(conn)
+
+    stats = pool.stats()
+    assert (stats['idle'], stats['released'], stats['discarded']) == (1, 1, 2)
+    pool.close_all()
+
+
+def test_aplica_las_pragma(ruta):
+    pool = ConnectionPool(ruta, pragmas={'cache_size': -1000}, cached_statements=17)
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == DEFAULT_PRAGMAS['journal_mode'].lower()
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == DEFAULT_PRAGMAS['busy_timeout']
+    # Las PRAGMA indicadas reemplazan a las de DEFAULT_PRAGMAS
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == -1000
+    assert pool.cached_statements == 17
+    pool.release(conn)
+    pool.close_all()
+
+
+def test_no_devuelve_transacciones_abiertas(ruta):
+    pool = ConnectionPool(ruta)
+    conn = pool.acquire()
+    conn.execute("UPDATE productos SET cantidad = 999 WHERE id = 1")
+    assert conn.in_transaction
+    pool.release(conn)
+
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute("SELECT cantidad FROM productos WHERE id = 1").fetchone()[0] != 999
+    pool.release(conn)
+    pool.close_all()
@@ -0,0 +1,36 @@
+"""Ninguna consulta de database.py debe recorrer una tabla completa.
+
+Corre los casos de bench.query_plans en orden sobre una base temporal (los
+últimos escriben, borran y archivan, así que dependen de los anteriores) y
+revisa el EXPLAIN QUERY PLAN de cada sentencia que envían.
+"""
+import pytest
+
+from bench import crear_base_temporal, query_plans
+from pool import ConnectionPool
+
+CASOS = [nombre for nombre, _ in query_plans.casos()]
+
+
+@pytest.fixture(scope='module')
+def planes():
+    pool = ConnectionPool(crear_base_temporal())
+    conn = pool.acquire()
+    try:
+        yield {nombre: query_plans.revisar(conn, nombre, llamada) for nombre, llamada in query_plans.casos()}
+    finally:
+        pool.release(conn)
+        pool.close_all()
+
+
+@pytest.mark.parametrize('nombre', CASOS)
+def test_sin_scan(planes, nombre):
+    recorridos = [
+        f"{' '.join(sql.split())}\n    " + '\n    '.join(plan)
+        for estado, sql, plan in planes[nombre] if estado == 'SCAN'
+    ]
+    assert not recorridos, 'Recorre una tabla completa:\n' + '\n'.join(recorridos)
+
+
+def test_casos_con_nombre_unico():
+    assert len(CASOS) == len(set(CASOS))
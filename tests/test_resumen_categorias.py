@@ -0,0 +1,51 @@
+"""resumen_categorias (mantenido por triggers) coincide con recalcularlo desde productos."""
+from database import (
+    add_product, apply_stock_delta, check_category_summary, delete_product, get_category_summary,
+    import_products_batch, insert_movimientos_batch, purge_deleted_products, rebuild_category_summary,
+    update_product_details, update_product_price, update_product_quantity
+)
+
+
+def test_coincide_despues_de_cada_escritura(conn):
+    assert check_category_summary(conn) == []
+    pasos = [
+        lambda: add_product(conn, 'RES-1', 'Nuevo', 4, 12.5, categoria_id=2),
+        lambda: add_product(conn, 'RES-2', 'Sin categoría', 3, 1.0),
+        lambda: apply_stock_delta(conn, 1, -1, 'salida'),
+        lambda: update_product_quantity(conn, 2, 0),
+        lambda: update_product_price(conn, 3, 99.99),
+        lambda: update_product_details(conn, 4, categoria_id=2),
+        lambda: insert_movimientos_batch(conn, [
+            {'producto_id': 5, 'tipo': 'entrada', 'cantidad': 7},
+            {'producto_id': 1, 'tipo': 'salida', 'cantidad': 1},
+        ]),
+        lambda: import_products_batch(conn, [
+            ('RES-1', 'Nuevo', None, 0, 20.0, 3, None),  # cambia de categoría y queda sin stock
+            ('RES-3', 'Importado', None, 2, 5.0, 1, None),
+        ]),
+        lambda: delete_product(conn, 6),
+        lambda: purge_deleted_products(conn),
+    ]
+    for numero, paso in enumerate(pasos):
+        assert paso() not in (None, False), f'paso {numero}'
+        assert check_category_summary(conn) == [], f'paso {numero}'
+
+
+def test_detecta_y_repara_un_resumen_alterado(conn):
+    conn.execute("UPDATE resumen_categorias SET unidades = unidades + 100 WHERE categoria_id = 1")
+    conn.commit()
+    diferencias = check_category_summary(conn)
+    assert [(categoria_id, campo) for categoria_id, campo, _, _ in diferencias] == [(1, 'unidades')]
+
+    assert rebuild_category_summary(conn)
+    assert check_category_summary(conn) == []
+
+
+def test_totales_del_resumen(conn):
+    total, valor, sin_stock = conn.execute(
+        "SELECT COUNT(*), SUM(cantidad * precio), SUM(cantidad <= 0) FROM productos WHERE categoria_id IS NOT NULL"
+    ).fetchone()
+    resumen = get_category_summary(conn)
+    assert resumen['total_productos'] == total
+    assert resumen['valor_total'] == round(valor, 2)
+    assert resumen['productos_sin_stock'] == sin_stock
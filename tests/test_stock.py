@@ -0,0 +1,72 @@
+"""apply_stock_delta: ventas concurrentes sin actualizaciones perdidas ni stock negativo."""
+import threading
+
+from database import apply_stock_delta
+
+PRODUCTO_ID = 1
+
+
+def _preparar(conn, stock):
+    conn.execute("UPDATE productos SET cantidad = ? WHERE id = ?", (stock, PRODUCTO_ID))
+    conn.execute("DELETE FROM movimientos WHERE producto_id = ?", (PRODUCTO_ID,))
+    conn.commit()
+
+
+def _movimientos(conn):
+    return conn.execute(
+        "SELECT stock_anterior, stock_posterior, cantidad FROM movimientos WHERE producto_id = ? ORDER BY id",
+        (PRODUCTO_ID,)
+    ).fetchall()
+
+
+def test_ventas_concurrentes_no_pierden_actualizaciones(pool, conn):
+    hilos, ventas, stock_inicial = 8, 60, 400  # más ventas que stock
+    _preparar(conn, stock_inicial)
+    confirmadas = [0] * hilos
+    barrera = threading.Barrier(hilos)
+
+    def vender(indice):
+        propia = pool.acquire()
+        try:
+            barrera.wait()
+            for _ in range(ventas):
+                if apply_stock_delta(propia, PRODUCTO_ID, -1, 'salida', 'prueba', 'pytest') is not None:
+                    confirmadas[indice] += 1
+        finally:
+            pool.release(propia)
+
+    threads = [threading.Thread(target=vender, args=(i,)) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stock_final = conn.execute("SELECT cantidad FROM productos WHERE id = ?", (PRODUCTO_ID,)).fetchone()[0]
+    movimientos = _movimientos(conn)
+    assert sum(confirmadas) == stock_inicial
+    assert stock_final == 0
+    assert len(movimientos) == stock_inicial
+    # Cada movimiento parte del stock que dejó el anterior
+    esperado = stock_inicial
+    for anterior, posterior, cantidad in movimientos:
+        assert (anterior, posterior, cantidad) == (esperado, esperado - 1, 1)
+        esperado = posterior
+
+
+def test_sin_stock_no_registra_movimiento(conn):
+    _preparar(conn, 2)
+    assert apply_stock_delta(conn, PRODUCTO_ID, -3) is None
+    assert apply_stock_delta(conn, 9999, 1) is None
+    assert not conn.in_transaction
+    assert _movimientos(conn) == []
+    assert conn.execute("SELECT cantidad FROM productos WHERE id = ?", (PRODUCTO_ID,)).fetchone()[0] == 2
+
+
+def test_en_transaccion_ajena_no_confirma(conn):
+    _preparar(conn, 10)
+    conn.execute("BEGIN")
+    assert apply_stock_delta(conn, PRODUCTO_ID, 5, 'ajuste') is not None
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute("SELECT cantidad FROM productos WHERE id = ?", (PRODUCTO_ID,)).fetchone()[0] == 10
+    assert _movimientos(conn) == []
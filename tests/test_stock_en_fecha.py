@@ -0,0 +1,101 @@
+"""get_stock_at con y sin cortes de stock_snapshots contra reproducir el historial."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import compact_stock_snapshots, get_stock_at
+
+INICIO = datetime(2024, 3, 1)
+DIAS = 10
+PRODUCTOS = (1, 2, 3, 4, 5)
+
+
+@pytest.fixture
+def historial(conn):
+    """Movimientos al azar (con fecha) de varios productos; devuelve las filas insertadas"""
+    conn.execute("DELETE FROM movimientos")
+    azar = random.Random(22)
+    stock = dict.fromkeys(PRODUCTOS, 0)
+    filas = []
+    for _ in range(300):
+        producto_id = azar.choice(PRODUCTOS)
+        fecha = INICIO + timedelta(seconds=azar.randrange(DIAS * 86400))
+        filas.append((producto_id, fecha))
+    filas.sort(key=lambda fila: fila[1])
+
+    movimientos = []
+    for producto_id, fecha in filas:
+        anterior = stock[producto_id]
+        # Algunas salidas vacían el producto: sin stock no aparece en get_stock_at
+        cantidad = -anterior if anterior and azar.random() < 0.1 else azar.randint(-min(anterior, 5), 8)
+        stock[producto_id] = anterior + cantidad
+        precio = float(azar.randint(1, 100))
+        movimientos.append((producto_id, 'entrada' if cantidad >= 0 else 'salida', abs(cantidad),
+                            anterior, stock[producto_id], precio, fecha.strftime('%Y-%m-%d %H:%M:%S')))
+    conn.executemany('''
+        INSERT INTO movimientos (producto_id, tipo, cantidad, stock_anterior, stock_posterior, precio, fecha)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', movimientos)
+    conn.commit()
+    return movimientos
+
+
+def _reproducir(movimientos, tope):
+    """Stock y precio del último movimiento anterior a tope de cada producto"""
+    ultimo = {}
+    for producto_id, _, _, _, posterior, precio, fecha in movimientos:
+        if fecha < tope:
+            ultimo[producto_id] = (posterior, precio)
+    return [(producto_id, cantidad, precio)
+            for producto_id, (cantidad, precio) in sorted(ultimo.items()) if cantidad > 0]
+
+
+def _fechas():
+    for dia in range(-1, DIAS + 1):
+        yield (INICIO + timedelta(days=dia)).date()
+        yield INICIO + timedelta(days=dia, hours=13, minutes=7, seconds=5)
+
+
+def _tope(fecha):
+    if isinstance(fecha, datetime):
+        return (fecha + timedelta(seconds=1)).strftime('%Y-%m-%d %H:%M:%S')
+    return (datetime(fecha.year, fecha.month, fecha.day) + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _comparar(conn, movimientos):
+    for fecha in _fechas():
+        assert get_stock_at(conn, fecha) == _reproducir(movimientos, _tope(fecha)), fecha
+
+
+def test_sin_cortes(conn, historial):
+    _comparar(conn, historial)
+
+
+@pytest.mark.parametrize('dias', [1, 3])
+def test_con_cortes(conn, historial, dias):
+    creados = compact_stock_snapshots(conn, hasta=INICIO + timedelta(days=DIAS), dias=dias,
+                                      desde=INICIO + timedelta(days=1))
+    assert creados
+    _comparar(conn, historial)
+
+
+def test_cortes_y_movimientos_posteriores(conn, historial):
+    compact_stock_snapshots(conn, hasta=INICIO + timedelta(days=5), desde=INICIO)
+    # Una entrada después del último movimiento: cuenta desde ese instante
+    stock_1 = next((cantidad for p, cantidad, _ in _reproducir(historial, '9999')
+                    if p == 1), 0)
+    nueva = (1, 'entrada', 4, stock_1, stock_1 + 4, 9.0,
+             (INICIO + timedelta(days=DIAS, minutes=30)).strftime('%Y-%m-%d %H:%M:%S'))
+    conn.execute('''
+        INSERT INTO movimientos (producto_id, tipo, cantidad, stock_anterior, stock_posterior, precio, fecha)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', nueva)
+    conn.commit()
+    _comparar(conn, historial + [nueva])
+
+
+def test_acepta_fecha_como_texto(conn, historial):
+    dia = (INICIO + timedelta(days=4)).date()
+    assert get_stock_at(conn, dia.isoformat()) == get_stock_at(conn, dia)
+    assert get_stock_at(conn, '2024-03-05 13:07:05') == get_stock_at(conn, datetime(2024, 3, 5, 13, 7, 5))